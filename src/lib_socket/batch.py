@@ -0,0 +1,142 @@
+import os
+from typing import BinaryIO, Callable
+
+from protocol import BATCH_ENTRY, BATCH_HEADER
+
+# 수신측이 묶음 스트림을 write-through로 받는 임시 파일의 접미사
+BATCH_SUFFIX = '.batch'
+# 스트림을 쓰거나 풀 때 한 번에 복사하는 크기
+COPY_SIZE = 1 << 20
+
+
+def collect_files(paths: list[str], root: str | None = None) -> list[tuple[str, str]]:
+    """
+    paths의 파일과 디렉터리 아래의 모든 파일을 모아 (원본 경로, 상대 경로) 목록을 만듭니다.
+    Args:
+        paths : 묶을 파일 또는 디렉터리 경로들
+        root : 지정되면 상대 경로를 이 디렉터리 기준으로, 아니면 각 경로가 있는 디렉터리 기준으로 만듭니다.
+    Returns:
+        상대 경로는 '/'로 구분합니다. 같은 상대 경로가 여러 번 나오면 처음 것만 남깁니다.
+    """
+    files = []
+    seen = set()
+    duplicates = 0
+
+    def add(source: str, base: str):
+        nonlocal duplicates
+        relative = os.path.relpath(source, base).replace(os.sep, '/')
+        if relative in seen:
+            duplicates += 1
+            return
+        seen.add(relative)
+        files.append((source, relative))
+
+    for path in paths:
+        base = root if root is not None else os.path.dirname(os.path.abspath(path))
+        if not os.path.isdir(path):
+            add(os.path.abspath(path), base)
+            continue
+        for directory, dirnames, filenames in os.walk(path):
+            dirnames.sort()
+            for filename in sorted(filenames):
+                add(os.path.abspath(os.path.join(directory, filename)), base)
+    if duplicates:
+        print(f"경고: 이미 묶은 상대 경로와 겹치는 파일 {duplicates}개를 제외했습니다.")
+    return files
+
+
+def write_batch(files: list[tuple[str, str]], out: BinaryIO) -> int:
+    """
+    파일들을 manifest와 함께 하나의 스트림으로 out에 씁니다. 작은 파일들은 청크 경계와 관계없이 이어 붙으므로
+    파일마다 핸드셰이크나 ACK 왕복 없이 여러 파일이 하나의 청크를 함께 씁니다.
+    Returns:
+        스트림에 담은 파일 내용의 전체 크기
+    Raises:
+        OSError : 묶는 도중 파일 크기가 바뀐 경우 발생합니다.
+    """
+    entries = []
+    for source, relative in files:
+        stat = os.stat(source)
+        path = relative.encode()
+        entries.append(BATCH_ENTRY.pack(stat.st_size, stat.st_mtime_ns, len(path)) + path)
+    manifest = b''.join(entries)
+    out.write(BATCH_HEADER.pack(len(files), BATCH_HEADER.size + len(manifest)))
+    out.write(manifest)
+
+    total_size = 0
+    for (source, _), entry in zip(files, entries):
+        size, _, _ = BATCH_ENTRY.unpack_from(entry)
+        with open(source, 'rb') as f:
+            remaining = size
+            while remaining > 0:
+                data = f.read(min(remaining, COPY_SIZE))
+                if not data:
+                    break
+                out.write(data)
+                remaining -= len(data)
+            if remaining or f.read(1):
+                raise OSError(f"묶는 도중 파일 {source}의 크기가 바뀌었습니다.")
+        total_size += size
+    return total_size
+
+
+def _safe_path(directory: str, relative: str) -> str | None:
+    """
+    manifest의 상대 경로를 directory 아래의 경로로 바꿉니다. 절대 경로나 '..'로 directory 밖을 가리키면 None을 반환합니다.
+    """
+    parts = relative.split('/')
+    if any(part in ('', '.', '..') for part in parts):
+        return None
+    path = os.path.join(*parts)
+    if os.path.isabs(path) or os.path.splitdrive(path)[0]:
+        return None
+    return os.path.join(directory, path)
+
+
+def extract_batch(read_range: Callable[[int, int], bytes | memoryview], stream_size: int, directory: str) -> int:
+    """
+    수신한 묶음 스트림을 manifest에 따라 directory 아래의 파일들로 풉니다.
+    Args:
+        read_range : 스트림의 (offset, length) 구간을 읽는 함수, reassembler.read_range를 그대로 사용합니다.
+        stream_size : 스트림의 전체 크기
+        directory : 파일을 풀 디렉터리
+    Returns:
+        풀어낸 파일 수
+    Raises:
+        ValueError : manifest가 손상되었거나 스트림 크기와 맞지 않는 경우 발생합니다.
+    """
+    if stream_size < BATCH_HEADER.size:
+        raise ValueError("묶음 스트림이 너무 짧습니다.")
+    count, manifest_size = BATCH_HEADER.unpack(read_range(0, BATCH_HEADER.size))
+    if manifest_size > stream_size:
+        raise ValueError("manifest가 스트림보다 깁니다.")
+    manifest = memoryview(bytes(read_range(0, manifest_size)))
+
+    entries = []
+    position = BATCH_HEADER.size
+    offset = manifest_size
+    for _ in range(count):
+        if position + BATCH_ENTRY.size > manifest_size:
+            raise ValueError("manifest가 손상되었습니다.")
+        size, mtime_ns, path_length = BATCH_ENTRY.unpack_from(manifest, position)
+        position += BATCH_ENTRY.size
+        relative = bytes(manifest[position:position + path_length]).decode()
+        position += path_length
+        entries.append((relative, offset, size, mtime_ns))
+        offset += size
+    if offset != stream_size:
+        raise ValueError("manifest의 파일 크기 합이 스트림 크기와 다릅니다.")
+
+    extracted = 0
+    for relative, offset, size, mtime_ns in entries:
+        path = _safe_path(directory, relative)
+        if path is None:
+            print(f"경고: 대상 디렉터리 밖을 가리키는 경로 {relative}은(는) 건너뜁니다.")
+            continue
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'wb') as f:
+            for start in range(offset, offset + size, COPY_SIZE):
+                f.write(read_range(start, min(COPY_SIZE, offset + size - start)))
+        os.utime(path, ns=(mtime_ns, mtime_ns))
+        extracted += 1
+    return extracted
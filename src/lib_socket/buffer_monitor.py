@@ -1,39 +1,145 @@
+import math
+import os
 import socket
-import threading
+import struct
 import time
 
-def peek_buffer(sock, buffer_size):
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+# linux/socket.h, 켜 두면 recvmsg마다 소켓이 지금까지 버린 datagram 수가 cmsg로 전달됩니다.
+SO_RXQ_OVFL = getattr(socket, 'SO_RXQ_OVFL', 40)
+# linux/sockios.h, 수신 큐 확인용 ioctl (FIONREAD), UDP 소켓에서는 큐 전체가 아니라 다음 datagram의 크기를 반환합니다.
+SIOCINQ = 0x541B
+PROC_NET_UDP = '/proc/net/udp'
+# /proc/net/udp를 다시 읽기 전의 최소 간격(초), ACK마다 읽지 않도록 이 간격 안에서는 마지막 값을 재사용합니다.
+MONITOR_INTERVAL = 0.05
+
+
+def set_receive_buffer(sock: socket.socket, size: int) -> int:
+    """
+    소켓의 수신 버퍼(SO_RCVBUF)를 요청하고 커널이 실제로 할당한 크기를 반환합니다.
+    커널은 요청을 net.core.rmem_max로 제한하고, 돌려주는 값은 skb 관리 오버헤드를 포함해 요청의 두 배로 계산됩니다.
+    """
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, size)
+    return sock.getsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF)
+
+
+def enable_drop_counter(sock: socket.socket) -> bool:
+    """
+    SO_RXQ_OVFL을 켭니다. (Linux 전용)
+    Returns:
+        성공하면 True를 반환합니다.
+    """
+    try:
+        sock.setsockopt(socket.SOL_SOCKET, SO_RXQ_OVFL, 1)
+    except OSError:
+        return False
+    return True
+
+
+def read_proc_udp(inode: int, path: str = PROC_NET_UDP) -> tuple[int, int] | None:
+    """
+    /proc/net/udp에서 inode가 같은 소켓의 줄을 찾아 수신 큐에 쌓인 바이트(rx_queue)와 누적 drop 수를 반환합니다.
+    rx_queue는 datagram의 payload가 아니라 커널이 수신 버퍼에서 차지한다고 계산한 크기(truesize)의 합입니다.
+    Returns:
+        (rx_queue, drops), 파일이 없거나 소켓을 찾지 못하면 None을 반환합니다.
+    """
+    target = str(inode)
     try:
-        # 데이터를 실제로 읽지 않고 확인만 함
-        data = sock.recv(buffer_size, socket.MSG_PEEK)
-        print(f"버퍼 데이터 크기: {len(data)} 바이트")
-        # 처음 몇 바이트만 출력
-        print(f"데이터 미리보기: {data[:20]}")
-        return len(data)
-    except socket.error as e:
-        print(f"버퍼 확인 중 에러: {e}")
-        return 0
+        with open(path) as f:
+            next(f)
+            for line in f:
+                fields = line.split()
+                if len(fields) >= 13 and fields[9] == target:
+                    return int(fields[4].split(':')[1], 16), int(fields[12])
+    except (OSError, StopIteration, ValueError):
+        return None
+    return None
+
 
 class BufferMonitor:
-    def __init__(self, sock):
+    """
+    수신 소켓의 수신 큐 깊이와 커널이 수신 버퍼 부족으로 버린 datagram 수를 추적합니다.
+    큐 깊이와 drop 수는 /proc/net/udp에서 읽고, drop 수는 DatagramReceiver가 recvmsg로 받은 SO_RXQ_OVFL로도 갱신합니다.
+    /proc/net/udp가 없는 환경에서는 SIOCINQ로 다음 datagram의 크기만 알 수 있으므로 큐 깊이는 하한값입니다.
+    수신 루프가 ACK를 보낼 때 report를 호출해 그 결과를 송신측에 전달하므로, 송신측은 보고된 손실 중
+    네트워크에서의 손실과 수신측이 처리를 따라가지 못해 커널이 버린 것을 구분할 수 있습니다.
+    """
+
+    def __init__(self, sock: socket.socket, interval: float = MONITOR_INTERVAL):
+        """
+        Args:
+            sock : 관찰할 수신 소켓
+            interval : /proc/net/udp를 다시 읽기 전의 최소 간격(초)
+        """
         self.sock = sock
-        self.running = False
-        self.monitor_thread = None
-
-    def start_monitoring(self, interval=0.1):
-        self.running = True
-        self.monitor_thread = threading.Thread(target=self._monitor)
-        self.monitor_thread.daemon = True
-        self.monitor_thread.start()
-
-    def stop_monitoring(self):
-        self.running = False
-        if self.monitor_thread:
-            self.monitor_thread.join()
-
-    def _monitor(self):
-        while self.running:
-            buffer_size = peek_buffer(self.sock)
-            if buffer_size > 0:
-                print(f"현재 버퍼 크기: {buffer_size}")
-            time.sleep(0.1)  # 모니터링 간격
\ No newline at end of file
+        self.interval = interval
+        self.receive_buffer = sock.getsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF)
+        self.inode = os.fstat(sock.fileno()).st_ino
+        self.drop_counter = enable_drop_counter(sock)
+        self.queued = 0  # 마지막으로 확인한 수신 큐의 바이트 수
+        self.peak_queued = 0
+        self.drops = 0  # 소켓이 만들어진 뒤 커널이 버린 datagram 수
+        self.base_drops = None  # 관찰을 시작할 때의 drops
+        self.last_sample = -math.inf
+        self.sample()
+        self.base_drops = self.drops
+
+    @property
+    def dropped(self) -> int:
+        """
+        관찰을 시작한 뒤 커널이 버린 datagram 수
+        """
+        return self.drops - (self.base_drops or 0)
+
+    @property
+    def occupancy(self) -> float:
+        """
+        마지막으로 확인한 수신 큐가 수신 버퍼에서 차지하는 비율(0~1)
+        """
+        return min(1.0, self.queued / self.receive_buffer) if self.receive_buffer else 0.0
+
+    def on_ancillary(self, ancdata: list):
+        """
+        recvmsg가 받은 ancillary data에서 SO_RXQ_OVFL 값을 반영합니다.
+        """
+        for level, kind, value in ancdata:
+            if level == socket.SOL_SOCKET and kind == SO_RXQ_OVFL and len(value) >= 4:
+                self.drops = max(self.drops, struct.unpack('=I', value[:4])[0])
+
+    def sample(self) -> bool:
+        """
+        마지막으로 읽은 뒤 interval이 지났으면 수신 큐 깊이와 drop 수를 다시 읽습니다.
+        호출하는 루프마다 시계가 다르므로 간격은 자체적으로 time.monotonic()으로 잽니다.
+        Returns:
+            다시 읽었으면 True를 반환합니다.
+        """
+        now = time.monotonic()
+        if now - self.last_sample < self.interval:
+            return False
+        self.last_sample = now
+        stats = read_proc_udp(self.inode)
+        if stats is not None:
+            self.queued, drops = stats
+            self.drops = max(self.drops, drops)
+        elif fcntl is not None:
+            try:
+                self.queued = struct.unpack('i', fcntl.ioctl(self.sock.fileno(), SIOCINQ, b'\0' * 4))[0]
+            except OSError:
+                self.queued = 0
+        self.peak_queued = max(self.peak_queued, self.queued)
+        return True
+
+    def report(self, since: int = 0) -> tuple[int, int]:
+        """
+        송신측에 보낼 수신측 버퍼 상태를 반환합니다.
+        Args:
+            since : 여러 전송이 소켓을 함께 쓰는 경우, 전송을 시작할 때의 dropped를 넘기면 그 뒤의 drop 수만 셉니다.
+        Returns:
+            (수신 큐가 수신 버퍼에서 차지하는 비율의 천분율, since 이후 커널이 버린 datagram 수)
+        """
+        self.sample()
+        return round(self.occupancy * 1000), self.dropped - since
@@ -0,0 +1,222 @@
+import math
+import mmap
+import os
+import time
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from typing import BinaryIO
+
+from compression import COMPRESS_THRESHOLD, SAMPLE_CHUNKS, Codec, is_compressible
+from offload import MAX_GSO_SEGMENTS
+from protocol import CHUNK_CHECKSUM, COMPRESSED_BIT, DATA_HEADER, DATA_TIMESTAMP, data_header_size
+from rtt import TimestampEcho
+
+# 이 크기만큼 전송할 때마다 이미 보낸 영역의 페이지를 반환합니다.
+RELEASE_BYTES = 4 * 1024 * 1024
+# 압축 worker 하나가 한 번에 압축하는 청크 수, 청크 하나씩 맡기면 작업 전달 비용이 압축 비용보다 커집니다.
+COMPRESS_BATCH = 64
+
+
+class MmapPacketSource:
+    """
+    전송할 파일을 mmap으로 열어 seq에 해당하는 패킷을 오프셋으로 바로 구성합니다.
+    첫 전송과 재전송 모두 파일에서 직접 읽으므로 보낸 패킷을 메모리에 보관할 필요가 없습니다.
+    packet_dict와 같이 source[seq]로 패킷을 얻을 수 있고, buffers(seq)로 복사 없이 (헤더, 청크) 버퍼를 얻을 수 있습니다.
+    """
+
+    def __init__(self, filename: str | BinaryIO, chunk_size: int, prefix: bytes = b'', checksum: bool = False,
+                 echo: TimestampEcho | None = None):
+        """
+        Args:
+            filename : 전송할 파일의 경로 또는 열려 있는 바이너리 파일 객체 (닫을 때 함께 닫힙니다.)
+            chunk_size : 패킷 하나에 담을 데이터의 크기
+            prefix : 모든 패킷의 맨 앞에 붙일 바이트 (세션 헤더 등)
+            checksum : True이면 헤더 뒤에 청크의 CRC32를 붙입니다.
+            echo : 지정하면 헤더 뒤에 패킷을 구성하는 시각의 DATA_TIMESTAMP를 붙입니다.
+        """
+        self.chunk_size = chunk_size
+        self.prefix = prefix
+        self.checksum = checksum
+        self.echo = echo
+        self.file = open(filename, 'rb') if isinstance(filename, (str, os.PathLike)) else filename
+        self.file_size = os.fstat(self.file.fileno()).st_size
+        self.total_chunks = math.ceil(self.file_size / chunk_size)
+
+        self.mmap = None
+        self.view = memoryview(b'')
+        if self.file_size > 0:
+            self.mmap = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+            if hasattr(self.mmap, 'madvise'):
+                self.mmap.madvise(mmap.MADV_SEQUENTIAL)
+            self.view = memoryview(self.mmap)
+        self.released = 0
+
+        # GSO 묶음 하나에 들어가는 패킷마다 재사용할 헤더 버퍼(prefix + DATA_HEADER)를 미리 만들어 둡니다.
+        self.header_size = len(prefix) + data_header_size(checksum, echo is not None)
+        self.headers = bytearray(prefix + bytes(data_header_size(checksum, echo is not None))) * MAX_GSO_SEGMENTS
+        self.header_views = [memoryview(self.headers)[i:i + self.header_size]
+                             for i in range(0, len(self.headers), self.header_size)]
+
+    def __len__(self) -> int:
+        return self.total_chunks
+
+    def chunk(self, seq_num: int) -> memoryview:
+        """
+        seq_num에 해당하는 청크 데이터를 복사 없이 반환합니다.
+        """
+        offset = seq_num * self.chunk_size
+        return self.view[offset:offset + self.chunk_size]
+
+    def payload(self, seq_num: int) -> tuple[bytes | memoryview, int]:
+        """
+        seq_num 패킷에 실을 데이터와 헤더의 chunk_size 필드 값을 반환합니다.
+        """
+        return self.chunk(seq_num), self.chunk_size
+
+    def __getitem__(self, seq_num: int) -> bytes:
+        """
+        seq_num에 해당하는 패킷(헤더 + 청크)을 구성합니다.
+        """
+        chunk, chunk_size = self.payload(seq_num)
+        header = self.prefix + DATA_HEADER.pack(seq_num, chunk_size)
+        if self.echo is not None:
+            header += DATA_TIMESTAMP.pack(*self.echo.stamp(time.time()))
+        if self.checksum:
+            header += CHUNK_CHECKSUM.pack(zlib.crc32(chunk))
+        return header + chunk
+
+    def read_range(self, offset: int, length: int) -> memoryview:
+        return self.view[offset:offset + length]
+
+    def packet_size(self, seq_num: int) -> int:
+        return self.header_size + min(self.chunk_size, self.file_size - seq_num * self.chunk_size)
+
+    def buffers(self, seq_num: int, slot: int = 0) -> tuple[memoryview, memoryview]:
+        """
+        seq_num에 해당하는 패킷을 sendmsg에 넘길 (헤더, 청크) 버퍼로 반환합니다.
+        헤더는 slot번째 재사용 버퍼에 기록되므로, 같은 slot으로 다시 호출하기 전에 전송을 마쳐야 합니다.
+        """
+        offset = slot * self.header_size + len(self.prefix)
+        chunk, chunk_size = self.payload(seq_num)
+        DATA_HEADER.pack_into(self.headers, offset, seq_num, chunk_size)
+        offset += DATA_HEADER.size
+        if self.echo is not None:
+            DATA_TIMESTAMP.pack_into(self.headers, offset, *self.echo.stamp(time.time()))
+            offset += DATA_TIMESTAMP.size
+        if self.checksum:
+            CHUNK_CHECKSUM.pack_into(self.headers, offset, zlib.crc32(chunk))
+        return self.header_views[slot], chunk
+
+    def release(self, end_seq: int):
+        """
+        end_seq 이전 청크가 차지하는 페이지를 운영체제에 돌려줍니다.
+        읽기 전용 매핑이므로 이후 재전송이 필요하면 파일에서 다시 읽어옵니다.
+        """
+        if self.mmap is None or not hasattr(mmap, 'MADV_DONTNEED'):
+            return
+        end = min(end_seq * self.chunk_size, self.file_size) // mmap.PAGESIZE * mmap.PAGESIZE
+        if end - self.released < RELEASE_BYTES:
+            return
+        self.mmap.madvise(mmap.MADV_DONTNEED, self.released, end - self.released)
+        self.released = end
+
+    def close(self):
+        for view in self.header_views:
+            view.release()
+        self.view.release()
+        if self.mmap is not None:
+            self.mmap.close()
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+class CompressedPacketSource(MmapPacketSource):
+    """
+    청크를 하나씩 독립적으로 압축해 보내는 packet source입니다.
+    송신 루프가 요청하는 위치보다 앞선 묶음들을 worker 스레드 풀이 미리 압축해 두므로 압축이 송신 루프를 막지 않습니다.
+    zlib과 lzma는 압축하는 동안 GIL을 놓으므로 worker들이 실제로 병렬로 실행됩니다.
+    압축해도 줄지 않는 청크와, 첫 청크가 줄지 않는 묶음은 원본 그대로 보냅니다.
+    """
+
+    def __init__(self, filename: str | BinaryIO, chunk_size: int, codec: Codec, prefix: bytes = b'',
+                 checksum: bool = False, workers: int | None = None, echo: TimestampEcho | None = None):
+        """
+        Args:
+            codec : 청크를 압축할 코덱
+            workers : 압축 worker 스레드 수, 생략하면 CPU 수만큼 사용합니다.
+            나머지는 MmapPacketSource와 같습니다.
+        """
+        super().__init__(filename, chunk_size, prefix, checksum, echo)
+        self.codec = codec
+        self.workers = workers or os.cpu_count() or 1
+        self.prefetch = 2 * self.workers + 2  # 미리 압축해 둘 묶음 수
+        self.batches = {}  # 묶음 번호 -> 압축 결과 Future (청크마다 압축된 bytes 또는 None의 list)
+        self.submitted = 0  # 이 번호 미만의 묶음은 이미 압축을 맡겼거나 건너뛰었습니다.
+        self.pool = None
+
+        # 파일 전체에서 고르게 고른 표본이 줄지 않으면 압축을 끄고 원본을 복사 없이 보냅니다.
+        step = max(1, self.total_chunks // SAMPLE_CHUNKS)
+        samples = [self.chunk(seq_num) for seq_num in range(0, self.total_chunks, step)][:SAMPLE_CHUNKS]
+        self.enabled = is_compressible(codec, samples)
+        if self.enabled:
+            self.pool = ThreadPoolExecutor(self.workers)
+        else:
+            print(f"압축해도 크기가 줄지 않는 파일입니다. 압축하지 않고 전송합니다.")
+
+    def _compress_batch(self, first_seq: int, end_seq: int) -> list[bytes | None]:
+        compressed = []
+        for seq_num in range(first_seq, end_seq):
+            chunk = self.chunk(seq_num)
+            packed = self.codec.compress(chunk)
+            if len(packed) >= len(chunk) * COMPRESS_THRESHOLD:
+                if seq_num == first_seq:
+                    # 묶음의 첫 청크가 줄지 않으면 압축할 수 없는 구간으로 보고 나머지도 압축하지 않습니다.
+                    return [None] * (end_seq - first_seq)
+                packed = None
+            compressed.append(packed)
+        return compressed
+
+    def _submit_until(self, end_batch: int):
+        end_batch = min(end_batch, math.ceil(self.total_chunks / COMPRESS_BATCH))
+        while self.submitted < end_batch:
+            first_seq = self.submitted * COMPRESS_BATCH
+            self.batches[self.submitted] = self.pool.submit(self._compress_batch, first_seq,
+                                                            min(first_seq + COMPRESS_BATCH, self.total_chunks))
+            self.submitted += 1
+
+    def payload(self, seq_num: int) -> tuple[bytes | memoryview, int]:
+        """
+        압축된 청크가 있으면 압축된 데이터와 COMPRESSED_BIT | 압축된 길이를, 없으면 원본 청크를 반환합니다.
+        이미 release한 구간의 재전송은 다시 압축하지 않고 원본을 보냅니다.
+        """
+        if not self.enabled:
+            return super().payload(seq_num)
+        batch = seq_num // COMPRESS_BATCH
+        if batch >= self.submitted:
+            # 이어받기처럼 앞부분을 건너뛴 경우 건너뛴 묶음은 압축하지 않습니다.
+            self.submitted = batch
+        self._submit_until(batch + self.prefetch)
+        future = self.batches.get(batch)
+        packed = future.result()[seq_num - batch * COMPRESS_BATCH] if future is not None else None
+        if packed is None:
+            return super().payload(seq_num)
+        return packed, COMPRESSED_BIT | len(packed)
+
+    def packet_size(self, seq_num: int) -> int:
+        chunk, _ = self.payload(seq_num)
+        return self.header_size + len(chunk)
+
+    def release(self, end_seq: int):
+        super().release(end_seq)
+        for batch in [batch for batch in self.batches if (batch + 1) * COMPRESS_BATCH <= end_seq]:
+            del self.batches[batch]
+
+    def close(self):
+        if self.pool is not None:
+            self.pool.shutdown(cancel_futures=True)
+        super().close()
@@ -0,0 +1,110 @@
+import lzma
+import zlib
+
+from protocol import FLAG_LZMA, FLAG_ZLIB
+
+# 압축 결과가 원본의 이 비율 이상이면 압축하지 않고 원본을 보냅니다.
+COMPRESS_THRESHOLD = 0.9
+# 전송을 시작하기 전에 파일 전체에서 고르게 압축해 볼 청크 수
+SAMPLE_CHUNKS = 16
+
+
+class Codec:
+    """
+    청크 하나를 독립적으로 압축하는 코덱의 기본 클래스입니다.
+    청크마다 따로 압축하므로 유실되거나 재전송된 청크도 다른 청크 없이 복원할 수 있습니다.
+    """
+    flag = 0
+
+    def compress(self, chunk: bytes | memoryview) -> bytes:
+        raise NotImplementedError
+
+    def decompress(self, payload: bytes | memoryview, max_length: int) -> bytes | None:
+        """
+        압축된 청크를 복원합니다.
+        Returns:
+            복원한 청크, 손상되었거나 max_length보다 길면 None을 반환합니다.
+        """
+        raise NotImplementedError
+
+
+class ZlibCodec(Codec):
+    """
+    헤더와 체크섬이 없는 raw deflate로 압축합니다. 빠르고, 텍스트와 로그에 충분한 압축률을 냅니다.
+    """
+    flag = FLAG_ZLIB
+
+    def __init__(self, level: int = 6):
+        self.level = level
+
+    def compress(self, chunk: bytes | memoryview) -> bytes:
+        return zlib.compress(chunk, self.level, wbits=-15)
+
+    def decompress(self, payload: bytes | memoryview, max_length: int) -> bytes | None:
+        decompressor = zlib.decompressobj(wbits=-15)
+        try:
+            chunk = decompressor.decompress(payload, max_length)
+        except zlib.error:
+            return None
+        return chunk if decompressor.eof else None
+
+
+class LzmaCodec(Codec):
+    """
+    헤더가 없는 raw LZMA2로 압축합니다. zlib보다 느리지만 압축률이 높습니다.
+    청크가 작으므로 사전 크기를 줄여 청크마다 압축기를 만드는 비용을 낮춥니다.
+    """
+    flag = FLAG_LZMA
+    filters = [{'id': lzma.FILTER_LZMA2, 'preset': 6, 'dict_size': 1 << 16}]
+
+    def compress(self, chunk: bytes | memoryview) -> bytes:
+        return lzma.compress(chunk, format=lzma.FORMAT_RAW, filters=self.filters)
+
+    def decompress(self, payload: bytes | memoryview, max_length: int) -> bytes | None:
+        decompressor = lzma.LZMADecompressor(format=lzma.FORMAT_RAW, filters=self.filters)
+        try:
+            chunk = decompressor.decompress(payload, max_length)
+        except lzma.LZMAError:
+            return None
+        return chunk if decompressor.eof else None
+
+
+CODECS = {
+    'zlib': ZlibCodec,
+    'lzma': LzmaCodec,
+}
+
+
+def make_codec(name: str) -> Codec | None:
+    """
+    이름으로 코덱을 생성합니다. name이 'none'이면 None을 반환해 압축하지 않게 합니다.
+    Raises:
+        ValueError : 알 수 없는 코덱 이름인 경우 발생합니다.
+    """
+    if name == 'none':
+        return None
+    if name not in CODECS:
+        raise ValueError(f"알 수 없는 압축 코덱: {name}")
+    return CODECS[name]()
+
+
+def codec_from_flags(flags: int) -> Codec | None:
+    """
+    파일 정보의 flags로 수신측에서 사용할 코덱을 고릅니다.
+    """
+    for codec_class in CODECS.values():
+        if flags & codec_class.flag:
+            return codec_class()
+    return None
+
+
+def is_compressible(codec: Codec, chunks: list[bytes | memoryview]) -> bool:
+    """
+    표본 청크들을 압축해 보고 전체 압축률이 COMPRESS_THRESHOLD보다 좋은지 판단합니다.
+    JPEG나 압축 파일처럼 줄지 않는 데이터는 압축 비용만 들기 때문에 전송 전에 걸러냅니다.
+    """
+    original = sum(len(chunk) for chunk in chunks)
+    if original == 0:
+        return False
+    compressed = sum(len(codec.compress(chunk)) for chunk in chunks)
+    return compressed < original * COMPRESS_THRESHOLD
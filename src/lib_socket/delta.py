@@ -0,0 +1,109 @@
+import hashlib
+import math
+import mmap
+import zlib
+from typing import BinaryIO
+
+from chunk_source import MmapPacketSource
+from protocol import SIGNATURE
+from reassembly import Reassembler
+
+# 델타 모드에서 새 버전을 받는 임시 파일의 접미사, 수신이 끝나면 이전 버전을 대체합니다.
+DELTA_SUFFIX = '.delta'
+# adler32의 modulus, 굴리는 체크섬도 zlib.adler32와 같은 값을 만들도록 이 값으로 나눕니다.
+ADLER_MOD = 65521
+# 마지막 일치 이후 이만큼의 블록 길이를 한 바이트씩 굴려도 일치하는 청크가 없으면,
+# 이후로는 이 길이마다 한 블록 길이만큼만 굴려 봅니다. 크게 바뀐 파일에서 바이트마다 반복하는 비용을 제한합니다.
+SCAN_LIMIT_BLOCKS = 16
+
+
+def signature_chunks(total_chunks: int, chunk_size: int) -> int:
+    """
+    total_chunks개 청크의 서명을 담은 스트림을 chunk_size로 나눈 청크 수를 반환합니다.
+    송신측과 수신측이 같은 함수로 계산하므로 서명 스트림의 크기를 따로 주고받지 않습니다.
+    """
+    return math.ceil(total_chunks * SIGNATURE.size / chunk_size)
+
+
+def strong_hash(block: bytes | memoryview) -> bytes:
+    return hashlib.blake2b(block, digest_size=SIGNATURE.size - 4).digest()
+
+
+def write_signatures(packet_source: MmapPacketSource, out: BinaryIO):
+    """
+    전송할 파일의 청크마다 (adler32, blake2b) 서명을 out에 씁니다.
+    """
+    signatures = bytearray(len(packet_source) * SIGNATURE.size)
+    for seq_num in range(len(packet_source)):
+        chunk = packet_source.chunk(seq_num)
+        SIGNATURE.pack_into(signatures, seq_num * SIGNATURE.size, zlib.adler32(chunk), strong_hash(chunk))
+    out.write(signatures)
+
+
+def match_basis(basis_path: str, signatures: bytes | memoryview, reassembler: Reassembler) -> int:
+    """
+    수신측에 있는 이전 버전(basis_path)을 한 바이트씩 굴리며 새 파일의 청크 서명과 같은 블록을 찾아 reassembler에 씁니다.
+    삽입이나 삭제로 위치가 밀린 청크도 찾을 수 있고, 일치한 뒤에는 블록 단위로 건너뛰므로 바뀌지 않은 부분은 빠르게 지나갑니다.
+    마지막 청크는 chunk_size보다 짧을 수 있으므로 찾지 않고 항상 전송받습니다.
+    Returns:
+        이전 버전에서 채운 청크 수
+    """
+    block_size = reassembler.chunk_size
+    table = {}  # adler32 -> {blake2b -> [seq, ...]}
+    for seq_num in range(len(signatures) // SIGNATURE.size - 1):
+        weak, strong = SIGNATURE.unpack_from(signatures, seq_num * SIGNATURE.size)
+        table.setdefault(weak, {}).setdefault(strong, []).append(seq_num)
+
+    with open(basis_path, 'rb') as f:
+        basis_size = f.seek(0, 2)
+        if basis_size < block_size or not table:
+            return 0
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as basis:
+            data = memoryview(basis)
+            try:
+                return _scan(data, block_size, table, reassembler)
+            finally:
+                data.release()
+
+
+def _scan(data: memoryview, block_size: int, table: dict, reassembler: Reassembler) -> int:
+    scan_limit = SCAN_LIMIT_BLOCKS * block_size
+    matched = 0
+    missed = 0  # 마지막 일치 이후 굴린 바이트 수
+    position = 0
+    weak = None
+    end = len(data) - block_size
+    while position <= end and table:
+        if weak is None:
+            weak = zlib.adler32(data[position:position + block_size])
+            a, b = weak & 0xffff, weak >> 16
+
+        candidates = table.get(weak)
+        if candidates is not None:
+            block = data[position:position + block_size]
+            seq_numbers = candidates.pop(strong_hash(block), None)
+            if seq_numbers is not None:
+                for seq_num in seq_numbers:
+                    reassembler.write(seq_num, block)
+                matched += len(seq_numbers)
+                if not candidates:
+                    del table[weak]
+                position += block_size
+                weak = None
+                missed = 0
+                continue
+
+        missed += 1
+        if missed >= scan_limit:
+            position += scan_limit - block_size
+            weak = None
+            missed = scan_limit - block_size
+            continue
+        if position < end:
+            # [position, position + block_size)에서 한 바이트 민 구간의 adler32
+            out_byte, in_byte = data[position], data[position + block_size]
+            a = (a - out_byte + in_byte) % ADLER_MOD
+            b = (b - block_size * out_byte + a - 1) % ADLER_MOD
+            weak = (b << 16) | a
+        position += 1
+    return matched
@@ -0,0 +1,145 @@
+from protocol import FEC_HEADER, PARITY_BIT
+from reassembly import Reassembler
+
+MIN_GROUP_SIZE = 2
+MAX_GROUP_SIZE = 64
+
+
+class FecEncoder:
+    """
+    연속된 group_size개의 데이터 청크마다 XOR parity 패킷 하나를 만듭니다.
+    그룹에서 청크 하나가 유실되면 수신측이 NACK 왕복 없이 나머지 청크와 parity로 복구할 수 있습니다.
+    adaptive가 켜져 있으면 parity로 복구되지 못한 손실 보고에 따라 그룹 크기를 줄이고, 손실이 없으면 늘립니다.
+    """
+
+    def __init__(self, chunk_size: int, group_size: int, adaptive: bool = False, prefix: bytes = b''):
+        """
+        Args:
+            chunk_size : 마지막 청크를 제외한 청크 하나의 크기
+            group_size : parity 하나가 보호하는 청크 수
+            adaptive : True이면 손실 보고에 따라 group_size를 조절합니다.
+            prefix : parity 패킷의 맨 앞에 붙일 바이트 (세션 헤더 등)
+        """
+        self.chunk_size = chunk_size
+        self.group_size = max(MIN_GROUP_SIZE, min(group_size, MAX_GROUP_SIZE))
+        self.adaptive = adaptive
+        self.prefix = prefix
+
+        self.group_start = None
+        self.count = 0
+        self.parity = 0
+        self.length_xor = 0
+        self.loss_in_group = False
+
+    def add(self, seq_num: int, chunk: bytes | memoryview) -> bytes | None:
+        """
+        처음 전송하는 청크를 현재 그룹에 더합니다. 이어받기처럼 seq_num이 이전 청크와 연속이 아니면
+        이전 그룹을 먼저 닫으므로, 그룹은 항상 연속된 seq만 포함합니다.
+        Returns:
+            그룹이 가득 차거나 닫히면 전송할 parity 패킷, 아니면 None을 반환합니다.
+        """
+        packet = None
+        if self.group_start is not None and seq_num != self.group_start + self.count:
+            packet = self.flush()
+        if self.group_start is None:
+            self.group_start = seq_num
+        self.parity ^= int.from_bytes(chunk, 'little')
+        self.length_xor ^= len(chunk)
+        self.count += 1
+        if self.count >= self.group_size:
+            # 방금 닫은 그룹 다음에 바로 가득 차는 경우는 없습니다. (group_size >= MIN_GROUP_SIZE)
+            return self.flush()
+        return packet
+
+    def flush(self) -> bytes | None:
+        """
+        현재 그룹의 parity 패킷을 만들고 새 그룹을 시작합니다. 마지막 청크를 보낸 뒤 호출합니다.
+        """
+        if self.count == 0:
+            return None
+        packet = (self.prefix + FEC_HEADER.pack(PARITY_BIT | self.group_start, self.count, self.length_xor)
+                  + self.parity.to_bytes(self.chunk_size, 'little'))
+        if self.adaptive:
+            if self.loss_in_group:
+                self.group_size = max(MIN_GROUP_SIZE, self.group_size // 2)
+            else:
+                self.group_size = min(MAX_GROUP_SIZE, self.group_size + 1)
+        self.group_start = None
+        self.count = 0
+        self.parity = 0
+        self.length_xor = 0
+        self.loss_in_group = False
+        return packet
+
+    def on_loss(self, lost: int):
+        """
+        parity로 복구되지 못해 재전송한 패킷 수를 알려줍니다.
+        """
+        if lost > 0:
+            self.loss_in_group = True
+
+
+class FecDecoder:
+    """
+    parity 패킷으로 그룹 안에서 하나만 유실된 청크를 복구해 reassembler에 씁니다.
+    둘 이상 유실된 그룹은 재전송으로 하나만 남을 때까지 parity를 보관합니다.
+    """
+
+    def __init__(self, reassembler: Reassembler):
+        self.reassembler = reassembler
+        self.pending = {}  # group_start -> (group_count, length_xor, parity)
+        self.group_of = {}  # 보관 중인 그룹에 속한 seq -> group_start
+
+    def on_parity(self, packet: bytes | memoryview) -> int | None:
+        """
+        parity 패킷 하나를 처리합니다.
+        Returns:
+            복구한 청크의 seq, 복구하지 못했으면 None을 반환합니다.
+        Raises:
+            struct.error : 패킷이 손상된 경우 발생합니다.
+        """
+        first, count, length_xor = FEC_HEADER.unpack_from(packet)
+        start = first & ~PARITY_BIT
+        if start in self.pending or start + count > self.reassembler.total_chunks:
+            return None
+        parity = int.from_bytes(packet[FEC_HEADER.size:], 'little')
+        self.pending[start] = (count, length_xor, parity)
+        for seq_num in range(start, start + count):
+            self.group_of[seq_num] = start
+        return self._try_recover(start)
+
+    def on_data(self, seq_num: int) -> int | None:
+        """
+        데이터 청크를 새로 받은 뒤 호출합니다. 그 청크가 보관 중인 그룹에 속하면 복구를 다시 시도합니다.
+        """
+        start = self.group_of.get(seq_num)
+        if start is None:
+            return None
+        return self._try_recover(start)
+
+    def _try_recover(self, start: int) -> int | None:
+        count, length_xor, parity = self.pending[start]
+        received = self.reassembler.window.received
+        missing = received.count(0, start, start + count)
+        if missing > 1:
+            return None
+        self._drop(start, count)
+        if missing == 0:
+            return None
+
+        lost = received.index(0, start, start + count)
+        chunk_size = self.reassembler.chunk_size
+        for seq_num in range(start, start + count):
+            if seq_num != lost:
+                chunk = self.reassembler.read(seq_num)
+                parity ^= int.from_bytes(chunk, 'little')
+                length_xor ^= len(chunk)
+        if length_xor > chunk_size:
+            return None
+        self.reassembler.write(lost, parity.to_bytes(chunk_size, 'little')[:length_xor])
+        return lost
+
+    def _drop(self, start: int, count: int):
+        del self.pending[start]
+        for seq_num in range(start, start + count):
+            self.group_of.pop(seq_num, None)
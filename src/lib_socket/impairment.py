@@ -0,0 +1,322 @@
+import argparse
+import heapq
+import random
+import select
+import socket
+import time
+
+from path_mtu import IP_UDP_HEADER_SIZE
+
+# 프록시 소켓의 수신 버퍼 크기, 지연 중인 패킷은 프록시 안의 큐에 있으므로 커널 버퍼는 순간적인 burst만 감당하면 됩니다.
+PROXY_BUFFER_SIZE = 16 * 1024 * 1024
+# select 한 번에 소켓마다 꺼낼 최대 datagram 수, 한 소켓이 루프를 독점해 다른 방향의 전송 시각을 놓치지 않게 합니다.
+DRAIN_LIMIT = 256
+# 대기 중인 패킷이 없을 때 종료 조건을 확인하는 간격(초)
+IDLE_POLL = 0.5
+
+
+class LossModel:
+    """
+    패킷마다 유실 여부를 정하는 손실 모델의 기본 클래스입니다.
+    """
+
+    def lose(self, rng: random.Random) -> bool:
+        raise NotImplementedError
+
+
+class BernoulliLoss(LossModel):
+    """
+    패킷마다 독립적으로 rate의 확률로 유실시킵니다.
+    """
+
+    def __init__(self, rate: float):
+        self.rate = rate
+
+    def lose(self, rng: random.Random) -> bool:
+        return rng.random() < self.rate
+
+
+class GilbertElliottLoss(LossModel):
+    """
+    좋은 상태와 나쁜 상태를 오가는 2-상태 Markov 손실 모델입니다. 나쁜 상태에 머무는 동안 연속으로 유실되므로
+    무선 링크나 혼잡한 큐처럼 손실이 몰려서 일어나는 경로를 흉내 냅니다.
+    """
+
+    def __init__(self, rate: float, burst: float = 4.0, loss_good: float = 0.0, loss_bad: float = 1.0):
+        """
+        Args:
+            rate : 장기 평균 손실률
+            burst : 나쁜 상태에 머무는 평균 패킷 수(평균 연속 유실 길이)
+            loss_good, loss_bad : 각 상태에서의 손실 확률
+        """
+        # 나쁜 상태의 비율 pi_bad에서 평균 손실률이 rate가 되도록 전이 확률을 정합니다.
+        self.r = 1 / max(1.0, burst)  # 나쁜 상태 -> 좋은 상태
+        pi_bad = min(1.0, max(0.0, (rate - loss_good) / (loss_bad - loss_good)))
+        self.p = min(1.0, self.r * pi_bad / (1 - pi_bad)) if pi_bad < 1 else 1.0  # 좋은 상태 -> 나쁜 상태
+        self.loss_good = loss_good
+        self.loss_bad = loss_bad
+        self.bad = False
+
+    def lose(self, rng: random.Random) -> bool:
+        if self.bad:
+            self.bad = rng.random() >= self.r
+        else:
+            self.bad = rng.random() < self.p
+        return rng.random() < (self.loss_bad if self.bad else self.loss_good)
+
+
+LOSS_MODELS = {
+    'bernoulli': BernoulliLoss,
+    'gilbert': GilbertElliottLoss,
+}
+
+
+def make_loss_model(name: str, rate: float, burst: float = 4.0) -> LossModel | None:
+    """
+    이름으로 손실 모델을 생성합니다. rate가 0이면 None을 반환해 유실시키지 않게 합니다.
+    burst는 연속 유실을 흉내 내는 gilbert 모델에만 전달합니다.
+    Raises:
+        ValueError : 알 수 없는 손실 모델 이름인 경우 발생합니다.
+    """
+    if name not in LOSS_MODELS:
+        raise ValueError(f"알 수 없는 손실 모델: {name}")
+    if rate <= 0:
+        return None
+    if LOSS_MODELS[name] is GilbertElliottLoss:
+        return GilbertElliottLoss(rate, burst)
+    return LOSS_MODELS[name](rate)
+
+
+class Link:
+    """
+    한 방향의 경로를 흉내 냅니다. 패킷마다 유실, 중복, 순서 바뀜을 정하고, 대역폭 제한과 지연, 지터를 적용한
+    도착 시각을 계산합니다. 난수 생성기를 방향마다 seed로 만들므로 같은 입력에는 항상 같은 결과를 냅니다.
+    """
+
+    def __init__(self, loss: LossModel | None = None, delay: float = 0.0, jitter: float = 0.0, reorder: float = 0.0,
+                 reorder_delay: float = 0.001, duplicate: float = 0.0, rate: float = 0.0,
+                 queue_limit: int = 256 * 1024, seed: int = 0, mtu: int = 0):
+        """
+        Args:
+            loss : 손실 모델, None이면 유실시키지 않습니다.
+            delay : 편도 지연(초)
+            jitter : 패킷마다 [-jitter, +jitter] 범위에서 더하는 지연(초), 지터가 크면 패킷 순서도 바뀔 수 있습니다.
+            reorder : 패킷을 reorder_delay만큼 더 붙잡아 뒤의 패킷에 추월당하게 할 확률
+            reorder_delay : 순서를 바꿀 패킷을 더 붙잡는 시간(초)
+            duplicate : 패킷을 한 번 더 보낼 확률
+            rate : 대역폭 제한(바이트/초), 0이면 제한하지 않습니다.
+            queue_limit : 대역폭 제한 큐에 쌓일 수 있는 최대 바이트, 넘치면 뒤에 온 패킷을 버립니다(drop-tail).
+            seed : 난수 seed
+            mtu : 0보다 크면 IP/UDP 헤더를 더해 이 크기를 넘는 datagram을 버립니다.
+                  조각내지 않고 ICMP도 보내지 않는, 경로 MTU가 작은 링크를 흉내 냅니다.
+        """
+        self.loss = loss
+        self.delay = delay
+        self.jitter = jitter
+        self.reorder = reorder
+        self.reorder_delay = reorder_delay
+        self.duplicate = duplicate
+        self.rate = rate
+        self.queue_limit = queue_limit
+        self.mtu = mtu
+        self.rng = random.Random(seed)
+        self.next_free = 0.0  # 대역폭 제한 큐가 비는 시각
+        self.stats = {'received': 0, 'sent': 0, 'lost': 0, 'overflow': 0, 'duplicated': 0, 'reordered': 0,
+                      'oversize': 0}
+
+    def fits(self, size: int) -> bool:
+        """
+        size 바이트 datagram이 링크의 MTU를 넘지 않으면 True를 반환합니다.
+        """
+        return self.mtu <= 0 or size + IP_UDP_HEADER_SIZE <= self.mtu
+
+    def schedule(self, size: int, now: float) -> list[float]:
+        """
+        now에 들어온 size 바이트 패킷이 반대편에 도착할 시각들을 반환합니다. 유실되면 빈 목록, 중복되면 두 개입니다.
+        """
+        self.stats['received'] += 1
+        if not self.fits(size):
+            self.stats['oversize'] += 1
+            return []
+        if self.loss is not None and self.loss.lose(self.rng):
+            self.stats['lost'] += 1
+            return []
+
+        copies = 1
+        if self.duplicate > 0 and self.rng.random() < self.duplicate:
+            copies = 2
+            self.stats['duplicated'] += 1
+
+        arrivals = []
+        for _ in range(copies):
+            departure = now
+            if self.rate > 0:
+                # 앞선 패킷들이 링크를 다 쓸 때까지 큐에서 기다린 뒤 직렬화 시간만큼 걸려 나갑니다.
+                start = max(now, self.next_free)
+                if (start - now) * self.rate > self.queue_limit:
+                    self.stats['overflow'] += 1
+                    continue
+                self.next_free = start + size / self.rate
+                departure = self.next_free
+            arrival = departure + self.delay
+            if self.jitter > 0:
+                arrival = max(departure, arrival + self.rng.uniform(-self.jitter, self.jitter))
+            if self.reorder > 0 and self.rng.random() < self.reorder:
+                arrival += self.reorder_delay
+                self.stats['reordered'] += 1
+            arrivals.append(arrival)
+        self.stats['sent'] += len(arrivals)
+        return arrivals
+
+
+class ImpairmentProxy:
+    """
+    클라이언트와 서버 사이에서 datagram을 중계하며 방향마다 Link의 손실, 지연, 대역폭 제한을 적용하는 UDP 릴레이입니다.
+    클라이언트 주소마다 서버 쪽 소켓을 따로 열어 응답을 해당 클라이언트에게 돌려주므로 멀티 세션 서버에도 사용할 수 있습니다.
+    streams가 1보다 크면 스트라이핑 전송처럼 (listen_port + i, target_port + i) 포트 쌍들도 함께 중계합니다.
+    """
+
+    def __init__(self, listen_addr: tuple[str, int], target_addr: tuple[str, int], forward: Link, backward: Link,
+                 streams: int = 1, spare_first: int = 1):
+        """
+        Args:
+            listen_addr : 클라이언트가 보낼 프록시의 주소
+            target_addr : 중계할 서버의 주소
+            forward : 클라이언트 -> 서버 방향의 경로
+            backward : 서버 -> 클라이언트 방향의 경로
+            streams : 중계할 연속된 포트 쌍의 수, 스트라이핑 전송은 1 + 스트림 수가 필요합니다.
+            spare_first : 새 클라이언트의 처음 이 개수의 패킷은 손상 없이 바로 전달합니다.
+                          핸드셰이크는 유실되면 재전송하지만, 재전송 대기 시간이 측정 결과에 섞이지 않게 합니다.
+        """
+        self.target_addr = target_addr
+        self.forward = forward
+        self.backward = backward
+        self.spare_first = spare_first
+        self.listeners = {}  # 프록시 수신 소켓 -> 포트 쌍 번호
+        for i in range(streams):
+            sock = self._open_socket((listen_addr[0], listen_addr[1] + i))
+            self.listeners[sock] = i
+        self.upstreams = {}  # (포트 쌍 번호, 클라이언트 주소) -> 서버 쪽 소켓
+        self.routes = {}  # 서버 쪽 소켓 -> (프록시 수신 소켓, 클라이언트 주소)
+        self.counts = {}  # 클라이언트 주소 -> 받은 패킷 수
+        self.pending = []  # (도착 시각, 순번, 보낼 소켓, datagram, 주소) heap
+        self.sequence = 0
+
+    @staticmethod
+    def _open_socket(address: tuple[str, int] | None = None) -> socket.socket:
+        sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, PROXY_BUFFER_SIZE)
+        if address is not None:
+            sock.bind(address)
+        sock.setblocking(False)
+        return sock
+
+    def _enqueue(self, link: Link, sock: socket.socket, data: bytes, address: tuple, now: float, spare: bool):
+        # MTU는 손상이 아니라 링크의 성질이므로 손상 없이 보내는 패킷에도 적용합니다.
+        arrivals = [now] if spare and link.fits(len(data)) else link.schedule(len(data), now)
+        for arrival in arrivals:
+            heapq.heappush(self.pending, (arrival, self.sequence, sock, data, address))
+            self.sequence += 1
+
+    def _upstream(self, listener: socket.socket, client_address: tuple) -> socket.socket:
+        key = (self.listeners[listener], client_address)
+        upstream = self.upstreams.get(key)
+        if upstream is None:
+            upstream = self._open_socket()
+            self.upstreams[key] = upstream
+            self.routes[upstream] = (listener, client_address)
+        return upstream
+
+    def _receive(self, sock: socket.socket, now: float):
+        for _ in range(DRAIN_LIMIT):
+            try:
+                data, address = sock.recvfrom(65536)
+            except (BlockingIOError, ConnectionResetError):
+                return
+            if sock in self.listeners:
+                count = self.counts.get(address, 0) + 1
+                self.counts[address] = count
+                target = (self.target_addr[0], self.target_addr[1] + self.listeners[sock])
+                self._enqueue(self.forward, self._upstream(sock, address), data, target, now,
+                              count <= self.spare_first)
+            else:
+                listener, client_address = self.routes[sock]
+                self._enqueue(self.backward, listener, data, client_address, now, False)
+
+    def _send_due(self, now: float):
+        while self.pending and self.pending[0][0] <= now:
+            _, _, sock, data, address = heapq.heappop(self.pending)
+            try:
+                sock.sendto(data, address)
+            except (BlockingIOError, ConnectionRefusedError):
+                # 보내는 쪽 버퍼가 가득 찼거나 상대가 없으면 링크에서 유실된 것으로 봅니다.
+                pass
+
+    def serve(self, duration: float | None = None):
+        """
+        duration초 동안(생략하면 중단될 때까지) 중계합니다.
+        """
+        end_time = time.monotonic() + duration if duration is not None else None
+        try:
+            while end_time is None or time.monotonic() < end_time:
+                now = time.monotonic()
+                timeout = self.pending[0][0] - now if self.pending else IDLE_POLL
+                sockets = [*self.listeners, *self.routes]
+                readable, _, _ = select.select(sockets, [], [], max(0.0, timeout))
+                now = time.monotonic()
+                for sock in readable:
+                    self._receive(sock, now)
+                self._send_due(time.monotonic())
+        except KeyboardInterrupt:
+            pass
+        finally:
+            self.close()
+
+    def report(self) -> str:
+        return f"정방향 {self.forward.stats}\n역방향 {self.backward.stats}"
+
+    def close(self):
+        for sock in [*self.listeners, *self.routes]:
+            sock.close()
+        self.listeners = {}
+        self.routes = {}
+        self.upstreams = {}
+
+
+if __name__ == "__main__":
+
+    parser = argparse.ArgumentParser(description="손실, 지연, 대역폭 제한을 넣는 UDP 중계 프록시")
+    parser.add_argument("--host", type=str, default="localhost", help="프록시가 바인드할 주소")
+    parser.add_argument("--listen", type=int, default=9998, help="클라이언트가 보낼 프록시 포트")
+    parser.add_argument("-t", "--target", type=str, default="localhost", help="서버 주소")
+    parser.add_argument("-p", "--port", type=int, default=9999, help="서버 포트")
+    parser.add_argument("-s", "--streams", type=int, default=1,
+                        help="중계할 연속된 포트 쌍의 수 (스트라이핑 전송은 1 + 스트림 수)")
+    parser.add_argument("--loss", type=float, default=0.0, help="평균 손실률 (0~1)")
+    parser.add_argument("--loss_model", type=str, default="bernoulli", choices=[*LOSS_MODELS])
+    parser.add_argument("--burst", type=float, default=4.0, help="gilbert 모델의 평균 연속 유실 길이 (패킷)")
+    parser.add_argument("--delay", type=float, default=0.0, help="편도 지연 (ms)")
+    parser.add_argument("--jitter", type=float, default=0.0, help="지터 (ms)")
+    parser.add_argument("--reorder", type=float, default=0.0, help="순서를 바꿀 확률 (0~1)")
+    parser.add_argument("--reorder_delay", type=float, default=1.0, help="순서를 바꿀 패킷을 더 붙잡는 시간 (ms)")
+    parser.add_argument("--duplicate", type=float, default=0.0, help="중복 전송 확률 (0~1)")
+    parser.add_argument("--rate", type=float, default=0.0, help="대역폭 제한 (Mbit/s), 0이면 제한 없음")
+    parser.add_argument("--queue", type=int, default=256, help="대역폭 제한 큐의 크기 (KB)")
+    parser.add_argument("--mtu", type=int, default=0, help="0보다 크면 이 MTU를 넘는 datagram을 버림 (양방향)")
+    parser.add_argument("--forward_only", action="store_true", help="클라이언트 -> 서버 방향에만 적용하고 ACK 경로는 그대로 둠")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--duration", type=float, default=None, help="이 시간(초)이 지나면 종료")
+
+    args = parser.parse_args()
+
+    def make_link(seed: int) -> Link:
+        return Link(make_loss_model(args.loss_model, args.loss, args.burst), args.delay / 1000, args.jitter / 1000,
+                    args.reorder, args.reorder_delay / 1000, args.duplicate, args.rate * 1e6 / 8, args.queue * 1024,
+                    seed, args.mtu)
+
+    forward = make_link(args.seed)
+    backward = make_link(args.seed + 1) if not args.forward_only else Link(seed=args.seed + 1, mtu=args.mtu)
+    proxy = ImpairmentProxy((args.host, args.listen), (args.target, args.port), forward, backward, args.streams)
+    print(f"프록시가 {args.host}:{args.listen} -> {args.target}:{args.port}을(를) 중계합니다...")
+    proxy.serve(args.duration)
+    print(proxy.report())
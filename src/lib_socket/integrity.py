@@ -0,0 +1,85 @@
+import hashlib
+import threading
+from typing import Callable
+
+DIGEST_SIZE = 32
+# 한 번에 해싱할 크기, hashlib는 큰 버퍼를 해싱하는 동안 GIL을 놓으므로 수신/송신 루프와 겹쳐서 실행됩니다.
+DIGEST_BLOCK = 1024 * 1024
+
+
+def new_digest():
+    return hashlib.blake2b(digest_size=DIGEST_SIZE)
+
+
+class DigestWorker:
+    """
+    파일의 앞부분부터 연속된 구간을 worker 스레드에서 순서대로 해싱합니다.
+    수신측은 cum_ack가 늘어날 때마다 advance를 호출해 이미 받은 구간을 해싱해 두므로,
+    전송이 끝난 뒤에는 남은 꼬리 부분만 해싱하면 되고 파일을 다시 읽지 않습니다.
+    """
+
+    def __init__(self, read: Callable[[int, int], bytes | memoryview]):
+        """
+        Args:
+            read : (offset, length)를 받아 해당 구간의 데이터를 반환하는 함수, worker 스레드에서 호출됩니다.
+        """
+        self.read = read
+        self.hash = new_digest()
+        self.hashed = 0  # 이 오프셋 미만은 해싱 완료
+        self.target = 0
+        self.final = False
+        self.error = None
+        self.condition = threading.Condition()
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+
+    def advance(self, end: int):
+        """
+        [0, end) 구간의 데이터가 준비되었음을 알립니다. 작은 증가는 모아서 DIGEST_BLOCK 단위로 깨웁니다.
+        """
+        if end - self.target < DIGEST_BLOCK:
+            return
+        with self.condition:
+            self.target = end
+            self.condition.notify()
+
+    def result(self, file_size: int) -> bytes:
+        """
+        파일 끝까지 해싱이 끝나기를 기다려 digest를 반환합니다. 이후 advance는 호출하지 않습니다.
+        """
+        with self.condition:
+            self.target = file_size
+            self.final = True
+            self.condition.notify()
+        self.thread.join()
+        if self.error is not None:
+            raise self.error
+        return self.hash.digest()
+
+    def cancel(self):
+        """
+        수신이 중단된 경우 해싱을 멈추고 worker 스레드가 끝나기를 기다립니다.
+        """
+        with self.condition:
+            self.target = 0
+            self.final = True
+            self.condition.notify()
+        self.thread.join()
+
+    def _run(self):
+        while True:
+            with self.condition:
+                while self.hashed >= self.target and not self.final:
+                    self.condition.wait()
+                target = self.target
+                final = self.final
+            try:
+                while self.hashed < target:
+                    length = min(DIGEST_BLOCK, target - self.hashed)
+                    self.hash.update(self.read(self.hashed, length))
+                    self.hashed += length
+            except (OSError, ValueError) as e:
+                self.error = e
+                return
+            if final and self.hashed >= target:
+                return
@@ -9,6 +9,30 @@ def setup_logger(log_level=logging.INFO, log_file=None):
 
     Args:
         log_level: 로깅 레벨
-        log_file: 로그파일 경로, 없을 경우 콘솔에만 출력
+        log_file: 로그파일 경로, 없을 경우 콘솔에만 출력, 디렉터리이면 그 안에 시작 시각으로 이름 붙인 파일에 기록
+    Returns:
+        설정한 root logger
     """
+    formatter = logging.Formatter('%(asctime)s [%(levelname)s] %(name)s: %(message)s')
+    root = logging.getLogger()
+    root.setLevel(log_level)
+    # 여러 번 호출해도 핸들러가 중복되어 같은 로그가 여러 번 찍히지 않게 합니다.
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+        handler.close()
+
+    console = logging.StreamHandler(sys.stdout)
+    console.setFormatter(formatter)
+    root.addHandler(console)
+
+    if log_file:
+        directory = os.path.dirname(log_file)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        if os.path.isdir(log_file):
+            log_file = os.path.join(log_file, datetime.now().strftime('%Y%m%d_%H%M%S') + '.log')
+        file_handler = logging.FileHandler(log_file, encoding='utf-8')
+        file_handler.setFormatter(formatter)
+        root.addHandler(file_handler)
+    return root
 
@@ -0,0 +1,242 @@
+import json
+import logging
+import threading
+import time
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable
+
+logger = logging.getLogger(__name__)
+
+# 진행률 출력과 exporter 호출 사이의 최소 간격(초), 이 간격이 지표의 한 라운드가 됩니다.
+REPORT_INTERVAL = 0.2
+# 전송마다 보관하는 최근 라운드 수
+MAX_ROUNDS = 1024
+# REGISTRY에 남겨 두는 최대 전송 수, 넘으면 가장 오래된 전송부터 지웁니다.
+MAX_TRANSFERS = 64
+
+# 이름 -> 진행 중이거나 마지막으로 끝난 전송의 TransferMetrics, scrape endpoint가 이 값을 보여줍니다.
+REGISTRY = {}
+# report 주기마다 스냅샷 dict를 받는 함수들
+EXPORTERS: list[Callable[[dict], None]] = []
+
+
+def add_exporter(exporter: Callable[[dict], None]):
+    """
+    스냅샷을 받을 exporter를 등록합니다. 이후에 시작하는 모든 전송의 스냅샷이 report 주기마다 전달됩니다.
+    """
+    EXPORTERS.append(exporter)
+
+
+class TransferMetrics:
+    """
+    전송 하나의 지표를 모읍니다. 송수신 루프는 패킷마다 속성을 더하기만 하고,
+    진행률 출력, 라운드별 RTT/손실 집계, exporter 호출은 progress가 REPORT_INTERVAL마다 한 번씩만 수행합니다.
+    패킷마다 터미널에 쓰지 않으므로 초당 수십만 패킷에서도 출력이 CPU를 차지하지 않습니다.
+    """
+
+    def __init__(self, name: str, role: str, total_chunks: int, chunk_size: int, quiet: bool = False):
+        """
+        Args:
+            name : 전송을 구분하는 이름, REGISTRY의 key로 사용합니다.
+            role : 'send' 또는 'receive'
+            total_chunks : 전송할 청크의 수
+            chunk_size : 청크 하나의 크기, goodput 계산에 사용합니다.
+            quiet : True이면 진행률을 터미널에 출력하지 않고 지표만 모읍니다.
+        """
+        self.name = name
+        self.role = role
+        self.total_chunks = total_chunks
+        self.chunk_size = chunk_size
+        self.quiet = quiet
+        self.start_time = time.time()
+        self.end_time = None
+        self.last_report = 0.0
+
+        # 송수신 루프가 직접 더하는 카운터
+        self.packets_sent = 0
+        self.packets_received = 0
+        self.retransmitted = 0
+        self.duplicates = 0
+        self.delivered = 0  # 수신이 확인된(수신측은 새로 받은) 청크 수
+
+        # 현재 라운드의 누적값
+        self.round_delivered = 0
+        self.round_lost = 0
+        self.round_rtt = None  # 라운드 중 가장 작은 RTT 표본
+        self.round_rx_drops = 0
+        self.rounds = deque(maxlen=MAX_ROUNDS)
+        self.rtt = None  # 송수신 루프가 사용하는 rtt.RttEstimator, 지정되면 스냅샷에 SRTT와 RTO를 함께 기록합니다.
+
+        # 수신측 소켓의 상태 : 송신측은 ACK에 실린 보고로, 수신측은 monitor로 직접 갱신합니다.
+        self.rx_queue = None  # 수신 큐가 수신 버퍼에서 차지하는 비율
+        self.peak_rx_queue = 0.0
+        self.rx_drops = 0  # 전송 중 수신측 커널이 수신 버퍼 부족으로 버린 datagram 수
+        self.monitor = None  # 수신측이 지정하는 buffer_monitor.BufferMonitor
+        self.monitor_base = 0  # 전송을 시작할 때의 monitor.dropped
+        REGISTRY.pop(name, None)
+        REGISTRY[name] = self
+        while len(REGISTRY) > MAX_TRANSFERS:
+            del REGISTRY[next(iter(REGISTRY))]
+
+    def on_ack(self, delivered: int, lost: int, rtt: float | None):
+        """
+        송신측이 ACK(또는 NACK 확인) 한 번의 결과를 반영합니다.
+        """
+        self.delivered += delivered
+        self.round_delivered += delivered
+        self.round_lost += lost
+        if rtt is not None and (self.round_rtt is None or rtt < self.round_rtt):
+            self.round_rtt = rtt
+
+    def on_pressure(self, occupancy: int, drops: int):
+        """
+        수신측의 버퍼 상태를 반영합니다. 송신측은 보고된 손실 중 rx_drops만큼은 경로가 아니라
+        수신측이 따라가지 못해 생긴 손실로 구분합니다.
+        Args:
+            occupancy : 수신 큐가 수신 버퍼에서 차지하는 비율의 천분율
+            drops : 전송을 시작한 뒤 수신측 커널이 버린 datagram 수
+        """
+        if drops > self.rx_drops:
+            self.round_rx_drops += drops - self.rx_drops
+            self.rx_drops = drops
+        self.rx_queue = occupancy / 1000
+        self.peak_rx_queue = max(self.peak_rx_queue, self.rx_queue)
+
+    def watch(self, monitor):
+        """
+        수신측이 자신의 소켓을 관찰하는 BufferMonitor를 지정합니다. 라운드마다 monitor의 상태를 반영합니다.
+        """
+        self.monitor = monitor
+        self.monitor_base = monitor.dropped
+
+    def on_receive(self, is_new: bool):
+        """
+        수신측이 데이터 패킷 하나의 결과를 반영합니다. 이미 받은 청크이면 중복으로 셉니다.
+        """
+        self.packets_received += 1
+        if is_new:
+            self.delivered += 1
+            self.round_delivered += 1
+        else:
+            self.duplicates += 1
+
+    def _close_round(self, now: float):
+        if self.monitor is not None:
+            self.on_pressure(*self.monitor.report(self.monitor_base))
+        total = self.round_delivered + self.round_lost
+        self.rounds.append({'time': now - self.start_time, 'delivered': self.round_delivered, 'lost': self.round_lost,
+                            'loss': self.round_lost / total if total else 0.0, 'rtt': self.round_rtt,
+                            'rx_drops': self.round_rx_drops, 'rx_queue': self.rx_queue})
+        self.round_delivered = 0
+        self.round_lost = 0
+        self.round_rtt = None
+        self.round_rx_drops = 0
+
+    def snapshot(self, now: float | None = None) -> dict:
+        """
+        지금까지의 지표를 JSON으로 직렬화할 수 있는 dict로 반환합니다.
+        """
+        now = now if now is not None else time.time()
+        elapsed = (self.end_time or now) - self.start_time
+        return {
+            'name': self.name,
+            'role': self.role,
+            'time': now,
+            'elapsed': elapsed,
+            'total_chunks': self.total_chunks,
+            'delivered': self.delivered,
+            'packets_sent': self.packets_sent,
+            'packets_received': self.packets_received,
+            'retransmitted': self.retransmitted,
+            'duplicates': self.duplicates,
+            'goodput': self.delivered * self.chunk_size / elapsed if elapsed > 0 else 0.0,
+            'srtt': self.rtt.srtt if self.rtt is not None else None,
+            'rto': self.rtt.rto if self.rtt is not None else None,
+            'rx_queue': self.rx_queue,
+            'rx_drops': self.rx_drops,
+            'finished': self.end_time is not None,
+            'round': self.rounds[-1] if self.rounds else None,
+        }
+
+    def progress(self, now: float):
+        """
+        송수신 루프가 매번 호출합니다. 마지막 보고 후 REPORT_INTERVAL이 지났을 때만 라운드를 닫고 진행률을 출력합니다.
+        """
+        if now - self.last_report < REPORT_INTERVAL:
+            return
+        self.last_report = now
+        self._close_round(now)
+        self._report(now)
+
+    def _report(self, now: float):
+        snapshot = self.snapshot(now)
+        if not self.quiet:
+            percent = min(100.0, self.delivered / max(self.total_chunks, 1) * 100)
+            label = '전송' if self.role == 'send' else '수신'
+            print(f"\r{label} 진행률: {percent:.1f}% ({snapshot['goodput'] / 1e6:.2f} MB/s, "
+                  f"재전송 {self.retransmitted}, 중복 {self.duplicates})", end='')
+        round_info = snapshot['round']
+        if round_info is not None:
+            logger.debug("%s round: %s", self.name, round_info)
+        for exporter in EXPORTERS:
+            exporter(snapshot)
+
+    def finish(self):
+        """
+        전송이 끝났을 때 호출합니다. 마지막 라운드와 요약을 기록하고 exporter에 최종 스냅샷을 전달합니다.
+        """
+        now = time.time()
+        self.end_time = now
+        self._close_round(now)
+        self._report(now)
+        if not self.quiet:
+            print()
+            if self.rx_drops:
+                print(f"수신측 커널이 수신 버퍼 부족으로 {self.rx_drops}개 datagram을 버렸습니다. "
+                      f"(수신 큐 최대 점유율 {self.peak_rx_queue * 100:.0f}%)")
+        snapshot = self.snapshot(now)
+        logger.info("%s %s: %d chunks in %.3fs, goodput %.2f MB/s, sent %d, received %d, retransmitted %d, "
+                    "duplicates %d, receiver drops %d", self.role, self.name, self.delivered, snapshot['elapsed'],
+                    snapshot['goodput'] / 1e6, self.packets_sent, self.packets_received, self.retransmitted,
+                    self.duplicates, self.rx_drops)
+
+
+class JsonLinesExporter:
+    """
+    스냅샷을 한 줄에 하나씩 JSON으로 파일에 덧붙입니다.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.lock = threading.Lock()
+
+    def __call__(self, snapshot: dict):
+        line = json.dumps(snapshot, ensure_ascii=False) + '\n'
+        with self.lock, open(self.path, 'a', encoding='utf-8') as f:
+            f.write(line)
+
+
+class _ScrapeHandler(BaseHTTPRequestHandler):
+
+    def do_GET(self):
+        now = time.time()
+        body = json.dumps([metrics.snapshot(now) for metrics in list(REGISTRY.values())], ensure_ascii=False).encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        logger.debug("scrape %s", format % args)
+
+
+def start_metrics_server(port: int, host: str = 'localhost') -> ThreadingHTTPServer:
+    """
+    REGISTRY의 모든 전송의 현재 스냅샷을 JSON 배열로 돌려주는 HTTP endpoint를 daemon 스레드에서 시작합니다.
+    """
+    server = ThreadingHTTPServer((host, port), _ScrapeHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    logger.info("metrics endpoint http://%s:%d/", host, port)
+    return server
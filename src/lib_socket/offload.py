@@ -0,0 +1,115 @@
+import socket
+import struct
+import sys
+
+# linux/udp.h
+SOL_UDP = getattr(socket, 'SOL_UDP', socket.IPPROTO_UDP)
+UDP_SEGMENT = getattr(socket, 'UDP_SEGMENT', 103)
+UDP_GRO = getattr(socket, 'UDP_GRO', 104)
+
+# 커널이 한 번의 GSO 전송에서 허용하는 최대 segment 수와 전체 크기
+MAX_GSO_SEGMENTS = 64
+MAX_GSO_BYTES = 65507
+
+GRO_BUFFER_SIZE = 65535
+
+
+def max_gso_segments(segment_size: int, requested: int) -> int:
+    """
+    segment 크기에 대해 한 번에 보낼 수 있는 segment 수를 반환합니다.
+    """
+    return max(1, min(requested, MAX_GSO_SEGMENTS, MAX_GSO_BYTES // segment_size))
+
+
+def gso_supported() -> bool:
+    """
+    UDP_SEGMENT(GSO)를 사용할 수 있는지 확인합니다. Linux 4.18 이상에서만 지원됩니다.
+    """
+    if not sys.platform.startswith('linux'):
+        return False
+    with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as sock:
+        try:
+            sock.setsockopt(SOL_UDP, UDP_SEGMENT, 1400)
+        except OSError:
+            return False
+    return True
+
+
+def enable_gro(sock: socket.socket) -> bool:
+    """
+    수신 소켓에 UDP_GRO를 켭니다. 커널이 같은 흐름의 datagram을 하나의 큰 버퍼로 합쳐서 전달합니다.
+    Returns:
+        GRO를 켜는데 성공하면 True를 반환합니다.
+    """
+    if not sys.platform.startswith('linux'):
+        return False
+    try:
+        sock.setsockopt(SOL_UDP, UDP_GRO, 1)
+    except OSError:
+        return False
+    return True
+
+
+def send_segments(sock: socket.socket, buffers: list, segment_size: int, address: tuple):
+    """
+    여러 패킷을 한 번의 sendmsg로 전달하고, 커널이 segment_size 크기의 datagram으로 나누어 보내게 합니다.
+    마지막 패킷을 제외한 모든 패킷은 segment_size와 같은 크기여야 합니다.
+    buffers는 패킷들의 (헤더, 청크) 버퍼를 순서대로 나열한 scatter-gather 목록이므로 Python에서 이어붙이지 않습니다.
+    """
+    return sock.sendmsg(buffers, [(SOL_UDP, UDP_SEGMENT, struct.pack('=H', segment_size))], 0, address)
+
+
+class DatagramReceiver:
+    """
+    소켓에서 datagram을 하나씩 꺼내 줍니다.
+    미리 할당한 수신 버퍼에 recvfrom_into로 받아 그 버퍼를 가리키는 memoryview를 반환하므로 패킷마다 bytes를 만들지 않습니다.
+    GRO가 켜져 있으면 커널이 합쳐서 전달한 버퍼를 gso_size 단위로 잘라 원래의 datagram 순서대로 돌려줍니다.
+    """
+
+    def __init__(self, sock: socket.socket, buffer_size: int, gro: bool = False, monitor=None):
+        """
+        Args:
+            sock : 수신 소켓, gro가 True이면 enable_gro가 호출된 소켓이어야 합니다.
+            buffer_size : datagram 하나의 최대 크기
+            gro : GRO로 합쳐진 버퍼를 나누어 처리할지 여부
+            monitor : sock을 관찰하는 buffer_monitor.BufferMonitor, SO_RXQ_OVFL을 켰으면 recvmsg로 받아 drop 수를 전달합니다.
+                      수신 루프는 이 monitor의 상태를 ACK에 실어 송신측에 보고합니다.
+        """
+        self.sock = sock
+        self.buffer_size = buffer_size
+        self.gro = gro
+        self.monitor = monitor
+        self.ancillary = monitor is not None and monitor.drop_counter
+        self.buffer = bytearray(GRO_BUFFER_SIZE if gro else buffer_size)
+        self.view = memoryview(self.buffer)
+        self.pending = []
+        self.pending_address = None
+
+    def recvfrom(self) -> tuple[memoryview, tuple]:
+        """
+        datagram 하나와 보낸 주소를 반환합니다. 소켓의 timeout 설정을 그대로 따릅니다.
+        반환된 memoryview는 수신 버퍼를 재사용하므로 다음 recvfrom 호출 전까지만 유효합니다.
+        """
+        if self.pending:
+            return self.pending.pop(), self.pending_address
+        if not self.gro and not self.ancillary:
+            size, address = self.sock.recvfrom_into(self.buffer)
+            return self.view[:size], address
+
+        size, ancdata, _, address = self.sock.recvmsg_into([self.buffer], socket.CMSG_SPACE(4) * 2)
+        if self.ancillary:
+            self.monitor.on_ancillary(ancdata)
+        if not self.gro:
+            return self.view[:size], address
+        segment_size = size
+        for level, kind, value in ancdata:
+            if level == SOL_UDP and kind == UDP_GRO:
+                segment_size = struct.unpack('=i', value[:4])[0]
+        if segment_size >= size:
+            return self.view[:size], address
+
+        segments = [self.view[i:min(i + segment_size, size)] for i in range(0, size, segment_size)]
+        segments.reverse()
+        self.pending = segments
+        self.pending_address = address
+        return self.pending.pop(), address
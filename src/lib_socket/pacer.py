@@ -0,0 +1,80 @@
+import time
+
+# 남은 대기가 이보다 짧으면 sleep하지 않고 perf_counter_ns를 확인하며 기다립니다.
+# time.sleep은 스케줄러에 따라 50~100µs 이상 늦게 깨어나므로, 긴 대기도 이만큼을 남겨 두고 sleep한 뒤 나머지는 spin으로 맞춥니다.
+SPIN_THRESHOLD_NS = 150_000
+# 토큰을 쌓아 둘 수 있는 최대 시간, 늦게 깨어나 밀린 전송은 이 시간만큼까지 한 번에 묶어 보내 평균 속도를 맞춥니다.
+BURST_TIME = 0.002
+# 속도가 낮아도 이 개수의 패킷은 묶어서 보낼 수 있도록 토큰의 상한을 둡니다.
+BURST_PACKETS = 4
+
+
+class TokenBucketPacer:
+    """
+    바이트 단위의 token bucket으로 송신 속도를 맞춥니다. 토큰은 perf_counter_ns 기준으로 rate만큼 쌓이고,
+    패킷을 보낼 때마다 그 크기만큼 빠집니다. 토큰이 0 이상이면 보낼 수 있으며, 패킷 하나만큼은 음수로 빌려 쓸 수 있습니다.
+    대기가 늦게 끝나도 그동안 쌓인 토큰(최대 burst)으로 밀린 패킷을 묶어 보내므로, 패킷마다 time.sleep(interval)을 두는 것과 달리
+    설정한 바이트/초가 스케줄러의 깨어나는 지연과 관계없이 유지됩니다.
+    rate는 송신 루프가 언제든 바꿀 수 있습니다. (예: RateController.rate)
+    """
+
+    def __init__(self, rate: float, packet_size: int, burst_time: float = BURST_TIME,
+                 spin_threshold_ns: int = SPIN_THRESHOLD_NS):
+        """
+        Args:
+            rate : 송신 속도 (바이트/초)
+            packet_size : 패킷 하나의 크기, 토큰 상한의 하한(BURST_PACKETS개)을 정하는 데 사용합니다.
+            burst_time : 토큰을 쌓아 둘 수 있는 최대 시간(초)
+            spin_threshold_ns : 이보다 짧은 대기는 sleep하지 않고 spin합니다.
+        """
+        self.rate = rate
+        self.packet_size = packet_size
+        self.burst_time = burst_time
+        self.spin_threshold_ns = spin_threshold_ns
+        self.tokens = 0.0
+        self.last_refill = time.perf_counter_ns()
+
+    @property
+    def burst(self) -> float:
+        """
+        쌓아 둘 수 있는 토큰의 상한 (바이트)
+        """
+        return max(BURST_PACKETS * self.packet_size, self.rate * self.burst_time)
+
+    def _refill(self, now_ns: int):
+        self.tokens = min(self.burst, self.tokens + (now_ns - self.last_refill) * self.rate / 1e9)
+        self.last_refill = now_ns
+
+    def delay_ns(self) -> int:
+        """
+        다음 패킷을 보낼 수 있을 때까지 남은 시간(ns), 지금 보낼 수 있으면 0을 반환합니다.
+        """
+        self._refill(time.perf_counter_ns())
+        if self.tokens >= 0 or self.rate <= 0:
+            return 0
+        return int(-self.tokens * 1e9 / self.rate) + 1
+
+    def delay(self) -> float:
+        """
+        다음 패킷을 보낼 수 있을 때까지 남은 시간(초), 이벤트 루프처럼 직접 기다리지 않는 송신 루프가 타이머를 맞출 때 사용합니다.
+        """
+        return self.delay_ns() / 1e9
+
+    def consume(self, size: int):
+        """
+        보낸 패킷의 크기만큼 토큰을 뺍니다.
+        """
+        self.tokens -= size
+
+    def wait(self, size: int):
+        """
+        보낼 수 있을 때까지 기다린 뒤 size만큼 토큰을 뺍니다. 남은 시간이 길면 spin_threshold_ns를 남기고 sleep한 뒤 spin합니다.
+        """
+        delay_ns = self.delay_ns()
+        if delay_ns > 0:
+            deadline = self.last_refill + delay_ns
+            if delay_ns > self.spin_threshold_ns:
+                time.sleep((delay_ns - self.spin_threshold_ns) / 1e9)
+            while time.perf_counter_ns() < deadline:
+                pass
+        self.consume(size)
@@ -0,0 +1,78 @@
+import socket
+import sys
+
+# linux/in.h
+IP_MTU_DISCOVER = getattr(socket, 'IP_MTU_DISCOVER', 10)
+IP_PMTUDISC_DO = getattr(socket, 'IP_PMTUDISC_DO', 2)
+IP_PMTUDISC_PROBE = getattr(socket, 'IP_PMTUDISC_PROBE', 3)
+IP_MTU = getattr(socket, 'IP_MTU', 14)
+
+# IPv4 헤더(20) + UDP 헤더(8)
+IP_UDP_HEADER_SIZE = 28
+MAX_UDP_PAYLOAD = 65507
+# 경로 MTU를 알 수 없을 때 가정하는 MTU(이더넷)
+DEFAULT_MTU = 1500
+# 커널이 알려준 MTU의 probe가 돌아오지 않을 때(ICMP가 막힌 경로 등) 차례로 내려가 볼 MTU
+FALLBACK_MTUS = (1500, 1280, 576)
+
+
+def max_payload(mtu: int) -> int:
+    """
+    MTU가 mtu인 경로에서 조각나지 않는 가장 큰 UDP payload 크기를 반환합니다.
+    """
+    return max(1, min(mtu - IP_UDP_HEADER_SIZE, MAX_UDP_PAYLOAD))
+
+
+def set_dont_fragment(sock: socket.socket) -> bool:
+    """
+    소켓이 보내는 datagram에 DF 비트를 켜서 경로에서 조각나지 않게 합니다. (Linux 전용)
+    IP_PMTUDISC_PROBE는 커널이 캐시한 경로 MTU로 전송을 거부하지 않으므로, 경로 MTU보다 큰 probe도 보낼 수 있습니다.
+    Returns:
+        DF 비트를 켜는데 성공하면 True를 반환합니다.
+    """
+    if not sys.platform.startswith('linux'):
+        return False
+    try:
+        sock.setsockopt(socket.IPPROTO_IP, IP_MTU_DISCOVER, IP_PMTUDISC_PROBE)
+    except OSError:
+        return False
+    return True
+
+
+def path_mtu(address: tuple[str, int]) -> int | None:
+    """
+    address까지의 경로 MTU를 커널에게 묻습니다. (IP_MTU, Linux 전용)
+    처음에는 나가는 인터페이스의 MTU이고, 경로의 라우터가 ICMP로 알려주면 그 값으로 줄어듭니다.
+    Returns:
+        경로 MTU, 알 수 없으면 None을 반환합니다.
+    """
+    if not sys.platform.startswith('linux'):
+        return None
+    with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as sock:
+        try:
+            sock.setsockopt(socket.IPPROTO_IP, IP_MTU_DISCOVER, IP_PMTUDISC_DO)
+            sock.connect(address)
+            return sock.getsockopt(socket.IPPROTO_IP, IP_MTU)
+        except OSError:
+            return None
+
+
+def path_payload(address: tuple[str, int]) -> int:
+    """
+    커널이 알려준 경로 MTU에서 조각나지 않는 가장 큰 UDP payload 크기를 반환합니다.
+    """
+    return max_payload(path_mtu(address) or DEFAULT_MTU)
+
+
+def payload_candidates(address: tuple[str, int], limit: int = 0) -> list[int]:
+    """
+    경로 MTU probe로 확인해 볼 패킷 크기를 큰 것부터 반환합니다.
+    커널이 알려준 경로 MTU의 payload와, 그보다 작은 FALLBACK_MTUS의 payload로 구성됩니다.
+    Args:
+        limit : 0보다 크면 이 크기보다 큰 후보는 limit으로 줄입니다.
+    """
+    mtu = path_mtu(address) or DEFAULT_MTU
+    sizes = [max_payload(mtu)] + [max_payload(fallback) for fallback in FALLBACK_MTUS if fallback < mtu]
+    if limit > 0:
+        sizes = [min(size, limit) for size in sizes]
+    return sorted(set(sizes), reverse=True)
@@ -0,0 +1,223 @@
+import struct
+import zlib
+
+# 파일 정보 패킷 : buffer_size, total_chunks, filename
+FILE_INFO = struct.Struct('!II256s')
+# 파일 정보 확장 필드 : flags, window_size, streams
+# 기존 서버는 FILE_INFO 이후의 바이트를 무시하므로 확장 필드를 붙여도 호환됩니다.
+FILE_INFO_EXT = struct.Struct('!III')
+
+# 데이터 패킷 헤더 : seq_num, chunk_size
+DATA_HEADER = struct.Struct('!II')
+# 압축 모드에서 chunk_size 필드의 최상위 비트가 켜져 있으면 청크가 압축되어 있고, 나머지 비트는 압축된 길이입니다.
+COMPRESSED_BIT = 0x80000000
+
+# 데이터 패킷 타임스탬프 : ts_val, ts_ecr (rtt.TimestampEcho)
+# FLAG_TIMESTAMP이 켜져 있으면 데이터 패킷 헤더 바로 뒤에 들어가며, ACK에 되돌아온 ts_val로 송신측이 RTT를 잽니다.
+DATA_TIMESTAMP = struct.Struct('!II')
+
+# 청크 체크섬 : FLAG_CHECKSUM이 켜져 있으면 데이터 패킷 헤더와 청크 사이에 청크의 CRC32가 들어갑니다.
+CHUNK_CHECKSUM = struct.Struct('!I')
+
+# FEC parity 패킷 헤더 : PARITY_BIT | group_start, group_count, length_xor
+# 데이터 패킷과 같은 크기이며, 첫 필드의 최상위 비트로 데이터 패킷과 구분합니다.
+# parity는 [group_start, group_start + group_count) 청크들을 chunk_size로 0-padding해 XOR한 값이고,
+# length_xor는 그 청크들의 길이를 XOR한 값입니다.
+FEC_HEADER = struct.Struct('!IHH')
+PARITY_BIT = 0x80000000
+
+# 델타 모드 청크 서명 : adler32, blake2b(16)
+# 송신측은 새 파일의 청크마다 서명을 만들어 파일보다 먼저 같은 데이터 경로로 보내고,
+# 수신측은 이전 버전에서 같은 서명의 블록을 찾아 채운 뒤 나머지 청크만 요청합니다.
+SIGNATURE = struct.Struct('!I16s')
+# 묶음 전송 스트림의 머리 : 파일 수, manifest 전체 길이(머리 포함)
+# 스트림은 머리, 파일마다 BATCH_ENTRY + UTF-8 상대 경로, 파일 내용을 manifest 순서대로 이어 붙인 데이터로 구성됩니다.
+BATCH_HEADER = struct.Struct('!II')
+# 묶음 전송 manifest 항목 : 파일 크기, mtime_ns, 상대 경로 길이
+BATCH_ENTRY = struct.Struct('!QQH')
+
+# 세션 모드 패킷 헤더 : kind, session_id
+# 세션 모드에서는 모든 패킷(파일 정보, 데이터, ACK) 앞에 이 헤더가 붙어 하나의 수신 소켓에서 여러 전송을 구분합니다.
+SESSION_HEADER = struct.Struct('!BI')
+KIND_INFO = 1
+KIND_DATA = 2
+KIND_ACK = 3
+KIND_ACCEPT = 4
+KIND_RECEIPT = 5
+
+FLAG_SELECTIVE_REPEAT = 0x1
+FLAG_STRIPED = 0x2
+FLAG_SESSION = 0x4
+FLAG_FEC = 0x8
+FLAG_CHECKSUM = 0x10
+FLAG_RESUME = 0x20
+FLAG_DELTA = 0x40
+# 청크 압축 코덱, 압축되지 않은 청크(COMPRESSED_BIT가 꺼진 청크)와 섞여 올 수 있습니다.
+FLAG_ZLIB = 0x80
+FLAG_LZMA = 0x100
+# 여러 파일을 묶은 스트림을 하나의 파일처럼 전송하고, 수신측이 manifest에 따라 디렉터리로 풉니다.
+FLAG_BATCH = 0x200
+# 데이터 패킷에 DATA_TIMESTAMP를 싣고, 수신측이 ACK에 타임스탬프를 되돌려 줍니다.
+FLAG_TIMESTAMP = 0x400
+
+# 이어받기 정보 : file_size, mtime_ns
+# FLAG_RESUME이 켜져 있으면 FILE_INFO_EXT 뒤에 붙어, 수신측이 이전에 받던 파일과 같은 파일인지 확인하는 데 사용합니다.
+RESUME_INFO = struct.Struct('!QQ')
+
+# 경로 MTU probe : PROBE + PROBE_SIZE(probe 전체 크기), 나머지는 0으로 채워 probe 전체 크기를 맞춥니다.
+# 수신측은 받은 probe의 크기가 맞으면 PROBE + PROBE_SIZE만 돌려보내므로, 송신측은 돌아온 크기 중 가장 큰 것을 패킷 크기로 씁니다.
+PROBE = b'PROBE'
+PROBE_SIZE = struct.Struct('!I')
+# 파일 정보에 대한 수신측의 수락 응답 : ACCEPT + ACCEPT_INFO(flags, window_size)
+# flags는 수신측이 받아들인 기능, window_size는 수신측의 수신 버퍼에 들어가도록 줄인 윈도우입니다.
+# 송신측은 수락 응답을 받은 뒤에 데이터를 보내고, 응답이 없으면 같은 파일 정보를 다시 보냅니다.
+# 세션 모드에서는 ACCEPT 대신 KIND_ACCEPT 세션 헤더 뒤에 ACCEPT_INFO가 붙습니다.
+ACCEPT = b'ACCEPT'
+ACCEPT_INFO = struct.Struct('!II')
+
+# 수신측이 스트라이프별 수신 소켓을 모두 준비했음을 알리는 메시지
+STRIPES_READY = b'STRIPES_READY'
+# 수신 완료 후 수신측이 보내는 영수증 : RECEIPT + 수신한 파일의 digest (세션 모드에서는 KIND_RECEIPT)
+RECEIPT = b'RECEIPT'
+# 이어받기/델타 요청에 대한 수신측의 응답 : RESUME + 이미 받은 청크를 알리는 ACK datagram (sack.pack_ack 형식)
+# highest는 total_chunks이고, 누락 구간이 많으면 ACK처럼 여러 datagram으로 나뉩니다.
+RESUME = b'RESUME'
+# 데이터 전송 중에 늦게 도착할 수 있는 핸드셰이크 응답들, ACK로 해석하지 않고 버립니다.
+HANDSHAKE_REPLIES = (PROBE, ACCEPT, RESUME)
+
+
+def pack_file_info(buffer_size: int, total_chunks: int, filename: str, flags: int = 0, window_size: int = 0,
+                   streams: int = 1, resume_info: tuple[int, int] | None = None) -> bytes:
+    """
+    파일 정보 패킷을 구성합니다. flags가 0이면 기존 형식과 동일한 패킷을 반환합니다.
+    Args:
+        buffer_size : 데이터 패킷 하나의 크기
+        total_chunks : 전송할 청크의 수
+        filename : 전송할 파일 이름
+        flags : 전송 모드 플래그
+        window_size : selective-repeat 모드에서 사용하는 in-flight 윈도우 크기
+        streams : 스트라이핑 모드에서 사용하는 소켓(포트)의 수
+        resume_info : FLAG_RESUME과 함께 보낼 송신측 파일의 (file_size, mtime_ns)
+    """
+    packed = FILE_INFO.pack(buffer_size, total_chunks, filename.encode()[:256])
+    if flags:
+        packed += FILE_INFO_EXT.pack(flags, window_size, streams)
+    if flags & FLAG_RESUME and resume_info is not None:
+        packed += RESUME_INFO.pack(*resume_info)
+    return packed
+
+
+def unpack_file_info(data: bytes) -> tuple[int, int, bytes, int, int, int]:
+    """
+    파일 정보 패킷을 해석합니다. 확장 필드가 없는 경우 flags와 window_size는 0, streams는 1입니다.
+    Returns:
+        (buffer_size, total_chunks, filename, flags, window_size, streams)
+    Raises:
+        struct.error : 패킷의 길이가 부족한 경우 발생합니다.
+    """
+    buffer_size, total_chunks, filename = FILE_INFO.unpack_from(data)
+    flags, window_size, streams = 0, 0, 1
+    if len(data) >= FILE_INFO.size + FILE_INFO_EXT.size:
+        flags, window_size, streams = FILE_INFO_EXT.unpack_from(data, FILE_INFO.size)
+    return buffer_size, total_chunks, filename, flags, window_size, streams
+
+
+def unpack_resume_info(data: bytes) -> tuple[int, int] | None:
+    """
+    파일 정보 패킷에서 이어받기 정보를 꺼냅니다.
+    Returns:
+        (file_size, mtime_ns), 이어받기 정보가 없으면 None을 반환합니다.
+    """
+    offset = FILE_INFO.size + FILE_INFO_EXT.size
+    if len(data) < offset + RESUME_INFO.size:
+        return None
+    return RESUME_INFO.unpack_from(data, offset)
+
+
+def pack_probe(size: int) -> bytes:
+    """
+    전체 크기가 size인 경로 MTU probe를 구성합니다.
+    """
+    header = PROBE + PROBE_SIZE.pack(size)
+    return header + bytes(max(0, size - len(header)))
+
+
+def probe_size(data: bytes | memoryview) -> int | None:
+    """
+    probe 또는 probe 응답에 적힌 크기를 반환합니다. probe가 아니면 None을 반환합니다.
+    """
+    if len(data) < len(PROBE) + PROBE_SIZE.size or bytes(data[:len(PROBE)]) != PROBE:
+        return None
+    return PROBE_SIZE.unpack_from(data, len(PROBE))[0]
+
+
+def pack_accept(flags: int, window_size: int, prefix: bytes = ACCEPT) -> bytes:
+    """
+    수락 응답을 구성합니다. 세션 모드에서는 prefix로 KIND_ACCEPT 세션 헤더를 넘깁니다.
+    """
+    return prefix + ACCEPT_INFO.pack(flags, window_size)
+
+
+def unpack_accept(data: bytes, prefix: bytes = ACCEPT) -> tuple[int, int] | None:
+    """
+    수락 응답을 해석합니다.
+    Returns:
+        (flags, window_size), prefix로 시작하는 수락 응답이 아니면 None을 반환합니다.
+    """
+    if len(data) < len(prefix) + ACCEPT_INFO.size or not data.startswith(prefix):
+        return None
+    return ACCEPT_INFO.unpack_from(data, len(prefix))
+
+
+def data_header_size(checksum: bool = False, timestamps: bool = False) -> int:
+    """
+    데이터 패킷에서 청크 앞에 오는 헤더의 크기를 반환합니다. (세션 헤더 제외)
+    """
+    return DATA_HEADER.size + (DATA_TIMESTAMP.size if timestamps else 0) + (CHUNK_CHECKSUM.size if checksum else 0)
+
+
+def chunk_payload(data: bytes | memoryview, chunk_size: int, checksum: bool = False, codec=None,
+                  max_length: int = 0, timestamps: bool = False) -> bytes | memoryview | None:
+    """
+    DATA_HEADER로 시작하는 데이터 패킷에서 청크를 꺼냅니다.
+    timestamps가 True이면 헤더 뒤의 DATA_TIMESTAMP를 건너뜁니다.
+    checksum이 True이면 CRC32(압축된 경우 압축된 바이트의)를 확인하고, 일치하지 않으면 손상된 패킷으로 보고 None을 반환합니다.
+    chunk_size에 COMPRESSED_BIT가 켜져 있으면 codec으로 max_length 이하의 청크로 복원하고, 복원할 수 없으면 None을 반환합니다.
+    """
+    length = chunk_size & ~COMPRESSED_BIT
+    start = DATA_HEADER.size + (DATA_TIMESTAMP.size if timestamps else 0)
+    if checksum:
+        (crc,) = CHUNK_CHECKSUM.unpack_from(data, start)
+        start += CHUNK_CHECKSUM.size
+    chunk = data[start:start + length]
+    if checksum and zlib.crc32(chunk) != crc:
+        return None
+    if chunk_size & COMPRESSED_BIT:
+        if codec is None:
+            return None
+        return codec.decompress(chunk, max_length)
+    return chunk
+
+
+def stripe_ranges(total_chunks: int, streams: int) -> list[tuple[int, int]]:
+    """
+    스트라이핑 모드에서 각 스트림이 담당할 seq 구간 [first_seq, end_seq)를 계산합니다.
+    송신측과 수신측이 같은 함수로 구간을 나누므로 별도로 구간을 주고받지 않습니다.
+    """
+    return [(total_chunks * i // streams, total_chunks * (i + 1) // streams) for i in range(streams)]
+
+
+def pack_session(kind: int, session_id: int, payload: bytes = b'') -> bytes:
+    """
+    세션 헤더를 붙인 패킷을 구성합니다.
+    """
+    return SESSION_HEADER.pack(kind, session_id) + payload
+
+
+def strip_session(data: bytes, kind: int, session_id: int) -> memoryview | None:
+    """
+    세션 헤더를 확인하고 떼어낸 payload를 반환합니다. 종류나 session_id가 다르면 None을 반환합니다.
+    """
+    if len(data) < SESSION_HEADER.size or SESSION_HEADER.unpack_from(data) != (kind, session_id):
+        return None
+    return memoryview(data)[SESSION_HEADER.size:]
@@ -0,0 +1,191 @@
+import math
+from collections import deque
+
+KB = 1024
+MB = 1024 * KB
+
+DEFAULT_RTT = 0.1
+
+
+class RateController:
+    """
+    전송 속도(바이트/초)를 결정하는 혼잡 제어기의 기본 클래스입니다.
+    송신 루프는 pacer.TokenBucketPacer로 rate에 맞춰 패킷을 보내고, ACK를 받을 때마다 on_ack로 결과를 알려줍니다.
+    """
+
+    def __init__(self, packet_size: int, initial_rate: float = MB, min_rate: float = 64 * KB,
+                 max_rate: float = 10 * 1024 * MB):
+        """
+        Args:
+            packet_size : 패킷 하나의 크기 (바이트)
+            initial_rate : 전송을 시작할 때의 속도 (바이트/초)
+            min_rate : 속도의 하한
+            max_rate : 속도의 상한
+        """
+        self.packet_size = packet_size
+        self.min_rate = min_rate
+        self.max_rate = max_rate
+        self.rate = self._clamp(initial_rate)
+
+    def _clamp(self, rate: float) -> float:
+        return min(self.max_rate, max(self.min_rate, rate))
+
+    @property
+    def interval(self) -> float:
+        """
+        패킷 사이의 전송 간격(초)
+        """
+        return self.packet_size / self.rate
+
+    def on_ack(self, delivered: int, lost: int, rtt: float | None, now: float):
+        """
+        ACK 한 번의 결과를 반영해 전송 속도를 조절합니다.
+        Args:
+            delivered : 이번 ACK로 새로 수신 확인된 패킷 수
+            lost : 이번 ACK로 손실이 확인된 패킷 수
+            rtt : 이번 ACK에서 측정한 왕복 시간, 측정할 수 없으면 None
+            now : 현재 시각
+        """
+        raise NotImplementedError
+
+
+class AIMDController(RateController):
+    """
+    손실 기반 AIMD 제어기입니다. 첫 손실 전까지는 RTT마다 속도를 두 배로 올리고(slow start),
+    이후에는 RTT마다 패킷 하나만큼의 윈도우를 늘리다가 손실이 보이면 decrease_factor를 곱합니다.
+    """
+
+    def __init__(self, packet_size: int, initial_rate: float = MB, min_rate: float = 64 * KB,
+                 max_rate: float = 10 * 1024 * MB, decrease_factor: float = 0.7):
+        super().__init__(packet_size, initial_rate, min_rate, max_rate)
+        self.decrease_factor = decrease_factor
+        self.slow_start = True
+        self.srtt = None
+        self.last_decrease = -math.inf
+
+    def on_ack(self, delivered: int, lost: int, rtt: float | None, now: float):
+        if rtt is not None:
+            self.srtt = rtt if self.srtt is None else 0.875 * self.srtt + 0.125 * rtt
+        srtt = self.srtt or DEFAULT_RTT
+
+        if lost > 0:
+            # 한 RTT 안에 보고된 손실은 한 번의 혼잡 신호로 취급합니다.
+            if now - self.last_decrease >= srtt:
+                self.rate = self._clamp(self.rate * self.decrease_factor)
+                self.last_decrease = now
+            self.slow_start = False
+            return
+
+        delivered_bytes = delivered * self.packet_size
+        if self.slow_start:
+            # 윈도우(rate * rtt)가 수신 확인된 바이트만큼 늘어나므로 RTT마다 두 배가 됩니다.
+            self.rate = self._clamp(self.rate + delivered_bytes / srtt)
+        else:
+            # 수신 확인된 패킷마다 윈도우를 packet_size / 윈도우 패킷 수만큼 늘립니다.
+            self.rate = self._clamp(self.rate + self.packet_size * delivered_bytes / (self.rate * srtt * srtt))
+
+
+class DelayProbingController(RateController):
+    """
+    병목 대역폭과 최소 RTT를 추정해 전송 속도를 정하는 제어기입니다 (BBR 방식).
+    전송 속도는 최근 전송률 표본의 최대값에 pacing_gain을 곱한 값이며, pacing_gain은 주기적으로
+    1.25(대역폭 탐색)와 0.75(큐 비우기)를 오갑니다. RTT가 최소 RTT보다 크게 늘어나거나
+    손실률이 loss_threshold를 넘으면 대역폭 추정치를 낮춥니다.
+    """
+
+    STARTUP_GAIN = 2.0
+    GAIN_CYCLE = (1.25, 0.75, 1.0, 1.0, 1.0, 1.0, 1.0, 1.0)
+
+    def __init__(self, packet_size: int, initial_rate: float = MB, min_rate: float = 64 * KB,
+                 max_rate: float = 10 * 1024 * MB, bw_window: int = 10, loss_threshold: float = 0.02,
+                 queue_threshold: float = 1.5):
+        """
+        Args:
+            bw_window : 대역폭 추정에 사용할 최근 라운드의 수
+            loss_threshold : 이 비율을 넘는 손실은 혼잡으로 판단합니다.
+            queue_threshold : RTT가 최소 RTT의 이 배수를 넘으면 큐가 쌓이는 것으로 판단합니다.
+        """
+        super().__init__(packet_size, initial_rate, min_rate, max_rate)
+        self.loss_threshold = loss_threshold
+        self.queue_threshold = queue_threshold
+
+        self.bw_samples = deque(maxlen=bw_window)
+        self.btl_bw = None
+        self.min_rtt = None
+        self.startup = True
+        self.full_bw = 0.0
+        self.full_bw_count = 0
+
+        self.cycle_index = 0
+        self.cycle_start = None
+        self.last_ack_time = None
+
+    def _update_rate(self, gain: float):
+        self.rate = self._clamp(gain * self.btl_bw)
+
+    def on_ack(self, delivered: int, lost: int, rtt: float | None, now: float):
+        if rtt is not None and (self.min_rtt is None or rtt < self.min_rtt):
+            self.min_rtt = rtt
+        min_rtt = self.min_rtt or DEFAULT_RTT
+
+        if self.last_ack_time is None:
+            self.last_ack_time = now
+            self.cycle_start = now
+            return
+
+        elapsed = now - self.last_ack_time
+        self.last_ack_time = now
+        if elapsed > 0 and delivered > 0:
+            self.bw_samples.append(delivered * self.packet_size / elapsed)
+            self.btl_bw = max(self.bw_samples)
+        if self.btl_bw is None:
+            return
+
+        congested = lost > 0 and lost / (lost + delivered) > self.loss_threshold
+        queueing = rtt is not None and rtt > min_rtt * self.queue_threshold
+
+        if self.startup:
+            # 대역폭 추정치가 세 라운드 연속 25% 이상 늘지 않으면 startup을 끝냅니다.
+            if self.btl_bw >= self.full_bw * 1.25:
+                self.full_bw = self.btl_bw
+                self.full_bw_count = 0
+            else:
+                self.full_bw_count += 1
+            if self.full_bw_count >= 3 or congested:
+                self.startup = False
+            else:
+                self._update_rate(self.STARTUP_GAIN)
+                return
+
+        if congested:
+            self.btl_bw *= 0.85
+            self.bw_samples.clear()
+            self.bw_samples.append(self.btl_bw)
+
+        if now - self.cycle_start >= min_rtt:
+            self.cycle_index = (self.cycle_index + 1) % len(self.GAIN_CYCLE)
+            self.cycle_start = now
+
+        gain = self.GAIN_CYCLE[self.cycle_index]
+        if queueing:
+            gain = min(gain, 0.75)
+        self._update_rate(gain)
+
+
+RATE_CONTROLLERS = {
+    'aimd': AIMDController,
+    'probe': DelayProbingController,
+}
+
+
+def make_rate_controller(name: str, packet_size: int, initial_rate: float = MB) -> RateController | None:
+    """
+    이름으로 제어기를 생성합니다. name이 'none'이면 None을 반환해 interval로 정한 고정 속도를 사용하게 합니다.
+    Raises:
+        ValueError : 알 수 없는 제어기 이름인 경우 발생합니다.
+    """
+    if name == 'none':
+        return None
+    if name not in RATE_CONTROLLERS:
+        raise ValueError(f"알 수 없는 rate controller: {name}")
+    return RATE_CONTROLLERS[name](packet_size, initial_rate)
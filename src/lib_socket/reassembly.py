@@ -0,0 +1,183 @@
+import os
+from array import array
+
+from window import ReceiveWindow
+
+
+class Reassembler:
+    """
+    수신 상태(ReceiveWindow)를 관리하는 reassembler의 공통 부분입니다.
+    write에 전달되는 chunk_data는 수신 버퍼를 가리키는 memoryview일 수 있으므로, 하위 클래스는 참조를 보관하지 말고
+    write 안에서 복사하거나 기록해야 합니다.
+    """
+
+    def __init__(self, total_chunks: int, first_seq: int = 0):
+        self.total_chunks = total_chunks
+        self.window = ReceiveWindow(total_chunks, first_seq)
+
+    @property
+    def received_count(self) -> int:
+        return self.window.received_count
+
+    def complete(self) -> bool:
+        return self.window.complete()
+
+    def missing_ranges(self) -> array:
+        """
+        전체 청크 중 아직 받지 못한 구간을 (start, count) 쌍으로 반환합니다.
+        """
+        return self.window.missing_ranges(self.total_chunks)
+
+    def chunk_length(self, seq_num: int) -> int:
+        """
+        수신한 청크의 길이를 반환합니다. 마지막 청크만 chunk_size보다 짧을 수 있습니다.
+        """
+        return min(self.chunk_size, self.file_size - seq_num * self.chunk_size)
+
+
+class MemoryReassembler(Reassembler):
+    """
+    파일 크기의 버퍼를 미리 할당해 수신한 청크를 해당 오프셋에 복사해 두었다가, 모든 청크를 받은 뒤 한 번에 파일로 씁니다.
+    청크마다 bytes 객체를 만들지 않으므로 패킷 수가 많아도 할당과 GC 부담이 늘지 않습니다.
+    """
+
+    def __init__(self, total_chunks: int, chunk_size: int, first_seq: int = 0):
+        """
+        Args:
+            total_chunks : 수신할 청크의 수
+            chunk_size : 마지막 청크를 제외한 청크 하나의 크기
+            first_seq : 수신할 구간의 첫 seq
+        """
+        super().__init__(total_chunks, first_seq)
+        self.chunk_size = chunk_size
+        self.file_size = total_chunks * chunk_size
+        self.buffer = bytearray(self.file_size)
+
+    def write(self, seq_num: int, chunk_data: bytes | memoryview) -> bool:
+        """
+        청크를 저장합니다. 처음 받은 청크이면 True, 중복이면 False를 반환합니다.
+        """
+        if not self.window.mark(seq_num):
+            return False
+        offset = seq_num * self.chunk_size
+        self.buffer[offset:offset + len(chunk_data)] = chunk_data
+        if seq_num == self.total_chunks - 1:
+            self.file_size = offset + len(chunk_data)
+        return True
+
+    def read(self, seq_num: int) -> memoryview:
+        """
+        이미 수신한 청크를 반환합니다.
+        """
+        return self.read_range(seq_num * self.chunk_size, self.chunk_length(seq_num))
+
+    def read_range(self, offset: int, length: int) -> memoryview:
+        return memoryview(self.buffer)[offset:offset + length]
+
+    def finish(self, file_path: str):
+        """
+        보관한 청크를 파일에 씁니다.
+        """
+        missed = self.missing_ranges()
+        for i in range(0, len(missed), 2):
+            print(f"경고: 청크 {missed[i]}~{missed[i] + missed[i + 1] - 1} 유실")
+        with open(file_path, 'wb') as f:
+            f.write(memoryview(self.buffer)[:self.file_size])
+        self.buffer = bytearray()
+
+    def close(self):
+        self.buffer = bytearray()
+
+
+class WriteThroughReassembler(Reassembler):
+    """
+    대상 파일을 미리 할당해 두고, 청크가 도착하는 즉시 해당 오프셋에 씁니다.
+    메모리에는 청크당 1바이트의 수신 비트맵만 남으므로 파일 크기와 관계없이 사용량이 일정합니다.
+    """
+
+    def __init__(self, file_path: str, total_chunks: int, chunk_size: int, first_seq: int = 0, create: bool = True,
+                 resumable: bool = False):
+        """
+        Args:
+            file_path : 수신한 데이터를 쓸 파일 경로
+            total_chunks : 수신할 청크의 수, first_seq를 지정한 경우 수신할 구간의 끝 seq(미포함)입니다.
+            chunk_size : 마지막 청크를 제외한 청크 하나의 크기
+            first_seq : 수신할 구간의 첫 seq
+            create : True이면 파일을 새로 만들어 미리 할당하고, 완료 시 실제 크기로 줄입니다.
+                     False이면 다른 reassembler가 만든 파일의 해당 구간에만 씁니다.
+            resumable : True이면 기존 파일의 내용을 지우지 않고 열며, 수신이 중단되어도 부분 파일을 남겨 둡니다.
+        """
+        super().__init__(total_chunks, first_seq)
+        self.file_path = file_path
+        self.chunk_size = chunk_size
+        self.file_size = total_chunks * chunk_size
+        self.create = create
+        self.resumable = resumable
+
+        if not create:
+            self.fd = os.open(file_path, os.O_RDWR | getattr(os, 'O_BINARY', 0))
+            return
+
+        truncate = 0 if resumable else os.O_TRUNC
+        self.fd = os.open(file_path, os.O_RDWR | os.O_CREAT | truncate | getattr(os, 'O_BINARY', 0), 0o644)
+        try:
+            if hasattr(os, 'posix_fallocate') and self.file_size > 0:
+                os.posix_fallocate(self.fd, 0, self.file_size)
+            else:
+                os.truncate(self.fd, self.file_size)
+        except OSError:
+            # fallocate를 지원하지 않는 파일시스템에서는 sparse 파일로 대신합니다.
+            os.truncate(self.fd, self.file_size)
+
+    def resume(self, received: bytearray, file_size: int):
+        """
+        이전 전송에서 이미 파일에 쓴 청크를 수신한 것으로 표시합니다.
+        마지막 청크를 이미 받았을 수 있으므로 파일 크기도 송신측이 알려준 값으로 확정합니다.
+        """
+        self.window.restore(received)
+        self.file_size = file_size
+
+    def write(self, seq_num: int, chunk_data: bytes | memoryview) -> bool:
+        if not self.window.mark(seq_num):
+            return False
+        offset = seq_num * self.chunk_size
+        if hasattr(os, 'pwrite'):
+            os.pwrite(self.fd, chunk_data, offset)
+        else:
+            os.lseek(self.fd, offset, os.SEEK_SET)
+            os.write(self.fd, chunk_data)
+        if seq_num == self.total_chunks - 1:
+            # 마지막 청크는 chunk_size보다 작을 수 있으므로 실제 파일 크기를 여기서 확정합니다.
+            self.file_size = offset + len(chunk_data)
+        return True
+
+    def read(self, seq_num: int) -> bytes:
+        """
+        이미 파일에 쓴 청크를 다시 읽습니다. 방금 쓴 데이터이므로 대부분 페이지 캐시에서 읽힙니다.
+        """
+        return self.read_range(seq_num * self.chunk_size, self.chunk_length(seq_num))
+
+    def read_range(self, offset: int, length: int) -> bytes:
+        if hasattr(os, 'pread'):
+            return os.pread(self.fd, length, offset)
+        os.lseek(self.fd, offset, os.SEEK_SET)
+        return os.read(self.fd, length)
+
+    def finish(self, file_path: str = None):
+        """
+        미리 할당한 크기를 실제 파일 크기로 줄이고 파일을 닫습니다.
+        """
+        if self.create:
+            os.truncate(self.fd, self.file_size)
+        os.close(self.fd)
+        self.fd = None
+
+    def close(self):
+        """
+        수신이 중단된 경우 파일을 닫고 불완전한 파일을 삭제합니다. resumable이면 이어받을 수 있도록 남겨 둡니다.
+        """
+        if self.fd is not None:
+            os.close(self.fd)
+            self.fd = None
+            if self.create and not self.resumable:
+                os.remove(self.file_path)
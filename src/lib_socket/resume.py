@@ -0,0 +1,103 @@
+import os
+import struct
+
+# 이어받기 상태 파일은 부분 파일 옆에 이 접미사로 저장됩니다.
+RESUME_SUFFIX = '.resume'
+# 이어받기 상태 파일 헤더 : buffer_size, total_chunks, file_size, mtime_ns
+# 송신측 파일의 크기와 수정 시각이 같을 때만 이전 수신 결과를 이어서 사용합니다.
+RESUME_STATE = struct.Struct('!IIQQ')
+# 수신 중 상태 파일을 저장하는 간격(초)
+SAVE_INTERVAL = 1.0
+
+_TO_DIGITS = bytes.maketrans(b'\x00\x01', b'01')
+_FROM_DIGITS = bytes.maketrans(b'01', b'\x00\x01')
+
+
+def pack_bitmap(received: bytearray) -> bytes:
+    """
+    seq마다 0/1 한 바이트인 수신 비트맵을 한 비트씩으로 압축합니다.
+    2진수 문자열과 정수 변환은 C에서 선형 시간에 처리되므로 비트마다 반복하지 않습니다.
+    """
+    if not received:
+        return b''
+    digits = received.translate(_TO_DIGITS)[::-1]
+    return int(digits, 2).to_bytes((len(received) + 7) // 8, 'little')
+
+
+def unpack_bitmap(packed: bytes, total_chunks: int) -> bytearray:
+    """
+    pack_bitmap으로 압축한 비트맵을 seq마다 한 바이트인 bytearray로 되돌립니다.
+    """
+    if total_chunks == 0:
+        return bytearray()
+    digits = format(int.from_bytes(packed, 'little'), f'0{total_chunks}b').encode()
+    return bytearray(digits[::-1].translate(_FROM_DIGITS))
+
+
+def remove_resume_state(file_path: str):
+    """
+    file_path 옆의 이어받기 상태 파일을 삭제합니다. 이어받기가 아닌 전송이 같은 파일을 덮어쓸 때도 호출해,
+    오래된 상태가 새 파일의 내용을 가리키지 않게 합니다.
+    """
+    try:
+        os.remove(file_path + RESUME_SUFFIX)
+    except FileNotFoundError:
+        pass
+
+
+class ResumeState:
+    """
+    수신 중인 파일의 수신 비트맵을 부분 파일 옆에 주기적으로 저장합니다.
+    수신이 중단되어도 다음 전송에서 이미 받은 청크를 건너뛸 수 있습니다.
+    비트맵은 청크를 파일에 쓴 뒤에 저장하므로, 저장된 비트가 가리키는 청크는 항상 파일에 존재합니다.
+    """
+
+    def __init__(self, file_path: str, buffer_size: int, total_chunks: int, file_size: int, mtime_ns: int):
+        """
+        Args:
+            file_path : 수신 중인 파일의 경로
+            buffer_size, total_chunks : 전송 설정, 다르면 이전 상태를 사용하지 않습니다.
+            file_size, mtime_ns : 송신측 파일의 크기와 수정 시각
+        """
+        self.path = file_path + RESUME_SUFFIX
+        self.header = RESUME_STATE.pack(buffer_size, total_chunks, file_size, mtime_ns)
+        self.total_chunks = total_chunks
+        self.last_save = 0.0
+
+    def load(self) -> bytearray | None:
+        """
+        저장된 수신 비트맵을 읽습니다. 상태 파일이 없거나 다른 전송의 상태이면 None을 반환합니다.
+        """
+        try:
+            with open(self.path, 'rb') as f:
+                data = f.read()
+        except FileNotFoundError:
+            return None
+        if not data.startswith(self.header):
+            return None
+        return unpack_bitmap(data[RESUME_STATE.size:], self.total_chunks)
+
+    def save(self, received: bytearray, now: float | None = None):
+        """
+        수신 비트맵을 저장합니다. 임시 파일에 쓴 뒤 교체하므로 저장 도중 중단되어도 이전 상태가 남습니다.
+        """
+        temp_path = self.path + '.tmp'
+        with open(temp_path, 'wb') as f:
+            f.write(self.header)
+            f.write(pack_bitmap(received))
+        os.replace(temp_path, self.path)
+        if now is not None:
+            self.last_save = now
+
+    def maybe_save(self, received: bytearray, now: float):
+        """
+        마지막 저장 후 SAVE_INTERVAL이 지났으면 저장합니다. 수신 루프에서 매 패킷 호출합니다.
+        """
+        if now - self.last_save >= SAVE_INTERVAL:
+            self.save(received, now)
+
+    def remove(self):
+        """
+        수신이 완료되어 더 이상 필요 없는 상태 파일을 삭제합니다.
+        """
+        remove_resume_state(self.path[:-len(RESUME_SUFFIX)])
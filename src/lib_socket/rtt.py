@@ -0,0 +1,138 @@
+import math
+
+# RFC 6298의 SRTT/RTTVAR 가중치와 RTO = SRTT + max(G, K * RTTVAR)의 K
+RTT_ALPHA = 1 / 8
+RTT_BETA = 1 / 4
+RTO_K = 4
+# 시계의 해상도(G), 타임스탬프는 마이크로초 단위이지만 스케줄링 지연을 고려해 1ms로 둡니다.
+CLOCK_GRANULARITY = 0.001
+# RTO의 범위, RFC 6298의 최솟값 1초는 LAN에서 손실 뒤의 대기 시간을 지나치게 늘리므로 더 낮춥니다.
+MIN_RTO = 0.01
+MAX_RTO = 2.0
+# 상대가 응답하지 않는다고 판단하기까지 기다리는 RTO의 배수, 기존의 고정 시간보다 짧아지지는 않습니다.
+GIVE_UP_RTOS = 8
+# 타임스탬프는 마이크로초 단위의 32비트 값으로 약 71분마다 한 바퀴 돕니다.
+TIMESTAMP_MASK = 0xffffffff
+# 이보다 큰 RTT 표본은 오래된 타임스탬프가 되돌아온 것으로 보고 버립니다.
+MAX_RTT_SAMPLE = 60.0
+
+
+def timestamp_us(now: float) -> int:
+    """
+    시각을 패킷에 실을 32비트 마이크로초 타임스탬프로 바꿉니다. 0은 '되돌려 줄 타임스탬프 없음'으로 쓰므로 피합니다.
+    """
+    return (int(now * 1_000_000) & TIMESTAMP_MASK) or 1
+
+
+def timestamp_age(timestamp: int, now: float) -> float:
+    """
+    이 호스트가 만든 타임스탬프가 now까지 지난 시간(초)을 반환합니다. 32비트 wrap-around를 고려합니다.
+    """
+    return ((int(now * 1_000_000) - timestamp) & TIMESTAMP_MASK) / 1_000_000
+
+
+class RttEstimator:
+    """
+    RFC 6298 방식으로 SRTT와 RTTVAR를 갱신하고 재전송 타이머(RTO)를 계산합니다.
+    첫 표본 전에는 initial_rto를 사용하고, 타이머가 만료될 때마다 다음 표본까지 RTO를 두 배로 늘립니다.
+    """
+
+    def __init__(self, initial_rto: float = 0.2, min_rto: float = MIN_RTO, max_rto: float = MAX_RTO):
+        """
+        Args:
+            initial_rto : 첫 RTT 표본을 얻기 전의 RTO
+            min_rto, max_rto : RTO의 하한과 상한
+        """
+        self.min_rto = min_rto
+        self.max_rto = max_rto
+        self.srtt = None
+        self.rttvar = None
+        self.base_rto = initial_rto
+        self.backoff = 1
+        self.last_sample = None  # 마지막으로 반영한 RTT 표본
+        self.last_sample_time = -math.inf
+
+    @property
+    def rto(self) -> float:
+        return min(self.max_rto, self.base_rto * self.backoff)
+
+    def on_sample(self, rtt: float):
+        """
+        RTT 표본 하나를 반영합니다.
+        """
+        if self.srtt is None:
+            self.srtt = rtt
+            self.rttvar = rtt / 2
+        else:
+            self.rttvar = (1 - RTT_BETA) * self.rttvar + RTT_BETA * abs(self.srtt - rtt)
+            self.srtt = (1 - RTT_ALPHA) * self.srtt + RTT_ALPHA * rtt
+        self.base_rto = min(self.max_rto, max(self.min_rto, self.srtt + max(CLOCK_GRANULARITY, RTO_K * self.rttvar)))
+        self.backoff = 1
+
+    def sample(self, rtt: float, now: float) -> bool:
+        """
+        ACK마다 얻는 RTT 표본을 RTT마다 한 번만 반영합니다.
+        RFC 6298의 가중치는 RTT마다 표본 하나를 가정하므로, 모든 ACK를 반영하면 SRTT가 최근 값에 치우치고 RTTVAR가 0에 가까워집니다.
+        Returns:
+            표본을 반영해 RTO가 바뀌었으면 True를 반환합니다.
+        """
+        if rtt > MAX_RTT_SAMPLE or now - self.last_sample_time < (self.srtt or 0.0):
+            return False
+        self.last_sample_time = now
+        self.last_sample = rtt
+        self.on_sample(rtt)
+        return True
+
+    def on_timeout(self):
+        """
+        재전송 타이머가 만료되었을 때 호출합니다. 새 표본을 얻을 때까지 RTO를 두 배씩 늘립니다.
+        """
+        if self.base_rto * self.backoff < self.max_rto:
+            self.backoff *= 2
+
+    def give_up_timeout(self, floor: float) -> float:
+        """
+        상대가 응답하지 않는다고 판단할 시간을 반환합니다. 느린 경로에서는 RTO에 비례해 늘어나고, floor보다 짧아지지 않습니다.
+        """
+        return max(floor, GIVE_UP_RTOS * self.rto)
+
+
+class TimestampEcho:
+    """
+    RFC 7323의 타임스탬프 옵션처럼, 보내는 패킷에 자신의 타임스탬프(ts_val)와 상대에게서 받은 마지막 타임스탬프(ts_ecr)를 싣습니다.
+    ts_ecr에는 상대의 패킷을 받은 뒤 응답하기까지 붙잡고 있던 시간을 더해 되돌려 주므로,
+    ACK를 모아 보내거나 유휴 NACK를 기다린 시간이 RTT에 섞이지 않습니다.
+    stamp와 on_receive에는 같은 시계의 시각을 넘겨야 합니다.
+    """
+
+    def __init__(self, rtt: RttEstimator):
+        self.rtt = rtt
+        self.peer_ts = 0  # 상대에게서 받은 마지막 ts_val
+        self.peer_ts_time = 0.0  # peer_ts를 받은 시각
+
+    def on_receive(self, ts_val: int, ts_ecr: int, now: float) -> bool:
+        """
+        상대의 패킷에 실린 타임스탬프를 반영합니다.
+        Returns:
+            새 RTT 표본을 반영해 RTO가 바뀌었으면 True를 반환합니다.
+        """
+        if ts_val:
+            self.peer_ts = ts_val
+            self.peer_ts_time = now
+        if not ts_ecr:
+            return False
+        return self.rtt.sample(timestamp_age(ts_ecr, now), now)
+
+    def echo(self, now: float) -> int:
+        """
+        되돌려 줄 ts_ecr, 받은 타임스탬프가 없으면 0을 반환합니다.
+        """
+        if not self.peer_ts:
+            return 0
+        return ((self.peer_ts + int((now - self.peer_ts_time) * 1_000_000)) & TIMESTAMP_MASK) or 1
+
+    def stamp(self, now: float) -> tuple[int, int]:
+        """
+        보낼 패킷에 실을 (ts_val, ts_ecr)를 반환합니다.
+        """
+        return timestamp_us(now), self.echo(now)
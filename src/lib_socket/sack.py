@@ -0,0 +1,146 @@
+import struct
+import sys
+from array import array
+
+from rtt import timestamp_age
+
+# ACK 헤더 : cum_ack, highest, cover_start, cover_end
+# cum_ack 미만의 seq는 모두 수신되었고, highest는 수신측이 기다리는 마지막 seq + 1 입니다.
+# 헤더 뒤에는 [cover_start, cover_end) 구간에서 누락된 구간들이 (start, count) '!II' 쌍으로 붙습니다.
+# 누락 구간이 많으면 ACK를 여러 datagram으로 나누며, 각 datagram의 cover 구간은 이어서 [cum_ack, highest)를 덮습니다.
+ACK_HEADER = struct.Struct('!IIII')
+# highest의 최상위 비트가 켜져 있으면 헤더 바로 뒤에 수신측의 타임스탬프 (ts_val, ts_ecr)가 붙습니다. (rtt.TimestampEcho)
+ACK_TIMESTAMP = struct.Struct('!II')
+TIMESTAMP_BIT = 0x80000000
+# cum_ack의 최상위 비트가 켜져 있으면 (타임스탬프 뒤에) 수신측의 버퍼 상태 (수신 큐 점유율의 천분율, 커널 drop 수)가 붙습니다.
+# (buffer_monitor.BufferMonitor.report)
+ACK_PRESSURE = struct.Struct('!HI')
+PRESSURE_BIT = 0x80000000
+MAX_ACK_SIZE = 1400
+MAX_RANGES_PER_ACK = (MAX_ACK_SIZE - ACK_HEADER.size - ACK_TIMESTAMP.size - ACK_PRESSURE.size) // 8
+
+
+def _to_network_order(arr: array) -> array:
+    if sys.byteorder == 'little':
+        arr.byteswap()
+    return arr
+
+
+def missing_ranges(received: bytearray, start: int, end: int) -> array:
+    """
+    수신 비트맵에서 [start, end) 구간의 누락 구간을 찾습니다. 누락 구간마다 한 번씩만 반복합니다.
+    Args:
+        received : seq마다 수신 여부를 0/1로 기록한 bytearray
+    Returns:
+        start0, count0, start1, count1, ... 순서의 array('I')
+    """
+    ranges = array('I')
+    pos = received.find(0, start, end)
+    while pos != -1:
+        stop = received.find(1, pos, end)
+        if stop == -1:
+            stop = end
+        ranges.append(pos)
+        ranges.append(stop - pos)
+        pos = received.find(0, stop, end)
+    return ranges
+
+
+def pack_ack(cum_ack: int, highest: int, ranges: array, timestamp: tuple[int, int] | None = None,
+             pressure: tuple[int, int] | None = None) -> list[bytes]:
+    """
+    ACK를 MAX_ACK_SIZE 이하의 datagram 목록으로 구성합니다. 누락 구간이 없으면 헤더만 담은 datagram 하나를 반환합니다.
+    Args:
+        cum_ack : 이 값 미만의 seq는 모두 수신됨
+        highest : 수신측이 기다리는 마지막 seq + 1
+        ranges : missing_ranges가 반환한 누락 구간
+        timestamp : 첫 datagram에 실을 (ts_val, ts_ecr), 생략하면 타임스탬프 없이 구성합니다.
+        pressure : 첫 datagram에 실을 수신측의 버퍼 상태, 생략하면 싣지 않습니다.
+    """
+    datagrams = []
+    cover_start = cum_ack
+    step = MAX_RANGES_PER_ACK * 2
+    for i in range(0, max(len(ranges), 1), step):
+        part = ranges[i:i + step]
+        if i + step >= len(ranges):
+            cover_end = max(highest, cover_start)
+        else:
+            cover_end = part[-2] + part[-1]
+        payload = _to_network_order(array('I', part)).tobytes()
+        if i == 0 and (timestamp is not None or pressure is not None):
+            header = ACK_HEADER.pack(cum_ack | (PRESSURE_BIT if pressure is not None else 0),
+                                     highest | (TIMESTAMP_BIT if timestamp is not None else 0), cover_start, cover_end)
+            if timestamp is not None:
+                header += ACK_TIMESTAMP.pack(*timestamp)
+            if pressure is not None:
+                header += ACK_PRESSURE.pack(min(pressure[0], 0xffff), pressure[1] & 0xffffffff)
+        else:
+            header = ACK_HEADER.pack(cum_ack, highest, cover_start, cover_end)
+        datagrams.append(header + payload)
+        cover_start = cover_end
+    return datagrams
+
+
+def unpack_ack(data: bytes) -> tuple[int, int, int, int, array]:
+    """
+    ACK datagram 하나를 해석합니다.
+    Returns:
+        (cum_ack, highest, cover_start, cover_end, ranges)
+    Raises:
+        struct.error : 헤더의 길이가 부족한 경우 발생합니다.
+    """
+    cum_ack, highest, cover_start, cover_end = ACK_HEADER.unpack_from(data)
+    start = ACK_HEADER.size
+    if highest & TIMESTAMP_BIT:
+        highest &= ~TIMESTAMP_BIT
+        start += ACK_TIMESTAMP.size
+    if cum_ack & PRESSURE_BIT:
+        cum_ack &= ~PRESSURE_BIT
+        start += ACK_PRESSURE.size
+    payload = memoryview(data)[start:]
+    ranges = array('I')
+    ranges.frombytes(payload[:len(payload) // 8 * 8])
+    return cum_ack, highest, cover_start, cover_end, _to_network_order(ranges)
+
+
+def ack_timestamp(data: bytes) -> tuple[int, int] | None:
+    """
+    ACK datagram에 실린 (ts_val, ts_ecr)를 반환합니다. 타임스탬프가 없거나 길이가 부족하면 None을 반환합니다.
+    """
+    if len(data) < ACK_HEADER.size + ACK_TIMESTAMP.size or not data[4] & 0x80:
+        return None
+    return ACK_TIMESTAMP.unpack_from(data, ACK_HEADER.size)
+
+
+def ack_echoed_at(data: bytes, now: float) -> float | None:
+    """
+    ACK datagram에 되돌아온 송신측의 타임스탬프(ts_ecr)를 now와 같은 시계의 시각으로 반환합니다.
+    now는 타임스탬프를 만든 시계(time.time())의 현재 시각이어야 합니다. 타임스탬프가 없거나 되돌려 준 값이 없으면 None을 반환합니다.
+    """
+    timestamp = ack_timestamp(data)
+    if timestamp is None or not timestamp[1]:
+        return None
+    return now - timestamp_age(timestamp[1], now)
+
+
+def ack_pressure(data: bytes) -> tuple[int, int] | None:
+    """
+    ACK datagram에 실린 수신측의 버퍼 상태 (수신 큐 점유율의 천분율, 커널 drop 수)를 반환합니다.
+    버퍼 상태가 없거나 길이가 부족하면 None을 반환합니다.
+    """
+    if len(data) < ACK_HEADER.size or not data[0] & 0x80:
+        return None
+    offset = ACK_HEADER.size + (ACK_TIMESTAMP.size if data[4] & 0x80 else 0)
+    if len(data) < offset + ACK_PRESSURE.size:
+        return None
+    return ACK_PRESSURE.unpack_from(data, offset)
+
+
+def ranges_to_seqs(ranges: array) -> array:
+    """
+    누락 구간을 seq 배열로 펼칩니다. 구간마다 한 번씩만 반복합니다.
+    """
+    seqs = array('i')
+    for i in range(0, len(ranges), 2):
+        seqs.extend(range(ranges[i], ranges[i] + ranges[i + 1]))
+    return seqs
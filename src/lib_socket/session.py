@@ -0,0 +1,162 @@
+import os
+
+from buffer_monitor import BufferMonitor
+from compression import Codec
+from fec import FecDecoder
+from metrics import TransferMetrics
+from protocol import (DATA_HEADER, DATA_TIMESTAMP, KIND_ACCEPT, KIND_ACK, PARITY_BIT, SESSION_HEADER, chunk_payload,
+                      data_header_size, pack_accept, pack_session)
+from reassembly import WriteThroughReassembler
+from rtt import TimestampEcho
+from sack import pack_ack
+from window import NackScheduler
+
+
+class ReceiveSession:
+    """
+    세션 모드에서 전송 하나의 수신 상태를 관리합니다.
+    소켓을 직접 다루지 않고 보내야 할 ACK datagram 목록을 반환하므로, 하나의 수신 루프가 여러 세션을 동시에 처리할 수 있습니다.
+    청크는 항상 write-through로 파일에 바로 씁니다.
+    """
+
+    def __init__(self, session_id: int, client_address: tuple, file_path: str, total_chunks: int, buffer_size: int,
+                 window_size: int, now: float, nack_interval: float = 0.05, timeout: float = 5, linger: float = 1.0,
+                 fec: bool = False, checksum: bool = False, codec: Codec | None = None, timestamps: bool = False,
+                 accepted_flags: int = 0, monitor: BufferMonitor | None = None):
+        """
+        Args:
+            session_id : 전송을 구분하는 세션 id
+            client_address : ACK를 보낼 송신측 주소
+            file_path : 수신한 데이터를 쓸 파일 경로
+            total_chunks : 수신할 청크의 수
+            buffer_size : 세션 헤더를 포함한 데이터 패킷 하나의 크기
+            window_size : 송신측의 in-flight 윈도우 크기
+            now : 세션이 시작된 시각
+            nack_interval : RTT 표본을 얻기 전의 NACK 사이의 최소 간격이자 유휴 판정 간격
+            timeout : 해당 시간동안 패킷이 없으면 세션을 실패로 정리합니다. RTO가 긴 경로에서는 RTO에 비례해 늘어납니다.
+            linger : 수신 완료 후 완료 ACK 재전송을 위해 세션을 유지하는 시간
+            fec : True이면 parity 패킷으로 유실된 청크를 복구합니다.
+            checksum : True이면 청크의 CRC32를 확인하고, 손상된 청크는 유실된 것으로 처리합니다.
+            codec : 지정된 경우 압축된 청크를 이 코덱으로 복원합니다.
+            timestamps : True이면 데이터 패킷의 타임스탬프로 RTT를 재고 ACK에 타임스탬프를 되돌려 줍니다.
+            accepted_flags : 수락 응답으로 알릴, 세션이 처리하는 기능의 flags
+            monitor : 지정하면 ACK에 수신 소켓의 버퍼 상태를 싣습니다. 여러 세션이 함께 쓰는 monitor이므로
+                      세션이 시작된 뒤의 drop 수만 보고합니다.
+        """
+        self.session_id = session_id
+        self.client_address = client_address
+        # 파일 정보가 중복으로 도착할 때마다 다시 보내는 수락 응답
+        self.accept = pack_accept(accepted_flags, window_size, pack_session(KIND_ACCEPT, session_id))
+        self.file_path = file_path
+        self.checksum = checksum
+        self.codec = codec
+        self.timestamps = timestamps
+        self.chunk_size = buffer_size - SESSION_HEADER.size - data_header_size(checksum, timestamps)
+        self.reassembler = WriteThroughReassembler(file_path, total_chunks, self.chunk_size)
+        self.decoder = FecDecoder(self.reassembler) if fec else None
+        # 여러 세션이 동시에 진행되므로 진행률은 출력하지 않고 지표만 모읍니다.
+        self.metrics = TransferMetrics(f"session:{session_id:08x}", 'receive', total_chunks, self.chunk_size,
+                                       quiet=True)
+        self.ack_every = max(1, window_size // 4)
+        self.nack = NackScheduler(nack_interval)
+        self.echo = TimestampEcho(self.nack.rtt) if timestamps else None
+        self.metrics.rtt = self.nack.rtt
+        self.monitor = monitor
+        if monitor is not None:
+            self.metrics.watch(monitor)
+        self.timeout = timeout
+        self.linger = linger
+
+        self.start_time = now
+        self.last_packet_time = now
+        self.finished_at = None
+        self.failed = False
+
+    @property
+    def total_chunks(self) -> int:
+        return self.reassembler.total_chunks
+
+    def _ack(self, cum_ack: int, highest: int, ranges, now: float) -> list[bytes]:
+        timestamp = self.echo.stamp(now) if self.echo is not None else None
+        pressure = self.monitor.report(self.metrics.monitor_base) if self.monitor is not None else None
+        return [pack_session(KIND_ACK, self.session_id, packed)
+                for packed in pack_ack(cum_ack, highest, ranges, timestamp, pressure)]
+
+    def _window_ack(self, now: float) -> list[bytes]:
+        window = self.reassembler.window
+        return self._ack(window.cum_ack, window.highest, window.missing_ranges(), now)
+
+    def on_data(self, payload: bytes | memoryview, now: float) -> list[bytes]:
+        """
+        세션 헤더를 뗀 데이터 패킷 하나를 처리하고 보내야 할 ACK를 반환합니다.
+        Raises:
+            struct.error : 패킷이 손상된 경우 발생합니다.
+        """
+        self.last_packet_time = now
+        if self.finished_at is not None:
+            # 완료 ACK가 유실되어 송신측이 재전송한 경우
+            return self._ack(self.total_chunks, self.total_chunks, [], now)
+
+        seq_num, chunk_size = DATA_HEADER.unpack_from(payload)
+        window = self.reassembler.window
+        if seq_num & PARITY_BIT:
+            if self.decoder is None or self.decoder.on_parity(payload) is None:
+                return []
+            is_new = True
+        elif seq_num >= self.total_chunks:
+            return []
+        else:
+            if self.echo is not None:
+                self.echo.on_receive(*DATA_TIMESTAMP.unpack_from(payload, DATA_HEADER.size), now)
+            chunk_data = chunk_payload(payload, chunk_size, self.checksum, self.codec, self.chunk_size,
+                                       self.timestamps)
+            if chunk_data is None:
+                return []
+            is_new = self.reassembler.write(seq_num, chunk_data)
+            if is_new and self.decoder is not None:
+                self.decoder.on_data(seq_num)
+        self.metrics.on_receive(is_new)
+        self.metrics.progress(now)
+
+        if window.complete():
+            self.finish(now)
+            return self._ack(self.total_chunks, self.total_chunks, [], now)
+        if not is_new or window.received_count % self.ack_every == 0:
+            return self._window_ack(now)
+        if self.nack.due(window, now):
+            self.nack.sent(now)
+            return self._window_ack(now)
+        return []
+
+    def on_timer(self, now: float) -> list[bytes]:
+        """
+        주기적으로 호출되어, 패킷이 NACK 간격 이상 오지 않았으면 마지막 청크까지의 전체 누락 구간을 보고합니다.
+        """
+        if self.finished_at is not None or self.failed:
+            return []
+        if now - self.last_packet_time > self.nack.rtt.give_up_timeout(self.timeout):
+            print(f"세션 {self.session_id:08x} 데이터 타임아웃")
+            self.failed = True
+            self.reassembler.close()
+            return []
+        if now - self.last_packet_time < self.nack.interval or now - self.nack.last_nack < self.nack.interval:
+            return []
+        self.nack.sent(now)
+        return self._ack(self.reassembler.window.cum_ack, self.total_chunks, self.reassembler.missing_ranges(), now)
+
+    def finish(self, now: float):
+        self.finished_at = now
+        self.reassembler.finish()
+        self.metrics.finish()
+        elapsed = max(now - self.start_time, 1e-9)
+        file_size = os.path.getsize(self.file_path)
+        print(f"세션 {self.session_id:08x} 수신 완료 : {self.file_path}")
+        print(f"measured_transfer_speed\t{file_size / elapsed}")
+
+    def expired(self, now: float) -> bool:
+        """
+        세션을 정리해도 되는지 반환합니다. 실패했거나, 완료 후 linger 시간이 지난 경우입니다.
+        """
+        if self.failed:
+            return True
+        return self.finished_at is not None and now - self.finished_at > self.linger
@@ -0,0 +1,207 @@
+import csv
+import json
+import math
+import os
+import statistics
+import time
+
+from path_mtu import path_payload
+from udp_client import payload_chunk_size, send_file
+
+# 기본 탐색 공간 : 패킷 크기, selective-repeat 윈도우(0이면 interval로 간격을 두는 기존 모드), 기존 모드의 전송 간격
+# 패킷 크기는 send_file이 경로 MTU에 맞춰 줄이므로, Tuner는 줄인 뒤 같아지는 후보를 하나만 전송합니다.
+DEFAULT_BUFFER_SIZES = (1460, 4096, 8192, 16384)
+DEFAULT_WINDOWS = (64, 128, 256, 512)
+DEFAULT_INTERVALS = (0.0001, 0.0005)
+# 중간 점수가 지금까지의 최고 점수의 이 비율보다 낮은 설정은 라운드가 끝나기 전에 탈락시킵니다.
+DROP_RATIO = 0.25
+# 전송 사이에 쉬는 시간(초), 수신측이 완료 ACK를 유지하는 시간(linger)과 수신 버퍼를 비우는 시간보다 길어야
+# 다음 전송의 파일 정보가 이전 전송의 정리 과정에 버려지지 않습니다.
+SETTLE_TIME = 2.0
+CSV_FIELDS = ('round', 'buffer_size', 'window_size', 'interval', 'elapsed', 'throughput', 'retransmitted',
+              'loss_rate', 'failed')
+
+
+class TuneConfig:
+    """
+    한 번의 전송에 사용하는 (패킷 크기, 윈도우, 전송 간격) 설정입니다.
+    """
+
+    def __init__(self, buffer_size: int, window_size: int = 0, interval: float = 0.0):
+        self.buffer_size = buffer_size
+        self.window_size = window_size
+        self.interval = interval
+
+    def as_dict(self) -> dict:
+        return {'buffer_size': self.buffer_size, 'window_size': self.window_size, 'interval': self.interval}
+
+    def __repr__(self) -> str:
+        if self.window_size > 0:
+            return f"buffer {self.buffer_size} / window {self.window_size}"
+        return f"buffer {self.buffer_size} / interval {self.interval}"
+
+
+def default_space(buffer_sizes=DEFAULT_BUFFER_SIZES, windows=DEFAULT_WINDOWS,
+                  intervals=DEFAULT_INTERVALS) -> list[TuneConfig]:
+    """
+    패킷 크기마다 selective-repeat 윈도우 후보와 기존 모드의 전송 간격 후보를 조합한 설정 목록을 만듭니다.
+    """
+    configs = []
+    for buffer_size in buffer_sizes:
+        configs.extend(TuneConfig(buffer_size, window_size) for window_size in windows)
+        configs.extend(TuneConfig(buffer_size, 0, interval) for interval in intervals)
+    return configs
+
+
+class Tuner:
+    """
+    successive halving으로 전송 설정을 탐색합니다.
+    모든 설정을 적은 횟수로 전송해 보고, 라운드마다 중간 처리량이 높은 1/eta만 남겨 전송 횟수를 eta배로 늘립니다.
+    전송에 실패했거나 처리량이 지금까지의 최고보다 크게 낮은 설정은 라운드 도중에 바로 탈락시키므로,
+    격자의 모든 설정을 같은 횟수만큼 반복하는 것보다 훨씬 적은 전송으로 최적 설정을 찾습니다.
+    """
+
+    def __init__(self, filename: str, host: str = 'localhost', port: int = 9999,
+                 configs: list[TuneConfig] | None = None, min_trials: int = 1, eta: int = 2,
+                 settle: float = SETTLE_TIME, drop_ratio: float = DROP_RATIO, **options):
+        """
+        Args:
+            filename : 전송할 파일
+            host, port : 수신 서버의 주소 및 포트
+            configs : 탐색할 설정 목록, 생략하면 default_space()를 사용합니다.
+                      패킷 크기는 경로 MTU에서 조각나지 않는 크기로 줄이며, 줄인 뒤 같아진 설정은 하나만 전송합니다.
+            min_trials : 첫 라운드에서 설정마다 전송할 횟수
+            eta : 라운드마다 남길 설정의 비율(1/eta)이자 전송 횟수를 늘리는 배수
+            settle : 전송 사이에 수신측이 이전 전송을 정리하고 다음 파일 정보를 기다리도록 쉬는 시간(초)
+            drop_ratio : 중간 처리량이 최고 처리량의 이 비율보다 낮으면 조기 탈락시킵니다.
+            options : send_file에 그대로 전달할 나머지 인자 (fec_group, verify 등)
+        """
+        self.filename = filename
+        self.host = host
+        self.port = port
+        # 1500 MTU 경로에서는 기본 후보 중 4096, 8192, 16384가 모두 같은 크기로 전송되므로 하나만 남깁니다.
+        self.configs = self.collapse(configs if configs is not None else default_space(), path_payload((host, port)))
+        self.min_trials = min_trials
+        self.eta = eta
+        self.settle = settle
+        self.drop_ratio = drop_ratio
+        self.options = options
+        self.file_size = os.path.getsize(filename)
+        self.trials = []  # 전송마다 CSV_FIELDS의 값을 담은 dict
+        self.throughputs = {config: [] for config in self.configs}
+        self.eliminated = {}  # config -> 탈락한 라운드
+        self.best = None
+
+    @staticmethod
+    def collapse(configs: list[TuneConfig], limit: int) -> list[TuneConfig]:
+        """
+        설정의 패킷 크기를 send_file이 실제로 사용할 limit 이하로 줄이고, 줄인 뒤 같아진 설정은 처음 것만 남깁니다.
+        """
+        collapsed = {}
+        for config in configs:
+            config = TuneConfig(min(config.buffer_size, limit), config.window_size, config.interval)
+            collapsed.setdefault((config.buffer_size, config.window_size, config.interval), config)
+        return list(collapsed.values())
+
+    def score(self, config: TuneConfig) -> float:
+        """
+        설정의 점수로 성공한 전송의 중간 처리량(bytes/s)을 사용합니다. 실패한 전송은 0으로 셉니다.
+        """
+        throughputs = self.throughputs[config]
+        return statistics.median(throughputs) if throughputs else 0.0
+
+    def run_trial(self, config: TuneConfig, round_num: int) -> dict:
+        """
+        설정으로 파일을 한 번 전송하고 소요 시간, 처리량, 재전송한 청크 수를 기록합니다.
+        """
+        start_time = time.perf_counter()
+        losses = send_file(self.filename, self.host, self.port, config.buffer_size, config.interval,
+                           window_size=config.window_size, **self.options)
+        elapsed = time.perf_counter() - start_time
+        failed = any(len(loss) == 1 and loss[0] == -1 for loss in losses)
+        retransmitted = sum(len(loss) for loss in losses) if not failed else 0
+        # 헤더를 뺀 실제 청크 크기로 send_file과 같은 청크 수를 계산합니다.
+        chunk_size = payload_chunk_size(config.buffer_size, self.options.get('session', False),
+                                        self.options.get('verify', False))
+        total_chunks = max(1, math.ceil(self.file_size / chunk_size))
+        throughput = 0.0 if failed else self.file_size / elapsed
+        trial = {'round': round_num, **config.as_dict(), 'elapsed': elapsed, 'throughput': throughput,
+                 'retransmitted': retransmitted, 'loss_rate': retransmitted / total_chunks, 'failed': failed}
+        self.trials.append(trial)
+        self.throughputs[config].append(throughput)
+        time.sleep(self.settle)
+        return trial
+
+    def run(self) -> TuneConfig:
+        """
+        남은 설정이 하나가 될 때까지 라운드를 반복하고 가장 점수가 높은 설정을 반환합니다.
+        """
+        survivors = list(self.configs)
+        best_score = 0.0
+        round_num = 0
+        while survivors:
+            trials = self.min_trials * self.eta ** round_num
+            print(f"튜닝 라운드 {round_num} : 설정 {len(survivors)}개, 설정마다 {trials}회 전송")
+            for config in list(survivors):
+                for _ in range(trials):
+                    trial = self.run_trial(config, round_num)
+                    score = self.score(config)
+                    if trial['failed'] or score < best_score * self.drop_ratio:
+                        # 실패했거나 분명히 나쁜 설정은 남은 전송을 생략합니다.
+                        survivors.remove(config)
+                        self.eliminated[config] = round_num
+                        print(f"조기 탈락 : {config} ({score / 1e6:.2f} MB/s)")
+                        break
+                else:
+                    best_score = max(best_score, self.score(config))
+
+            survivors.sort(key=self.score, reverse=True)
+            if len(survivors) <= 1:
+                break
+            keep = max(1, math.ceil(len(survivors) / self.eta))
+            for config in survivors[keep:]:
+                self.eliminated[config] = round_num
+            survivors = survivors[:keep]
+            round_num += 1
+
+        candidates = survivors or self.configs
+        self.best = max(candidates, key=self.score)
+        print(f"최적 설정 : {self.best} ({self.score(self.best) / 1e6:.2f} MB/s)")
+        return self.best
+
+    def summary(self) -> list[dict]:
+        """
+        설정마다 점수, 전송 횟수, 평균 손실률, 탈락한 라운드를 점수 순으로 정리합니다.
+        """
+        rows = []
+        for config in self.configs:
+            trials = [trial for trial in self.trials if trial['buffer_size'] == config.buffer_size
+                      and trial['window_size'] == config.window_size and trial['interval'] == config.interval]
+            rows.append({**config.as_dict(), 'score': self.score(config), 'trials': len(trials),
+                         'loss_rate': statistics.mean(trial['loss_rate'] for trial in trials) if trials else None,
+                         'eliminated_round': self.eliminated.get(config)})
+        rows.sort(key=lambda row: row['score'], reverse=True)
+        return rows
+
+    def write_json(self, path: str):
+        """
+        최적 설정, 설정별 요약, 모든 전송 기록을 JSON으로 저장합니다.
+        """
+        result = {
+            'file': self.filename,
+            'file_size': self.file_size,
+            'best': {**self.best.as_dict(), 'score': self.score(self.best)} if self.best is not None else None,
+            'configs': self.summary(),
+            'trials': self.trials,
+        }
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(result, f, ensure_ascii=False, indent=2)
+
+    def write_csv(self, path: str):
+        """
+        전송마다 한 줄씩 처리량과 손실률을 CSV로 저장합니다. 설정별 처리량/손실 곡선을 그리는 데 사용합니다.
+        """
+        with open(path, 'w', newline='', encoding='utf-8') as f:
+            writer = csv.DictWriter(f, fieldnames=CSV_FIELDS)
+            writer.writeheader()
+            writer.writerows(self.trials)
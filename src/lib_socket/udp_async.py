@@ -0,0 +1,454 @@
+import asyncio
+import secrets
+import struct
+import time
+from array import array
+from pathlib import Path
+
+from buffer_monitor import BufferMonitor
+from chunk_source import MmapPacketSource
+from path_mtu import payload_candidates, set_dont_fragment
+from protocol import (DATA_HEADER, DATA_TIMESTAMP, FLAG_SELECTIVE_REPEAT, FLAG_SESSION, FLAG_TIMESTAMP, KIND_ACCEPT,
+                      KIND_ACK, KIND_DATA, KIND_INFO, SESSION_HEADER, pack_file_info, pack_probe, pack_session,
+                      probe_size, strip_session, unpack_accept)
+from pacer import TokenBucketPacer
+from rate_control import RateController
+from rtt import RttEstimator, TimestampEcho
+from sack import ack_echoed_at, ack_timestamp, unpack_ack
+from session import ReceiveSession
+from udp_client import PROBE_GRACE, PROBE_RETRIES, PROBE_TIMEOUT
+from udp_server import answer_probe, check_receive_buffer, open_receive_session
+from window import SendWindow
+
+DEFAULT_WINDOW = 256
+
+
+class SessionSender(asyncio.DatagramProtocol):
+    """
+    세션 모드 전송 하나를 asyncio 이벤트 루프에서 진행합니다.
+    연결되면 먼저 경로 MTU probe를 보내고, 돌아온 가장 큰 크기를 path_size future에 설정합니다.
+    호출자가 그 크기로 패킷 source와 파일 정보를 만들어 start()를 호출하면 전송을 시작합니다.
+    블로킹 송신 루프(send_selective_repeat)와 같은 SendWindow를 사용하고, 재전송과 전송 간격은 루프의 타이머로 처리합니다.
+    전송이 끝나면 finished future에 재전송한 seq_number들의 배열 목록이 설정됩니다.
+    """
+
+    def __init__(self, probe_sizes: list[int], session_id: int, window_size: int,
+                 rate_controller: RateController | None = None, timeout: float = 3.0, info_timeout: float = 1.0,
+                 info_retries: int = 5):
+        """
+        Args:
+            probe_sizes : 경로 MTU probe로 확인할 패킷 크기, 큰 것부터
+            session_id : 세션 id
+            window_size : in-flight 윈도우 크기
+            rate_controller : 지정된 경우 제어기가 정하는 속도(바이트/초)에 맞춰 패킷을 보냅니다.
+            timeout : 해당 시간동안 ACK가 없으면 TimeoutError로 전송을 중단합니다. RTO가 긴 경로에서는 RTO에 비례해 늘어납니다.
+            info_timeout, info_retries : 수락 응답이 없을 때 파일 정보를 다시 보내는 간격과 횟수
+        """
+        self.loop = asyncio.get_running_loop()
+        self.probe_sizes = probe_sizes
+        self.session_id = session_id
+        self.window_size = window_size
+        self.accept_prefix = pack_session(KIND_ACCEPT, session_id)
+        self.rate_controller = rate_controller
+        self.timeout = timeout
+        self.info_timeout = info_timeout
+        self.info_retries = info_retries
+
+        self.packet_source = None
+        self.file_info = None
+        self.echo = None
+        self.window = None
+        self.pacer = None
+
+        self.transport = None
+        self.path_size = self.loop.create_future()
+        self.probe_best = 0
+        self.probe_sent_at = 0.0
+        self.finished = self.loop.create_future()
+        self.losses = []
+        self.accepted = False
+        self.paused = False
+        self.last_ack_time = self.loop.time()
+
+        self.probe_timer = None
+        self.info_timer = None
+        self.send_timer = None
+        self.retransmit_timer = None
+        self.watchdog = None
+
+    def connection_made(self, transport: asyncio.DatagramTransport):
+        self.transport = transport
+        # 데이터 패킷이 경로에서 조각나지 않도록 DF 비트를 켜고, 패킷 크기는 probe로 확인한 크기를 사용합니다.
+        sock = transport.get_extra_info('socket')
+        if sock is not None:
+            set_dont_fragment(sock)
+        self._send_probes(PROBE_RETRIES)
+
+    def start(self, packet_source: MmapPacketSource, file_info: bytes):
+        """
+        path_size로 만든 패킷 source와 파일 정보로 전송을 시작합니다.
+        Args:
+            packet_source : KIND_DATA 세션 헤더를 prefix로 가진 패킷 source, echo가 있으면 ACK의 타임스탬프로 RTT를 잽니다.
+            file_info : 세션 헤더를 붙인 파일 정보 패킷
+        """
+        self.packet_source = packet_source
+        self.file_info = file_info
+        self.echo = packet_source.echo
+        self.window = SendWindow(len(packet_source), self.window_size,
+                                 rtt=self.echo.rtt if self.echo is not None else None)
+        # 이벤트 루프의 타이머는 1ms 단위로 깨어나므로, 늦게 깨어난 만큼은 token bucket에 쌓인 토큰으로 묶어 보냅니다.
+        if self.rate_controller is not None:
+            self.pacer = TokenBucketPacer(self.rate_controller.rate,
+                                          packet_source.header_size + packet_source.chunk_size)
+        self._send_info(self.info_retries)
+
+    def _send_probes(self, retries_left: int):
+        """
+        probe_path와 같은 방식으로 probe를 한꺼번에 보내고, 응답은 datagram_received에서 모읍니다.
+        """
+        if retries_left <= 0:
+            print(f"수신측이 응답하지 않습니다.")
+            self._fail(TimeoutError())
+            return
+        if retries_left < PROBE_RETRIES:
+            print(f"경로 MTU probe 응답 대기 중, probe 재전송")
+        # 나가는 인터페이스의 MTU보다 큰 probe는 커널이 거부하며, 그 오류는 error_received로 전달됩니다.
+        for size in self.probe_sizes:
+            self.transport.sendto(pack_probe(size))
+        self.probe_sent_at = self.loop.time()
+        self.probe_timer = self.loop.call_later(PROBE_TIMEOUT, self._on_probe_timer, retries_left - 1)
+
+    def _on_probe_timer(self, retries_left: int):
+        self.probe_timer = None
+        if self.probe_best:
+            self._finish_probe()
+        else:
+            self._send_probes(retries_left)
+
+    def _on_probe_reply(self, size: int, now: float):
+        if size not in self.probe_sizes:
+            return
+        if self.probe_best == 0:
+            # 첫 응답 뒤에는 그때까지 걸린 시간만큼(최소 PROBE_GRACE)만 더 큰 probe의 응답을 기다립니다.
+            grace = max(PROBE_GRACE, now - self.probe_sent_at)
+            if now + grace < self.probe_timer.when():
+                self.probe_timer.cancel()
+                self.probe_timer = self.loop.call_later(grace, self._on_probe_timer, 0)
+        self.probe_best = max(self.probe_best, size)
+        if self.probe_best == self.probe_sizes[0]:
+            self._finish_probe()
+
+    def _finish_probe(self):
+        if self.probe_timer is not None:
+            self.probe_timer.cancel()
+            self.probe_timer = None
+        if not self.path_size.done():
+            self.path_size.set_result(self.probe_best)
+
+    def _send_info(self, retries_left: int):
+        if retries_left <= 0:
+            print(f"수신측이 응답하지 않습니다.")
+            self._fail(TimeoutError())
+            return
+        if retries_left < self.info_retries:
+            print(f"수신측 준비 대기 중, 파일 정보 재전송")
+        self.transport.sendto(self.file_info)
+        self.info_timer = self.loop.call_later(self.info_timeout, self._send_info, retries_left - 1)
+
+    def datagram_received(self, data: bytes, addr: tuple):
+        if self.finished.done():
+            return
+        now = self.loop.time()
+        if not self.path_size.done():
+            size = probe_size(data)
+            if size is not None:
+                self._on_probe_reply(size, now)
+            return
+        if self.window is None:
+            return
+        if not self.accepted:
+            accepted = unpack_accept(data, self.accept_prefix)
+            if accepted is not None:
+                self.accepted = True
+                self.info_timer.cancel()
+                _, window_size = accepted
+                # 수신측이 수신 버퍼에 맞춰 줄인 윈도우를 따릅니다.
+                if 0 < window_size < self.window.window_size:
+                    self.window.window_size = window_size
+                self.last_ack_time = now
+                self.watchdog = self.loop.call_later(self.timeout, self._check_timeout)
+                if self.window.done():
+                    self._close_timers()
+                    self.finished.set_result(self.losses)
+                    return
+                self._pump()
+            return
+
+        payload = strip_session(data, KIND_ACK, self.session_id)
+        if payload is None:
+            return
+        cum_ack, _, cover_start, cover_end, ranges = unpack_ack(payload)
+        self.last_ack_time = now
+        # ACK의 ts_ecr는 time.time() 기준이므로 루프 시계의 시각으로 옮깁니다.
+        wall_now = time.time()
+        echoed_at = ack_echoed_at(payload, wall_now) if self.echo is not None else None
+        if echoed_at is not None:
+            echoed_at += now - wall_now
+        retransmit = self.window.on_ack(cum_ack, cover_start, cover_end, ranges, now, echoed_at)
+        timestamp = ack_timestamp(payload) if self.echo is not None else None
+        if timestamp is not None:
+            # 패킷 source는 time.time()으로 타임스탬프를 찍으므로 같은 시계로 RTT를 잽니다.
+            self.echo.on_receive(*timestamp, time.time())
+        elif self.window.rtt_sample is not None:
+            self.window.rtt.sample(self.window.rtt_sample, now)
+        if self.rate_controller is not None:
+            self.rate_controller.on_ack(self.window.newly_acked, len(retransmit), self.window.rtt_sample, now)
+        if retransmit:
+            self.losses.append(array('i', retransmit))
+            self._transmit(retransmit)
+        self.packet_source.release(self.window.cum_ack)
+
+        if self.window.done():
+            self._close_timers()
+            self.finished.set_result(self.losses)
+            return
+        self._pump()
+
+    def error_received(self, exc: Exception):
+        # 수신측 포트가 닫혀 있으면 ICMP 오류가 오지만, 재전송과 timeout으로 처리합니다.
+        pass
+
+    def connection_lost(self, exc: Exception | None):
+        self._close_timers()
+        if not self.path_size.done():
+            self.path_size.set_exception(exc or ConnectionError("probe 중 소켓이 닫혔습니다."))
+        if not self.finished.done():
+            self.finished.set_exception(exc or ConnectionError("전송 중 소켓이 닫혔습니다."))
+
+    def pause_writing(self):
+        self.paused = True
+
+    def resume_writing(self):
+        self.paused = False
+        if self.accepted and not self.finished.done():
+            self._pump()
+
+    def _transmit(self, seq_numbers: list[int]):
+        sent_bytes = 0
+        for seq_number in seq_numbers:
+            packet = self.packet_source[seq_number]
+            self.transport.sendto(packet)
+            sent_bytes += len(packet)
+        sent_at = self.loop.time()
+        for seq_number in seq_numbers:
+            self.window.on_sent(seq_number, sent_at)
+        if self.pacer is not None:
+            self.pacer.consume(sent_bytes)
+
+    def _pump(self):
+        """
+        윈도우와 전송 간격이 허용하는 만큼 새 패킷을 보내고 재전송 타이머를 다시 설정합니다.
+        """
+        if self.send_timer is not None:
+            self.send_timer.cancel()
+            self.send_timer = None
+        if self.pacer is not None:
+            self.pacer.rate = self.rate_controller.rate
+        while not self.paused and self.window.can_send_new():
+            delay = self.pacer.delay() if self.pacer is not None else 0.0
+            if delay > 0:
+                self.send_timer = self.loop.call_later(delay, self._pump)
+                break
+            self._transmit([self.window.take_new()])
+        self._arm_retransmit()
+
+    def _arm_retransmit(self):
+        if self.retransmit_timer is not None:
+            self.retransmit_timer.cancel()
+            self.retransmit_timer = None
+        deadline = self.window.next_deadline()
+        if deadline is not None:
+            self.retransmit_timer = self.loop.call_at(deadline, self._on_retransmit_timer)
+
+    def _on_retransmit_timer(self):
+        self.retransmit_timer = None
+        now = self.loop.time()
+        expired = self.window.expired(now)
+        if expired:
+            if self.rate_controller is not None:
+                self.rate_controller.on_ack(0, len(expired), None, now)
+            self.losses.append(array('i', expired))
+            self._transmit(expired)
+        self._pump()
+
+    def _check_timeout(self):
+        remaining = self.last_ack_time + self.window.rtt.give_up_timeout(self.timeout) - self.loop.time()
+        if remaining > 0:
+            self.watchdog = self.loop.call_later(remaining, self._check_timeout)
+            return
+        print(f"\nACK 대기 시간 초과")
+        self._fail(TimeoutError())
+
+    def _fail(self, exc: Exception):
+        self._close_timers()
+        if not self.path_size.done():
+            self.path_size.set_exception(exc)
+        if not self.finished.done():
+            self.finished.set_exception(exc)
+
+    def _close_timers(self):
+        for timer in (self.probe_timer, self.info_timer, self.send_timer, self.retransmit_timer, self.watchdog):
+            if timer is not None:
+                timer.cancel()
+
+
+async def send_file_async(filename: str, host: str = 'localhost', port: int = 9999, buffer_size: int = 0,
+                          window_size: int = DEFAULT_WINDOW, rate_controller: RateController | None = None,
+                          timeout: float = 3.0) -> list[array[int]]:
+    """
+    파일을 세션 모드로 전송하는 코루틴입니다. 실행 중인 이벤트 루프 위에서 스레드 없이 동작하므로
+    여러 전송을 asyncio.gather 등으로 함께 실행할 수 있습니다.
+    Args:
+        filename : 전송할 파일
+        host, port : 멀티 세션 서버의 주소 및 포트
+        buffer_size : 세션 헤더를 포함한 패킷 하나의 최대 크기, 0이면 경로 MTU probe로 확인한 크기에 맞춥니다.
+        window_size : in-flight 윈도우 크기
+        rate_controller : 전송 간격을 조절하는 제어기
+        timeout : 해당 시간동안 ACK가 없을 경우 예외를 발생시킵니다.
+
+    Returns:
+        재전송한 seq_number들의 배열 목록을 반환합니다.
+
+    Raises:
+        FileNotFoundError : 파일이 없는 경우 발생합니다.
+        TimeoutError : 수신측이 응답하지 않거나 해당 시간동안 ACK가 없을 경우 발생합니다.
+    """
+    loop = asyncio.get_running_loop()
+    session_id = secrets.randbits(32)
+    if not Path(filename).is_file():
+        raise FileNotFoundError(f"파일 {filename}을(를) 찾을 수 없습니다.")
+    transport, protocol = await loop.create_datagram_endpoint(
+        lambda: SessionSender(payload_candidates((host, port), buffer_size), session_id, window_size,
+                              rate_controller, timeout),
+        remote_addr=(host, port))
+    try:
+        path_size = await protocol.path_size
+        if 0 < buffer_size and path_size < buffer_size:
+            print(f"패킷 크기 {buffer_size}은(는) 경로에서 조각나므로 {path_size}(으)로 줄입니다.")
+        buffer_size = path_size
+        chunk_size = buffer_size - SESSION_HEADER.size - DATA_HEADER.size - DATA_TIMESTAMP.size
+
+        with MmapPacketSource(filename, chunk_size, pack_session(KIND_DATA, session_id),
+                              echo=TimestampEcho(RttEstimator())) as packet_source:
+            file_info = pack_session(KIND_INFO, session_id,
+                                     pack_file_info(buffer_size, len(packet_source), filename,
+                                                    FLAG_SELECTIVE_REPEAT | FLAG_SESSION | FLAG_TIMESTAMP, window_size))
+            start_time = loop.time()
+            protocol.start(packet_source, file_info)
+            losses = await protocol.finished
+    finally:
+        transport.close()
+    print(f"파일 {filename} 전송")
+    print(f"소요시간 {loop.time() - start_time}")
+    return losses
+
+
+class SessionReceiver(asyncio.DatagramProtocol):
+    """
+    세션 모드 전송을 asyncio 이벤트 루프에서 수신합니다. start_mux_server와 같은 wire format을 사용하며,
+    세션마다 ReceiveSession 하나와 NACK 타이머 하나를 루프에 등록하므로 많은 세션을 하나의 루프에서 처리할 수 있습니다.
+    기존 asyncio 서비스에 넣을 때는 loop.create_datagram_endpoint(lambda: SessionReceiver(...), local_addr=...)로 사용합니다.
+    """
+
+    def __init__(self, target_dir: str = "received", nack_interval: float = 0.05, timeout: float = 5):
+        """
+        Args:
+            target_dir : 수신한 파일을 저장할 디렉터리
+            nack_interval : RTT 표본을 얻기 전의 세션별 NACK 간격이자 타이머 주기
+            timeout : 해당 시간동안 패킷이 없는 세션은 실패로 정리합니다.
+        """
+        self.loop = asyncio.get_running_loop()
+        self.target_dir = target_dir
+        self.nack_interval = nack_interval
+        self.timeout = timeout
+        self.transport = None
+        self.monitor = None
+        self.sessions: dict[int, ReceiveSession] = {}
+        self.timers: dict[int, asyncio.TimerHandle] = {}
+        Path(target_dir).mkdir(parents=True, exist_ok=True)
+
+    def connection_made(self, transport: asyncio.DatagramTransport):
+        self.transport = transport
+        sock = transport.get_extra_info('socket')
+        if sock is not None:
+            check_receive_buffer(sock)
+            # 이벤트 루프가 recvfrom으로 읽으므로 drop 수는 /proc/net/udp에서만 얻습니다.
+            self.monitor = BufferMonitor(sock)
+
+    def datagram_received(self, data: bytes, addr: tuple):
+        now = self.loop.time()
+        if answer_probe(self.transport, data, addr):
+            return
+        try:
+            kind, session_id = SESSION_HEADER.unpack_from(data)
+            payload = memoryview(data)[SESSION_HEADER.size:]
+            if kind == KIND_DATA:
+                session = self.sessions.get(session_id)
+                if session is not None:
+                    for packed in session.on_data(payload, now):
+                        self.transport.sendto(packed, session.client_address)
+
+            elif kind == KIND_INFO:
+                session = self.sessions.get(session_id)
+                if session is None:
+                    session = open_receive_session(session_id, addr, payload, self.target_dir, now,
+                                                   self.nack_interval, self.timeout,
+                                                   self.transport.get_extra_info('socket'), self.monitor)
+                    if session is None:
+                        return
+                    self.sessions[session_id] = session
+                    self.timers[session_id] = self.loop.call_later(session.nack.interval, self._on_timer, session_id)
+                # 파일 정보가 중복으로 와도 수락 응답은 다시 보냅니다.
+                self.transport.sendto(session.accept, addr)
+        except (struct.error, UnicodeDecodeError) as e:
+            print(f"잘못된 패킷 감지됨: {e}")
+
+    def _on_timer(self, session_id: int):
+        session = self.sessions[session_id]
+        now = self.loop.time()
+        for packed in session.on_timer(now):
+            self.transport.sendto(packed, session.client_address)
+        if session.expired(now):
+            del self.sessions[session_id]
+            del self.timers[session_id]
+            return
+        # 타이머 주기는 세션이 잰 RTO를 따릅니다.
+        self.timers[session_id] = self.loop.call_later(session.nack.interval, self._on_timer, session_id)
+
+    def error_received(self, exc: Exception):
+        pass
+
+    def connection_lost(self, exc: Exception | None):
+        for timer in self.timers.values():
+            timer.cancel()
+        for session in self.sessions.values():
+            if session.finished_at is None:
+                session.reassembler.close()
+        self.timers.clear()
+        self.sessions.clear()
+
+
+async def start_async_server(host: str = 'localhost', port: int = 9999, target_dir: str = "received",
+                             nack_interval: float = 0.05, timeout: float = 5):
+    """
+    SessionReceiver로 세션 모드 전송을 수신하는 서버를 실행합니다. 취소될 때까지 반환하지 않습니다.
+    """
+    loop = asyncio.get_running_loop()
+    transport, _ = await loop.create_datagram_endpoint(
+        lambda: SessionReceiver(target_dir, nack_interval, timeout), local_addr=(host, port))
+    print(f"asyncio 멀티 세션 서버가 {host}:{port}에서 시작되었습니다...")
+    print(f"파일을 받을 디렉터리: {target_dir}")
+    try:
+        await loop.create_future()
+    finally:
+        transport.close()
@@ -1,23 +1,163 @@
 import array
+import errno
 import math
+import multiprocessing
 import os
+import secrets
+import select
 import socket
-import struct
+import tempfile
 import time
 from array import array
 
+from batch import BATCH_SUFFIX, collect_files, write_batch
+from chunk_source import CompressedPacketSource, MmapPacketSource
+from compression import Codec, make_codec
+from delta import write_signatures
+from fec import FecEncoder
+from integrity import DigestWorker
+from metrics import TransferMetrics
+from offload import gso_supported, max_gso_segments, send_segments
+from pacer import TokenBucketPacer
+from path_mtu import payload_candidates, set_dont_fragment
+from protocol import (ACCEPT, CHUNK_CHECKSUM, DATA_HEADER, DATA_TIMESTAMP, FLAG_BATCH, FLAG_CHECKSUM, FLAG_DELTA, FLAG_FEC,
+                      FLAG_RESUME, FLAG_SELECTIVE_REPEAT, FLAG_SESSION, FLAG_STRIPED, FLAG_TIMESTAMP, HANDSHAKE_REPLIES,
+                      KIND_ACCEPT, KIND_ACK, KIND_DATA, KIND_INFO, RECEIPT, RESUME, SESSION_HEADER,
+                      STRIPES_READY, pack_file_info, pack_probe, pack_session, probe_size, stripe_ranges, strip_session,
+                      unpack_accept)
+from rate_control import RateController
+from rtt import RttEstimator, TimestampEcho
+from sack import ack_echoed_at, ack_pressure, ack_timestamp, ranges_to_seqs, unpack_ack
+from window import DeliveryTracker, SendWindow
+
 KB = 1024
+ACK_PART_TIMEOUT = 0.05
+NACK_POLL_EVERY = 32
+DEFAULT_STRIPE_WINDOW = 256
+HAS_SENDMSG = hasattr(socket.socket, 'sendmsg')
+# 델타 모드에서 수신측이 이전 버전을 훑는 동안 응답을 기다리는 횟수 (1초 간격)
+DELTA_WAIT_RETRIES = 60
+# 경로 MTU probe의 응답을 기다리는 시간(초)과 재전송 횟수
+PROBE_TIMEOUT = 1.0
+PROBE_RETRIES = 3
+# 첫 probe 응답을 받은 뒤 더 큰 probe의 응답을 기다리는 최소 시간(초)
+PROBE_GRACE = 0.05
+
+
+def payload_chunk_size(buffer_size: int, session: bool = False, verify: bool = False) -> int:
+    """
+    buffer_size 바이트 데이터 패킷에 담을 수 있는 청크의 크기를 반환합니다.
+    모든 데이터 패킷에는 RTT 측정용 타임스탬프가 실리고, 세션 모드는 세션 헤더를, verify는 CRC32를 더 싣습니다.
+    """
+    chunk_size = buffer_size - DATA_HEADER.size - DATA_TIMESTAMP.size
+    if session:
+        chunk_size -= SESSION_HEADER.size
+    if verify:
+        chunk_size -= CHUNK_CHECKSUM.size
+    return chunk_size
+
+
+def sendto_blocking(sock: socket.socket, packet: bytes, server_addr: tuple[str, int]):
+    """
+    non-blocking 소켓에서 송신 버퍼가 가득 찬 경우, 쓸 수 있을 때까지 기다렸다가 전송합니다.
+    """
+    while True:
+        try:
+            return sock.sendto(packet, server_addr)
+        except BlockingIOError:
+            select.select([], [sock], [])
+
+
+def sendmsg_blocking(sock: socket.socket, buffers: tuple | list, server_addr: tuple[str, int]):
+    """
+    여러 버퍼를 이어붙이지 않고 하나의 datagram으로 전송합니다. 송신 버퍼가 가득 찬 경우 쓸 수 있을 때까지 기다립니다.
+    sendmsg가 없는 플랫폼(Windows)에서는 버퍼를 합쳐서 sendto로 보냅니다.
+    """
+    if not HAS_SENDMSG:
+        return sendto_blocking(sock, b''.join(buffers), server_addr)
+    while True:
+        try:
+            return sock.sendmsg(buffers, (), 0, server_addr)
+        except BlockingIOError:
+            select.select([], [sock], [])
+
+
+def send_packets(sock: socket.socket, packet_source: MmapPacketSource, seq_numbers: list[int] | array[int],
+                 server_addr: tuple[str, int], gso_segments: int = 1):
+    """
+    seq_numbers의 패킷들을 packet_source의 (헤더, 청크) 버퍼로 복사 없이 전송합니다.
+    gso_segments가 1보다 크면 같은 크기의 패킷을 최대 gso_segments개씩 묶어 UDP_SEGMENT(GSO)로 한 번의 시스템 콜에 보냅니다.
+    크기가 작은 패킷(마지막 청크)은 묶음의 마지막에만 둡니다.
+    """
+    if gso_segments <= 1:
+        for seq_number in seq_numbers:
+            sendmsg_blocking(sock, packet_source.buffers(seq_number), server_addr)
+        return
+
+    def flush(group: list[int]):
+        segment_size = packet_source.packet_size(group[0])
+        limit = max_gso_segments(segment_size, gso_segments)
+        for i in range(0, len(group), limit):
+            part = group[i:i + limit]
+            if len(part) == 1:
+                sendmsg_blocking(sock, packet_source.buffers(part[0]), server_addr)
+                continue
+            buffers = []
+            for slot, seq_number in enumerate(part):
+                buffers.extend(packet_source.buffers(seq_number, slot))
+            while True:
+                try:
+                    send_segments(sock, buffers, segment_size, server_addr)
+                    break
+                except BlockingIOError:
+                    select.select([], [sock], [])
+
+    group = []
+    group_size = 0
+    for seq_number in seq_numbers:
+        size = packet_source.packet_size(seq_number)
+        if group and size > group_size:
+            flush(group)
+            group = []
+        if not group:
+            group_size = size
+        group.append(seq_number)
+        if size < group_size or len(group) >= gso_segments:
+            flush(group)
+            group = []
+    if group:
+        flush(group)
 
 
-def wait_ack(sock: socket.socket, timeout: float = 3.0) -> array[int]:
+def send_parity(sock: socket.socket, encoder: FecEncoder, packet_source: MmapPacketSource,
+                seq_numbers: list[int] | range, server_addr: tuple[str, int], last: bool = False):
+    """
+    처음 전송한 청크들을 FEC 그룹에 더하고 가득 찬 그룹의 parity 패킷을 전송합니다.
+    last가 True이면 채워지지 않은 마지막 그룹의 parity도 보냅니다.
+    """
+    for seq_number in seq_numbers:
+        parity = encoder.add(seq_number, packet_source.chunk(seq_number))
+        if parity is not None:
+            sendto_blocking(sock, parity, server_addr)
+    if last:
+        parity = encoder.flush()
+        if parity is not None:
+            sendto_blocking(sock, parity, server_addr)
+
+
+def wait_ack(sock: socket.socket, timeout: float = 3.0, echo: TimestampEcho | None = None,
+             metrics: TransferMetrics | None = None) -> tuple[array[int], int]:
     """
     ack를 기다립니다. 일정 시간동안 응답이 없을 경우 예외를 발생시킵니다.
+    여러 datagram으로 나뉜 ack는 마지막 조각을 받거나, ACK_PART_TIMEOUT 동안 다음 조각이 없을 때까지 모읍니다.
     Args:
         sock : ack를 받아들일 socket을 지정합니다.
         timeout : ack가 해당 시간동안 없을 경우 예외를 발생시킵니다.
+        echo : 지정하면 ack에 실린 타임스탬프로 RTT를 잽니다.
+        metrics : 지정하면 ack에 실린 수신측의 버퍼 상태를 반영합니다.
 
     Returns:
-        ack를 받았을 경우 해당 ack에 존재하는 missed_seq_numbers를 반환합니다.
+        ack를 받았을 경우 해당 ack에 존재하는 missed_seq_numbers와 수신측이 기다리는 마지막 seq_number를 반환합니다.
 
     Raises:
         socket.timeout : 해당 소켓에서 일정 시간동안 응답이 없을 경우 발생합니다.
@@ -25,62 +165,540 @@ def wait_ack(sock: socket.socket, timeout: float = 3.0) -> array[int]:
     sock.settimeout(timeout)
 
     try:
-        packed_data, addr = sock.recvfrom(KB * 32)
-        # ACK는 정수의 배열
-        result_array = array('i')
-        result_array.frombytes(packed_data)
-        print(f"ACK전달받음 : {result_array}")
+        while True:
+            packed_data, addr = sock.recvfrom(KB * 32)
+            # 파일 정보를 재전송해 늦게 도착한 핸드셰이크 응답은 건너뜁니다.
+            if not packed_data.startswith(HANDSHAKE_REPLIES):
+                break
+        # ACK는 누락 구간 (start, count) 쌍의 배열
+        cum_ack, highest, cover_start, cover_end, ranges = unpack_ack(packed_data)
+        on_ack_timestamp(echo, packed_data)
+        on_ack_pressure(metrics, packed_data)
+        sock.settimeout(ACK_PART_TIMEOUT)
+        while cover_end < highest:
+            try:
+                packed_data, addr = sock.recvfrom(KB * 32)
+            except socket.timeout:
+                break
+            _, _, _, cover_end, part = unpack_ack(packed_data)
+            ranges.extend(part)
+        result_array = ranges_to_seqs(ranges)
+        print(f"ACK전달받음 : 누락 {len(result_array)}개")
     except socket.timeout:
         raise socket.timeout
 
     sock.setblocking(False)
-    return result_array
+    return result_array, highest - 1
 
 
-def process_ack(sock: socket.socket, client_address: tuple, packet_dict : dict, last_seq_number : int, timeout: float = 0.5) -> array[int]:
+def process_ack(sock: socket.socket, client_address: tuple, packet_dict : dict, last_seq_number : int, timeout: float = 3.0,
+                rtt: RttEstimator | None = None, echo: TimestampEcho | None = None,
+                metrics: TransferMetrics | None = None) -> tuple[array[int], int]:
     """
     ack를 받아 처리하고, ack가 오지 않을 경우 마지막 chucnk를 재전송합니다. ack를 받을 경우 ack를 반환합니다.
+    재전송 간격은 RTO를 따르고 재전송할 때마다 두 배로 늘어납니다.
 
     Args:
         sock : ACK수신 및 마지막 청크 재전송을 위한 소켓입니다.
         client_address : 이를 위한 타켓 네트워크 주소 및 포트입니다.
-        packet_dict : ACK를 전달맏지 못할 경우 전송하는데 사용하는 패킷 dict입니다.
+        packet_dict : ACK를 전달맏지 못할 경우 전송하는데 사용하는 패킷 dict 또는 MmapPacketSource입니다.
         last_seq_number : 현재 전송에서 ACK를 유발하는 마지막 seq_number입니다.
+        timeout : 해당 시간동안 ACK가 없으면 포기합니다. RTO가 긴 경로에서는 RTO에 비례해 늘어납니다.
+        rtt : 재전송 간격을 정하는 RTT 추정기, 생략하면 echo의 추정기나 0.5초에서 시작하는 추정기를 사용합니다.
+        echo : 지정하면 ack에 실린 타임스탬프로 rtt를 갱신합니다.
+        metrics : 지정하면 ack에 실린 수신측의 버퍼 상태를 반영합니다.
     """
+    if rtt is None:
+        rtt = echo.rtt if echo is not None else RttEstimator(0.5)
+    give_up = time.time() + rtt.give_up_timeout(timeout)
     retry_count = 0
     while True:
         try:
             print(f"ACK를 기다리는 중")
             print(f"받아야 할 seq_number: {last_seq_number}")
-            return wait_ack(sock, timeout)
+            return wait_ack(sock, rtt.rto, echo, metrics)
         except socket.timeout:
-            retry_count += 1
-            if retry_count > 5:
+            if time.time() >= give_up:
                 print(f"재전송 초과됨 횟수 초과됨")
                 raise socket.timeout
+            rtt.on_timeout()
+            retry_count += 1
             print(f"ACK 재전송 seq_number {last_seq_number} | 재전송 : {retry_count}")
             sock.sendto(packet_dict[last_seq_number], client_address)
 
 
+def on_ack_timestamp(echo: TimestampEcho | None, packed_data: bytes) -> bool:
+    """
+    ACK datagram에 실린 타임스탬프를 echo에 반영합니다.
+    Returns:
+        새 RTT 표본을 반영했으면 True를 반환합니다.
+    """
+    if echo is None:
+        return False
+    timestamp = ack_timestamp(packed_data)
+    return timestamp is not None and echo.on_receive(*timestamp, time.time())
+
 
-def resend_dropped_data(sock: socket.socket, dropped_seq_numbers: list[int] | array[int], packet_dict: dict,
-                        server_addr: tuple[str, int]):
+def on_ack_pressure(metrics: TransferMetrics | None, packed_data: bytes):
     """
+    ACK datagram에 실린 수신측의 버퍼 상태를 metrics에 반영합니다.
+    보고된 손실 중 rx_drops만큼은 경로의 혼잡이 아니라 수신측이 처리를 따라가지 못해 커널이 버린 것입니다.
+    """
+    if metrics is None:
+        return
+    pressure = ack_pressure(packed_data)
+    if pressure is not None:
+        metrics.on_pressure(*pressure)
+
+
+
+def make_pacer(rate_controller: RateController | None, interval: float, packet_size: int) -> TokenBucketPacer | None:
+    """
+    송신 루프의 pacer를 만듭니다. 제어기가 있으면 제어기의 속도를, 없으면 interval마다 패킷 하나를 보내는 속도를 따릅니다.
+    제어기의 속도는 ACK마다 바뀌므로 송신 루프는 기다리기 전에 pacer.rate를 rate_controller.rate로 갱신합니다.
+    Returns:
+        제어기가 없고 interval이 0 이하이면 속도를 제한하지 않으므로 None을 반환합니다.
+    """
+    if rate_controller is not None:
+        return TokenBucketPacer(rate_controller.rate, packet_size)
+    if interval > 0:
+        return TokenBucketPacer(packet_size / interval, packet_size)
+    return None
+
 
+def resend_dropped_data(sock: socket.socket, dropped_seq_numbers: list[int] | array[int],
+                        packet_source: MmapPacketSource, server_addr: tuple[str, int],
+                        pacer: TokenBucketPacer | None = None, gso_segments: int = 1):
     """
-    for seq_number in dropped_seq_numbers:
-        sock.sendto(packet_dict[seq_number], server_addr)
+    손실된 패킷들을 gso_segments개씩 묶어 재전송합니다. pacer가 지정되면 묶음마다 pacer의 속도에 맞춰 기다립니다.
+    """
+    if pacer is None:
+        send_packets(sock, packet_source, dropped_seq_numbers, server_addr, gso_segments)
+        return
+    step = max(1, gso_segments)
+    for i in range(0, len(dropped_seq_numbers), step):
+        batch = dropped_seq_numbers[i:i + step]
+        pacer.wait(sum(packet_source.packet_size(seq_number) for seq_number in batch))
+        send_packets(sock, packet_source, batch, server_addr, gso_segments)
+
+
+def drain_nacks(sock: socket.socket, packet_source: MmapPacketSource, server_addr: tuple[str, int],
+                sent_until: int, metrics: TransferMetrics | None = None,
+                tracker: DeliveryTracker | None = None) -> tuple[array[int], int | None]:
+    """
+    전송 도중 수신측이 보낸 NACK를 모두 읽고, 이미 보낸 범위(sent_until 미만)의 누락 패킷을 바로 재전송합니다.
+    소켓은 non-blocking 상태여야 합니다. metrics를 지정하면 NACK에 실린 수신측의 버퍼 상태를 반영합니다.
+    tracker를 지정하면 NACK의 cum_ack와 누락 구간으로 새로 수신 확인된 청크 수를 셉니다.
+
+    Returns:
+        (재전송한 seq_number들의 배열, 새로 수신 확인된 청크 수), 읽은 NACK가 없거나 tracker가 없으면 청크 수는 None입니다.
+    """
+    resent = array('i')
+    delivered = None
+    while True:
+        try:
+            packed_data = sock.recv(KB * 32)
+        except BlockingIOError:
+            break
+        if packed_data.startswith(HANDSHAKE_REPLIES):
+            continue
+        cum_ack, _, cover_start, cover_end, ranges = unpack_ack(packed_data)
+        if tracker is not None:
+            delivered = (delivered or 0) + tracker.on_ack(cum_ack, cover_start, cover_end, ranges)
+        on_ack_timestamp(packet_source.echo, packed_data)
+        on_ack_pressure(metrics, packed_data)
+        for i in range(0, len(ranges), 2):
+            resent.extend(range(ranges[i], min(ranges[i] + ranges[i + 1], sent_until)))
+
+    for seq_number in resent:
+        sendmsg_blocking(sock, packet_source.buffers(seq_number), server_addr)
+    return resent, delivered
+
+
+def send_selective_repeat(sock: socket.socket, server_addr: tuple[str, int], packet_source: MmapPacketSource,
+                          window_size: int, timeout: float = 3.0,
+                          rate_controller: RateController | None = None, gso_segments: int = 1,
+                          first_seq: int = 0, end_seq: int | None = None,
+                          session_id: int | None = None, fec: FecEncoder | None = None,
+                          resume_ack: tuple[int, array[int]] | None = None,
+                          metrics: TransferMetrics | None = None) -> list[array[int]]:
+    """
+    selective-repeat 방식으로 파일을 전송합니다. 최대 window_size개의 패킷을 확인 없이 전송하고,
+    수신측이 주기적으로 보내는 ACK에 따라 새 패킷 전송과 손실 패킷 재전송을 함께 진행합니다.
+    재전송 타이머는 ACK에 되돌아온 타임스탬프(packet_source.echo가 없으면 재전송하지 않은 패킷의 ACK)로 잰 RTO를 따릅니다.
+    Args:
+        sock : 전송에 사용할 소켓
+        server_addr : 서버의 주소 및 포트
+        packet_source : 첫 전송과 재전송에 사용할 패킷 source
+        window_size : in-flight 윈도우 크기
+        timeout : 해당 시간동안 ACK가 없을 경우 예외를 발생시킵니다. RTO가 긴 경로에서는 RTO에 비례해 늘어납니다.
+        rate_controller : 지정된 경우 제어기가 정하는 속도(바이트/초)에 맞춰 패킷을 보냅니다. None이면 윈도우만으로 전송량을 제한합니다.
+        gso_segments : 1보다 크면 연속된 패킷을 이 개수만큼 묶어 GSO로 전송합니다.
+        first_seq, end_seq : 파일의 [first_seq, end_seq) 구간만 전송합니다. end_seq를 생략하면 파일 끝까지 전송합니다.
+        session_id : 세션 모드의 세션 id, 지정된 경우 같은 세션의 ACK만 처리합니다.
+        fec : 지정된 경우 새로 보내는 청크마다 FEC 그룹을 만들어 parity 패킷을 함께 보냅니다.
+        resume_ack : 이어받기 응답의 (cum_ack, 누락 구간), 지정된 경우 누락 구간의 청크만 전송합니다.
+        metrics : 전송 지표를 모을 TransferMetrics, 생략하면 새로 만듭니다.
+
+    Returns:
+        재전송한 seq_number들의 배열 목록을 반환합니다.
+
+    Raises:
+        socket.timeout : 해당 시간동안 ACK가 없을 경우 발생합니다.
+    """
+    total_chunks = len(packet_source) if end_seq is None else end_seq
+    echo = packet_source.echo
+    window = SendWindow(total_chunks, window_size, first_seq=first_seq, rtt=echo.rtt if echo is not None else None)
+    skipped = window.skip_received(*resume_ack) if resume_ack is not None else 0
+    if metrics is None:
+        metrics = TransferMetrics(f"send:{server_addr[1]}:{first_seq}", 'send', total_chunks - first_seq,
+                                  packet_source.chunk_size)
+    metrics.rtt = window.rtt
+    # 이어받기나 델타 모드로 건너뛴 청크는 cum_ack 뒤에 있어도 이미 전달된 것으로 셉니다.
+    metrics.delivered += skipped
+    losses = []
+
+    sock.setblocking(False)
+    last_ack_time = time.time()
+    pacer = make_pacer(rate_controller, 0.0, packet_source.header_size + packet_source.chunk_size)
+
+    def transmit(seq_numbers: list[int]):
+        send_packets(sock, packet_source, seq_numbers, server_addr, gso_segments)
+        metrics.packets_sent += len(seq_numbers)
+        sent_at = time.time()
+        for seq_number in seq_numbers:
+            window.on_sent(seq_number, sent_at)
+        if pacer is not None:
+            pacer.consume(sum(packet_source.packet_size(seq_number) for seq_number in seq_numbers))
+
+    while not window.done():
+        now = time.time()
+
+        # 도착한 ACK를 모두 처리
+        retransmit = []
+        while True:
+            try:
+                packed_data = sock.recv(KB * 32)
+            except BlockingIOError:
+                break
+            if session_id is not None:
+                packed_data = strip_session(packed_data, KIND_ACK, session_id)
+                if packed_data is None:
+                    continue
+            elif packed_data.startswith(HANDSHAKE_REPLIES):
+                # 파일 정보를 재전송해 중복으로 도착한 수락 응답이나 이어받기 응답
+                continue
+            cum_ack, _, cover_start, cover_end, ranges = unpack_ack(packed_data)
+            metrics.packets_received += 1
+            last_ack_time = now
+            echoed_at = ack_echoed_at(packed_data, time.time()) if echo is not None else None
+            acked_retransmit = window.on_ack(cum_ack, cover_start, cover_end, ranges, now, echoed_at)
+            if echo is not None:
+                on_ack_timestamp(echo, packed_data)
+            elif window.rtt_sample is not None:
+                window.rtt.sample(window.rtt_sample, now)
+            on_ack_pressure(metrics, packed_data)
+            retransmit.extend(acked_retransmit)
+            if fec is not None:
+                fec.on_loss(len(acked_retransmit))
+            if rate_controller is not None:
+                rate_controller.on_ack(window.newly_acked, len(acked_retransmit), window.rtt_sample, now)
+            metrics.on_ack(window.newly_acked, len(acked_retransmit), window.rtt_sample)
+
+        expired = window.expired(now)
+        if expired and rate_controller is not None:
+            rate_controller.on_ack(0, len(expired), None, now)
+        retransmit = list(dict.fromkeys(retransmit + expired))
+        if retransmit:
+            losses.append(array('i', retransmit))
+            metrics.retransmitted += len(retransmit)
+            transmit(retransmit)
+
+        if pacer is not None:
+            pacer.rate = rate_controller.rate
+        while window.can_send_new():
+            if pacer is not None and pacer.delay_ns() > 0:
+                break
+            batch = [window.take_new()]
+            while len(batch) < gso_segments and window.can_send_new():
+                batch.append(window.take_new())
+            transmit(batch)
+            if fec is not None:
+                send_parity(sock, fec, packet_source, batch, server_addr, last=window.next_seq >= total_chunks)
+        packet_source.release(window.cum_ack)
+        metrics.progress(now)
+
+        if window.done():
+            break
+        if now - last_ack_time > window.rtt.give_up_timeout(timeout):
+            print(f"\nACK 대기 시간 초과")
+            raise socket.timeout
+
+        deadline = window.next_deadline()
+        wait = timeout if deadline is None else max(0.0, deadline - time.time())
+        if pacer is not None and window.can_send_new():
+            # select도 늦게 깨어나므로 다음 전송까지 spin_threshold_ns를 남기고 기다리고, 그보다 가까우면 기다리지 않습니다.
+            pace_ns = pacer.delay_ns() - pacer.spin_threshold_ns
+            wait = min(wait, max(0, pace_ns) / 1e9)
+        select.select([sock], [], [], wait)
+
+    metrics.finish()
+    return losses
+
+
+def open_packet_source(filename: str, chunk_size: int, codec: Codec | None, prefix: bytes = b'',
+                       checksum: bool = False, timestamps: bool = True) -> MmapPacketSource:
+    """
+    codec이 지정되면 청크를 압축해 보내는 CompressedPacketSource를, 아니면 MmapPacketSource를 엽니다.
+    timestamps가 True이면 패킷마다 RTT 측정용 타임스탬프를 싣습니다.
+    """
+    echo = TimestampEcho(RttEstimator()) if timestamps else None
+    if codec is None:
+        return MmapPacketSource(filename, chunk_size, prefix, checksum, echo)
+    return CompressedPacketSource(filename, chunk_size, codec, prefix, checksum, echo=echo)
+
+
+def send_stripe(filename: str, server_addr: tuple[str, int], chunk_size: int, first_seq: int, end_seq: int,
+                window_size: int, rate_controller: RateController | None = None,
+                gso_segments: int = 1, fec_group: int = 0, fec_adaptive: bool = False,
+                checksum: bool = False, codec: Codec | None = None) -> list[array[int]]:
+    """
+    스트라이핑 모드에서 하나의 worker 프로세스가 담당하는 [first_seq, end_seq) 구간을 자신의 소켓으로 전송합니다.
+    """
+    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    try:
+        fec = FecEncoder(chunk_size, fec_group, fec_adaptive) if fec_group > 0 else None
+        with open_packet_source(filename, chunk_size, codec, checksum=checksum) as packet_source:
+            return send_selective_repeat(sock, server_addr, packet_source, window_size, rate_controller=rate_controller,
+                                         gso_segments=gso_segments, first_seq=first_seq, end_seq=end_seq, fec=fec)
+    except socket.timeout:
+        return [array('i', [-1])]
+    finally:
+        sock.close()
 
 
-def send_file(filename: str, host: str = 'localhost', port: int = 9999, buffer_size: int = 4096, interval: float = 0.001):
+def probe_path(sock: socket.socket, server_addr: tuple[str, int], sizes: list[int],
+               timeout: float = PROBE_TIMEOUT, retries: int = PROBE_RETRIES) -> int:
+    """
+    sizes의 크기마다 그만큼 채운 PROBE datagram을 한꺼번에 보내고, 수신측이 돌려준 가장 큰 크기를 반환합니다.
+    소켓에 DF 비트가 켜져 있으면 경로 MTU보다 큰 probe는 조각나지 않고 버려지므로, 돌아온 크기는 경로를 그대로 통과한 크기입니다.
+    가장 큰 probe가 돌아오면 바로 반환하고, 아니면 첫 응답 뒤 그때까지 걸린 시간만큼(최소 PROBE_GRACE) 더 기다립니다.
+    Args:
+        sizes : 확인할 패킷 크기, 큰 것부터
+    Returns:
+        수신측이 받은 가장 큰 probe의 크기
+    Raises:
+        socket.timeout : retries번 보내도 probe 응답이 하나도 없는 경우 발생합니다.
+    """
+    for _ in range(retries):
+        for size in sizes:
+            try:
+                sock.sendto(pack_probe(size), server_addr)
+            except OSError as e:
+                # 나가는 인터페이스의 MTU보다 큰 probe는 커널이 바로 거부합니다.
+                if e.errno != errno.EMSGSIZE:
+                    raise
+        sent_at = time.time()
+        deadline = sent_at + timeout
+        best = 0
+        while True:
+            remaining = deadline - time.time()
+            if remaining <= 0:
+                break
+            sock.settimeout(remaining)
+            try:
+                packed_data, _ = sock.recvfrom(KB)
+            except socket.timeout:
+                break
+            size = probe_size(packed_data)
+            if size not in sizes:
+                continue
+            if best == 0:
+                now = time.time()
+                deadline = min(deadline, now + max(PROBE_GRACE, now - sent_at))
+            best = max(best, size)
+            if best == sizes[0]:
+                break
+        if best:
+            return best
+        print(f"경로 MTU probe 응답 대기 중, probe 재전송")
+    raise socket.timeout
+
+
+def negotiate(sock: socket.socket, file_info: bytes, server_addr: tuple[str, int], accept_prefix: bytes = ACCEPT,
+              timeout: float = 1.0, retries: int = 5) -> tuple[int, int, float | None]:
+    """
+    파일 정보를 보내고 수신측의 수락 응답을 기다립니다. 응답이 없으면 같은 파일 정보를 다시 보냅니다.
+    Args:
+        accept_prefix : 수락 응답의 머리, 세션 모드에서는 KIND_ACCEPT 세션 헤더입니다.
+    Returns:
+        (수신측이 받아들인 flags, 수신측이 허용한 window_size, RTT 표본)
+        RTT 표본은 첫 파일 정보에 대한 응답일 때만 측정하고, 재전송한 경우에는 어느 전송의 응답인지 모르므로 None입니다.
+    Raises:
+        socket.timeout : retries번 재전송해도 응답이 없을 경우 발생합니다.
+    """
+    sock.settimeout(timeout)
+    for attempt in range(retries):
+        sent_at = time.time()
+        sock.sendto(file_info, server_addr)
+        try:
+            while True:
+                packed_data, _ = sock.recvfrom(KB)
+                accepted = unpack_accept(packed_data, accept_prefix)
+                if accepted is not None:
+                    return *accepted, (time.time() - sent_at if attempt == 0 else None)
+        except socket.timeout:
+            print(f"수신측 수락 대기 중, 파일 정보 재전송")
+    raise socket.timeout
+
+
+def wait_ready(sock: socket.socket, file_info: bytes, server_addr: tuple[str, int], ready_message: bytes,
+               timeout: float = 1.0, retries: int = 5):
+    """
+    수신측이 ready_message로 전송 준비를 알릴 때까지 기다립니다. 응답이 없으면 파일 정보를 다시 보냅니다.
+    스트라이핑 모드에서 수신측은 스트림별 소켓을 모두 연 뒤 응답합니다.
+    Raises:
+        socket.timeout : retries번 재전송해도 응답이 없을 경우 발생합니다.
+    """
+    sock.settimeout(timeout)
+    for _ in range(retries):
+        try:
+            packed_data, _ = sock.recvfrom(KB)
+            if packed_data == ready_message:
+                return
+        except socket.timeout:
+            print(f"수신측 준비 대기 중, 파일 정보 재전송")
+            sock.sendto(file_info, server_addr)
+    raise socket.timeout
+
+
+def wait_resume(sock: socket.socket, file_info: bytes, server_addr: tuple[str, int], timeout: float = 1.0,
+                retries: int = 5) -> tuple[int, array[int]]:
+    """
+    이어받기나 델타 요청에 대한 수신측의 응답을 기다립니다. 응답이 없거나 일부 datagram만 도착하면 파일 정보를 다시 보냅니다.
+    Returns:
+        (cum_ack, [cum_ack, total_chunks) 구간의 누락 구간)
+    Raises:
+        socket.timeout : retries번 재전송해도 응답을 모두 받지 못한 경우 발생합니다.
+    """
+    sock.settimeout(timeout)
+    parts = {}  # cover_start -> (cover_end, ranges)
+    for _ in range(retries):
+        try:
+            while True:
+                packed_data, _ = sock.recvfrom(KB * 32)
+                if not packed_data.startswith(RESUME):
+                    continue
+                cum_ack, highest, cover_start, cover_end, ranges = unpack_ack(packed_data[len(RESUME):])
+                parts[cover_start] = (cover_end, ranges)
+                # 각 datagram의 cover 구간이 [cum_ack, highest)를 빈틈없이 덮으면 응답을 모두 받은 것입니다.
+                missed = array('I')
+                position = cum_ack
+                while position < highest and position in parts:
+                    position, part = parts[position]
+                    missed.extend(part)
+                if position >= highest:
+                    return cum_ack, missed
+        except socket.timeout:
+            print(f"수신측 응답 대기 중, 파일 정보 재전송")
+            sock.sendto(file_info, server_addr)
+    raise socket.timeout
+
+
+def send_signatures(sock: socket.socket, server_addr: tuple[str, int], file_info: bytes,
+                    packet_source: MmapPacketSource, window_size: int, checksum: bool = False) -> tuple[int, array[int]]:
+    """
+    델타 모드에서 새 파일의 청크 서명을 파일과 같은 selective-repeat 경로로 보내고,
+    수신측이 이전 버전에서 찾지 못한 청크 구간을 받습니다.
+    Returns:
+        (cum_ack, [cum_ack, total_chunks) 구간의 누락 구간)
+    Raises:
+        socket.timeout : 서명 전송이나 응답 대기 중 수신측이 응답하지 않는 경우 발생합니다.
+    """
+    with tempfile.TemporaryFile() as signature_file:
+        write_signatures(packet_source, signature_file)
+        signature_file.flush()
+        with MmapPacketSource(signature_file, packet_source.chunk_size, checksum=checksum,
+                              echo=packet_source.echo) as signature_source:
+            send_selective_repeat(sock, server_addr, signature_source, window_size)
+    return wait_resume(sock, file_info, server_addr, retries=DELTA_WAIT_RETRIES)
+
+
+def check_receipt(sock: socket.socket, server_addr: tuple[str, int], probe: bytes, expected: bytes,
+                  timeout: float = 0.5, retries: int = 5) -> bool:
+    """
+    수신측이 보내는 영수증(수신한 파일의 digest)을 기다려 송신측에서 계산한 digest와 비교합니다.
+    응답이 없으면 마지막 패킷(probe)을 다시 보내, 완료 ACK를 linger 중인 수신측이 영수증을 재전송하게 합니다.
+    Returns:
+        digest가 일치하면 True를 반환합니다.
+    """
+    sock.settimeout(timeout)
+    for _ in range(retries):
+        try:
+            while True:
+                packed_data, _ = sock.recvfrom(KB)
+                if packed_data.startswith(RECEIPT):
+                    break
+        except socket.timeout:
+            sock.sendto(probe, server_addr)
+            continue
+        if packed_data[len(RECEIPT):] == expected:
+            print(f"무결성 확인 완료 : {expected.hex()}")
+            return True
+        print(f"무결성 검증 실패 : 송신 {expected.hex()} / 수신 {packed_data[len(RECEIPT):].hex()}")
+        return False
+    print(f"수신측의 영수증을 받지 못했습니다.")
+    return False
+
+
+def send_file(filename: str, host: str = 'localhost', port: int = 9999, buffer_size: int = 0, interval: float = 0.001,
+              window_size: int = 0, rate_controller: RateController | None = None, gso_segments: int = 1,
+              streams: int = 1, session: bool = False, fec_group: int = 0, fec_adaptive: bool = False,
+              verify: bool = False, resume: bool = False, delta: bool = False, compress: str = 'none',
+              batch_name: str | None = None):
+    """
+    파일을 전송합니다.
+    Args:
+        filename : 전송할 파일
+        host, port : 서버의 주소 및 포트
+        buffer_size : 패킷 하나의 최대 크기, 0이면 제한하지 않습니다.
+                      실제 크기는 경로 MTU probe로 조각나지 않고 수신측에 도달하는 것을 확인한 가장 큰 크기입니다.
+        interval : window_size가 0일 때 패킷 사이의 전송 간격
+        window_size : 0보다 크면 selective-repeat 모드로 전송합니다.
+        rate_controller : 전송 간격을 조절하는 제어기
+        gso_segments : 1보다 크면 GSO로 묶어 보낼 패킷 수
+        streams : 1보다 크면 파일을 streams개 구간으로 나누어, 구간마다 별도의 프로세스와 소켓(port + 1 + i)으로 전송합니다.
+        session : True이면 모든 패킷에 세션 헤더를 붙여, 여러 전송을 함께 받는 멀티 세션 서버로 selective-repeat 전송합니다.
+        fec_group : 0보다 크면 이 개수의 청크마다 XOR parity 패킷을 보내 수신측이 하나의 유실을 재전송 없이 복구하게 합니다.
+        fec_adaptive : True이면 재전송이 필요한 손실이 보고될 때 FEC 그룹을 줄이고, 손실이 없으면 늘립니다.
+        verify : True이면 청크마다 CRC32를 붙이고, 단일 스트림 전송에서는 전송 중에 계산한 파일 digest를
+                 수신측의 영수증과 비교합니다.
+        resume : True이면 수신측에 남은 부분 파일을 이어받도록 요청하고, 수신측이 받지 못한 청크만 전송합니다.
+                 단일 스트림 selective-repeat 전송에서만 사용할 수 있습니다.
+        delta : True이면 새 파일의 청크 서명을 먼저 보내, 수신측이 같은 이름의 이전 버전에서 찾지 못한 청크만 전송합니다.
+                단일 스트림 selective-repeat 전송에서만 사용할 수 있습니다.
+        compress : 'none'이 아니면 청크마다 이 코덱(zlib, lzma)으로 압축해 보냅니다. 압축해도 줄지 않는 청크는 원본을 보냅니다.
+        batch_name : 지정되면 filename은 send_batch가 만든 묶음 스트림이며, 수신측이 이 이름의 디렉터리에 풀도록 전송합니다.
+
+    Returns:
+        손실되어 재전송한 seq_number들의 목록
+    """
     # 클라이언트 소켓 생성
     client_socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    # 데이터 패킷이 경로에서 조각나지 않도록 DF 비트를 켜고, 패킷 크기는 probe로 확인한 크기를 사용합니다.
+    set_dont_fragment(client_socket)
     server_address = (host, port)
     print(f"파일 {filename}을(를) 전송합니다...")
     print(f"서버 주소: {host}:{port}")
-    print(f"버퍼 크기: {buffer_size}")
 
-    chunk_size = buffer_size - 8
+    codec = make_codec(compress)
+    if batch_name is not None and session:
+        print(f"멀티 세션 서버는 묶음 전송을 지원하지 않습니다. 세션 헤더 없이 전송합니다.")
+        session = False
+
+    if gso_segments > 1 and not gso_supported():
+        print(f"UDP GSO를 지원하지 않는 환경입니다. 패킷을 하나씩 전송합니다.")
+        gso_segments = 1
 
     losses = []
 
@@ -89,54 +707,224 @@ def send_file(filename: str, host: str = 'localhost', port: int = 9999, buffer_s
         if not os.path.exists(filename):
             raise FileNotFoundError(f"파일 {filename}을(를) 찾을 수 없습니다.")
 
+        candidates = payload_candidates(server_address, buffer_size)
+        try:
+            path_size = probe_path(client_socket, server_address, candidates)
+        except socket.timeout:
+            print(f"수신측이 응답하지 않습니다.")
+            losses.append([-1])
+            return losses
+        if 0 < buffer_size and path_size < buffer_size:
+            print(f"패킷 크기 {buffer_size}은(는) 경로에서 조각나므로 {path_size}(으)로 줄입니다.")
+        buffer_size = path_size
+        print(f"버퍼 크기: {buffer_size}")
+
+        chunk_size = payload_chunk_size(buffer_size, session, verify)
+        session_id = secrets.randbits(32) if session else None
+
         # 파일 크기 확인 및 청크 수 계산
         file_size = os.path.getsize(filename)
         total_chunks = math.ceil(file_size / chunk_size)
         print(f"청크 수: {total_chunks}")
 
         # 파일 정보 전송 (파일명 + 총 청크 수)
-        file_info = struct.pack('!II256s', buffer_size, total_chunks, filename.encode()[:256])
-        client_socket.sendto(file_info[:512], server_address)
+        streams = max(1, min(streams, total_chunks))
+        if session:
+            # 멀티 세션 서버는 스트라이핑을 지원하지 않고 selective-repeat으로만 수신합니다.
+            streams = 1
+            if window_size <= 0:
+                window_size = DEFAULT_STRIPE_WINDOW
+        if batch_name is not None and (resume or delta):
+            print(f"묶음 전송은 매번 새로 만든 스트림을 보내므로 이어받기와 델타 모드를 사용하지 않습니다.")
+            resume = delta = False
+        if (resume or delta) and (session or streams > 1):
+            print(f"이어받기와 델타 모드는 세션 모드와 스트라이핑 전송에서 지원하지 않습니다. 파일 전체를 전송합니다.")
+            resume = delta = False
+        if resume and delta:
+            print(f"이어받기와 델타 모드는 함께 사용할 수 없습니다. 델타 모드로 전송합니다.")
+            resume = False
+        if (streams > 1 or resume or delta) and window_size <= 0:
+            window_size = DEFAULT_STRIPE_WINDOW
+        flags = FLAG_TIMESTAMP | (FLAG_SELECTIVE_REPEAT if window_size > 0 else 0)
+        if streams > 1:
+            flags |= FLAG_STRIPED
+        if session:
+            flags |= FLAG_SESSION
+        if fec_group > 0:
+            flags |= FLAG_FEC
+        if verify:
+            flags |= FLAG_CHECKSUM
+        if delta:
+            flags |= FLAG_DELTA
+        if codec is not None:
+            flags |= codec.flag
+        if batch_name is not None:
+            flags |= FLAG_BATCH
+        resume_info = None
+        if resume:
+            flags |= FLAG_RESUME
+            # 수신측은 크기와 수정 시각이 같은 파일일 때만 이전에 받은 청크를 재사용합니다.
+            resume_info = (file_size, os.stat(filename).st_mtime_ns)
+        file_info = pack_file_info(buffer_size, total_chunks, filename if batch_name is None else batch_name, flags,
+                                   window_size, streams, resume_info)
+        if session:
+            file_info = pack_session(KIND_INFO, session_id, file_info)
+
+        # 수신측이 파일 정보를 받아들이고 지원하는 기능과 윈도우를 알려줄 때까지 데이터를 보내지 않습니다.
+        accept_prefix = pack_session(KIND_ACCEPT, session_id) if session else ACCEPT
+        try:
+            accepted_flags, accepted_window, handshake_rtt = negotiate(client_socket, file_info, server_address,
+                                                                       accept_prefix)
+        except socket.timeout:
+            print(f"수신측이 응답하지 않습니다.")
+            losses.append([-1])
+            return losses
+        if 0 < accepted_window < window_size:
+            print(f"수신측의 수신 버퍼에 맞춰 윈도우를 {window_size}에서 {accepted_window}(으)로 줄입니다.")
+            window_size = accepted_window
+        if resume and not accepted_flags & FLAG_RESUME:
+            print(f"수신측이 이어받기를 지원하지 않습니다. 파일 전체를 전송합니다.")
+            resume = False
+        if delta and not accepted_flags & FLAG_DELTA:
+            print(f"수신측이 델타 모드를 지원하지 않습니다. 파일 전체를 전송합니다.")
+            delta = False
 
-        # 청크를 보관하기 위한 dictionary
-        packet_dict = {}
-        # 파일 전송 시작
+        if streams > 1:
+            start_time = time.time()
+            try:
+                wait_ready(client_socket, file_info, server_address, STRIPES_READY)
+            except socket.timeout:
+                print(f"수신측이 응답하지 않습니다.")
+                losses.append([-1])
+                return losses
+            stripe_args = [(filename, (host, port + 1 + i), chunk_size, first_seq, end_seq, window_size,
+                            rate_controller, gso_segments, fec_group, fec_adaptive, verify, codec)
+                           for i, (first_seq, end_seq) in enumerate(stripe_ranges(total_chunks, streams))]
+            with multiprocessing.Pool(streams) as pool:
+                for stripe_losses in pool.starmap(send_stripe, stripe_args):
+                    losses.extend(stripe_losses)
+            print(f"파일 {filename} 전송")
+            print(f"소요시간 {time.time() - start_time}")
+            return losses
+
+        resume_ack = None
+        if resume:
+            try:
+                resume_ack = wait_resume(client_socket, file_info, server_address)
+            except socket.timeout:
+                print(f"수신측이 응답하지 않습니다.")
+                losses.append([-1])
+                return losses
+            _, missed = resume_ack
+            print(f"이어받기 : {sum(missed[1::2])}개 청크를 전송합니다.")
 
         start_time = time.time()
-        with open(filename, 'rb') as f:
-            for seq_num in range(total_chunks):
-                chunk_data = f.read(chunk_size)
+        prefix = pack_session(KIND_DATA, session_id) if session else b''
+        with open_packet_source(filename, chunk_size, codec, prefix, verify) as packet_source:
+            if handshake_rtt is not None:
+                # 핸드셰이크의 왕복 시간으로 첫 윈도우부터 RTO를 경로에 맞춥니다.
+                packet_source.echo.rtt.on_sample(handshake_rtt)
+            fec = FecEncoder(chunk_size, fec_group, fec_adaptive, prefix) if fec_group > 0 else None
+            digest = None
+            if verify and not session:
+                # 보내는 동안 worker 스레드가 mmap을 앞에서부터 해싱해 두므로 파일을 다시 읽지 않습니다.
+                digest = DigestWorker(packet_source.read_range)
+                digest.advance(file_size)
+            try:
+                if window_size > 0:
+                    try:
+                        if delta:
+                            resume_ack = send_signatures(client_socket, server_address, file_info, packet_source,
+                                                         window_size, verify)
+                            print(f"델타 : {sum(resume_ack[1][1::2])}개 청크를 전송합니다.")
+                        losses = send_selective_repeat(client_socket, server_address, packet_source, window_size,
+                                                       rate_controller=rate_controller, gso_segments=gso_segments,
+                                                       session_id=session_id, fec=fec, resume_ack=resume_ack)
+                    except socket.timeout:
+                        losses.append([-1])
+                    else:
+                        if digest is not None:
+                            check_receipt(client_socket, server_address, packet_source[total_chunks - 1],
+                                          digest.result(file_size))
+                    print(f"파일 {filename} 전송")
+                    print(f"소요시간 {time.time() - start_time}")
+                    return losses
 
-                # SEQ 번호와 청크 크기를 포함하여 패킷 구성
-                packet = struct.pack('!II', seq_num, chunk_size) + chunk_data
-                packet_dict[seq_num] = packet
-                client_socket.sendto(packet, server_address)
+                # 파일 전송 시작, 전송 도중 도착하는 NACK는 NACK_POLL_EVERY 패킷마다 확인
+                client_socket.setblocking(False)
+                metrics = TransferMetrics(f"send:{filename}", 'send', total_chunks, chunk_size)
+                metrics.rtt = packet_source.echo.rtt
+                pacer = make_pacer(rate_controller, interval, buffer_size)
+                tracker = DeliveryTracker(total_chunks)
+                for seq_num in range(total_chunks):
+                    if pacer is not None:
+                        if rate_controller is not None:
+                            pacer.rate = rate_controller.rate
+                        pacer.wait(packet_source.packet_size(seq_num))
+                    # 재사용하는 헤더 버퍼와 mmap의 청크를 그대로 sendmsg로 전달
+                    sendmsg_blocking(client_socket, packet_source.buffers(seq_num), server_address)
+                    metrics.packets_sent += 1
+                    packet_source.release(seq_num)
+                    if fec is not None:
+                        send_parity(client_socket, fec, packet_source, (seq_num,), server_address,
+                                    last=seq_num == total_chunks - 1)
 
-                time.sleep(interval)
+                    if seq_num % NACK_POLL_EVERY == 0:
+                        resent, delivered = drain_nacks(client_socket, packet_source, server_address, seq_num + 1,
+                                                        metrics, tracker)
+                        if resent:
+                            losses.append(resent)
+                            metrics.packets_sent += len(resent)
+                            metrics.retransmitted += len(resent)
+                            if fec is not None:
+                                fec.on_loss(len(resent))
+                        # 보낸 패킷 수가 아니라 수신측이 NACK로 알려 준 청크만 전달된 것으로 제어기와 지표에 반영합니다.
+                        if delivered is not None:
+                            if rate_controller is not None:
+                                rate_controller.on_ack(delivered, len(resent), None, time.time())
+                            metrics.on_ack(delivered, len(resent), None)
 
-                # 진행률 출력
-                progress = ((seq_num + 1) / total_chunks) * 100
-                print(f"\r전송 진행률: {progress:.1f}% 전송한 패킷 {seq_num:d}", end='')
+                    metrics.progress(time.time())
 
-        print(f"\n파일 {filename} 전송")
-        print(f"소요시간 {time.time() - start_time}")
-        transfer_complete = False
+                print(f"\n파일 {filename} 전송")
+                print(f"소요시간 {time.time() - start_time}")
+                transfer_complete = False
 
-        last_seq_number = len(packet_dict) - 1
-        while not transfer_complete:
-            try:
-                dropped_seq_numbers = process_ack(client_socket, server_address, packet_dict, last_seq_number)
-                losses.append(dropped_seq_numbers)
-            except socket.timeout:
-                losses.append([-1])
-                break
-            if len(dropped_seq_numbers) == 0:
-                print(f"완료된 ACK 전달받음")
-                transfer_complete = True
-            else:
-                last_seq_number = max(dropped_seq_numbers)
-                print(f"소실패킷 재전송 dropped_seq_numbers: {dropped_seq_numbers}")
-                resend_dropped_data(client_socket, dropped_seq_numbers, packet_dict, server_address)
+                last_seq_number = total_chunks - 1
+                while not transfer_complete:
+                    try:
+                        dropped_seq_numbers, last_seq_number = process_ack(client_socket, server_address, packet_source,
+                                                                           last_seq_number, echo=packet_source.echo,
+                                                                           metrics=metrics)
+                        losses.append(dropped_seq_numbers)
+                        metrics.packets_received += 1
+                        # ACK는 항상 전체 누락 청크를 보고하므로, 전송 중 NACK 확인으로 이미 센 청크를 빼고 더합니다.
+                        delivered = max(0, total_chunks - len(dropped_seq_numbers) - metrics.delivered)
+                        if rate_controller is not None:
+                            rate_controller.on_ack(delivered, len(dropped_seq_numbers), None, time.time())
+                        metrics.on_ack(delivered, len(dropped_seq_numbers), None)
+                    except socket.timeout:
+                        losses.append([-1])
+                        break
+                    if len(dropped_seq_numbers) == 0:
+                        print(f"완료된 ACK 전달받음")
+                        transfer_complete = True
+                        metrics.finish()
+                    else:
+                        print(f"소실패킷 재전송 dropped_seq_numbers: {dropped_seq_numbers}")
+                        metrics.packets_sent += len(dropped_seq_numbers)
+                        metrics.retransmitted += len(dropped_seq_numbers)
+                        if pacer is not None and rate_controller is not None:
+                            pacer.rate = rate_controller.rate
+                        resend_dropped_data(client_socket, dropped_seq_numbers, packet_source, server_address,
+                                            pacer if rate_controller is not None else None, gso_segments)
+
+                if transfer_complete and digest is not None:
+                    check_receipt(client_socket, server_address, packet_source[total_chunks - 1],
+                                  digest.result(file_size))
+            finally:
+                if digest is not None:
+                    digest.cancel()
 
 
     # except Exception as e:
@@ -144,3 +932,31 @@ def send_file(filename: str, host: str = 'localhost', port: int = 9999, buffer_s
     finally:
         client_socket.close()
         return losses
+
+
+def send_batch(paths: list[str], name: str | None = None, root: str | None = None, **kwargs) -> list:
+    """
+    여러 파일과 디렉터리를 하나의 묶음 스트림으로 만들어 한 번의 전송으로 보냅니다.
+    작은 파일들이 청크를 함께 쓰고 핸드셰이크와 ACK 왕복도 한 번뿐이므로, 작은 파일이 많아도 큰 파일 하나를 보내는 속도로 전송됩니다.
+    Args:
+        paths : 전송할 파일 또는 디렉터리 경로들
+        name : 수신측에서 파일들을 풀 디렉터리 이름, 생략하면 경로가 하나일 때는 그 이름, 아니면 'batch'입니다.
+        root : 지정되면 수신측의 상대 경로를 이 디렉터리 기준으로 만듭니다. 생략하면 각 경로의 이름부터 포함합니다.
+        kwargs : send_file에 전달할 나머지 인자
+    Returns:
+        send_file과 같습니다.
+    """
+    if len(paths) == 1 and os.path.isdir(paths[0]) and root is None:
+        # 디렉터리 하나를 보내면 그 디렉터리의 내용을 같은 이름의 디렉터리에 풉니다.
+        root = paths[0]
+    if name is None:
+        name = os.path.basename(os.path.normpath(paths[0])) if len(paths) == 1 else 'batch'
+    files = collect_files(paths, root)
+    fd, stream_path = tempfile.mkstemp(suffix=BATCH_SUFFIX)
+    try:
+        with os.fdopen(fd, 'wb') as out:
+            total_size = write_batch(files, out)
+        print(f"묶음 전송 : 파일 {len(files)}개 ({total_size} bytes)를 하나의 스트림으로 전송합니다.")
+        return send_file(stream_path, batch_name=name, **kwargs)
+    finally:
+        os.remove(stream_path)
@@ -1,11 +1,39 @@
 import array
+import multiprocessing
+import queue
 import socket
 import os
 import struct
 import time
 from pathlib import Path
 
+from batch import BATCH_SUFFIX, extract_batch
+from buffer_monitor import BufferMonitor, set_receive_buffer
+from compression import Codec, codec_from_flags
+from delta import DELTA_SUFFIX, match_basis, signature_chunks
+from fec import FecDecoder
+from offload import GRO_BUFFER_SIZE, DatagramReceiver, enable_gro
+from integrity import DigestWorker
+from metrics import TransferMetrics
+from path_mtu import MAX_UDP_PAYLOAD
+from protocol import (DATA_HEADER, DATA_TIMESTAMP, FLAG_BATCH, FLAG_CHECKSUM, FLAG_DELTA, FLAG_FEC, FLAG_RESUME,
+                      FLAG_SELECTIVE_REPEAT, FLAG_STRIPED, FLAG_TIMESTAMP, KIND_DATA, KIND_INFO, PARITY_BIT, PROBE,
+                      PROBE_SIZE, RECEIPT, RESUME, SESSION_HEADER, STRIPES_READY, chunk_payload, data_header_size,
+                      pack_accept, probe_size, stripe_ranges, unpack_file_info, unpack_resume_info)
+from reassembly import MemoryReassembler, Reassembler, WriteThroughReassembler
+from resume import ResumeState, remove_resume_state
+from rtt import TimestampEcho
+from sack import pack_ack
+from session import ReceiveSession
+from window import NackScheduler, ReceiveWindow
+
 BUFFER_SIZE = 1024 * 1024 * 1024  # 1GB
+# 델타 모드에서 서명 수신을 마친 뒤 완료 ACK를 재전송하며 기다리는 시간
+# 송신측이 응답을 기다리며 파일 정보를 다시 보내는 간격(1초)보다 짧아야 합니다.
+DELTA_LINGER = 0.5
+# 커널이 수신 버퍼에서 datagram 하나에 매기는 크기(skb truesize)는 payload보다 크므로,
+# 윈도우를 정할 때 datagram 하나가 payload의 두 배에 이 값을 더한 만큼 차지한다고 가정합니다.
+RCVBUF_OVERHEAD = 512
 
 INT_SIZE = 4
 
@@ -33,15 +61,334 @@ def make_new_filename(filepath:str):
     return new_filepath
 
 
-def send_ack(missed_seqs : list[int], sock : socket.socket, target_address : tuple, buffer_size : int = 1024):
-    arr = array.array('i', missed_seqs)
-    packed = arr.tobytes()
-    print(f"전송할 패킷정보 크기 {len(packed)}")
-    print(f"손실된 옹량 {len(packed) / 4 * buffer_size}")
+def answer_probe(sock: socket.socket, data: bytes | memoryview, address: tuple) -> bool:
+    """
+    경로 MTU probe이면 받은 크기를 송신측에 돌려보냅니다. 적힌 크기와 실제 크기가 다른(잘린) probe에는 응답하지 않습니다.
+    sock에는 sendto(data, address)를 제공하는 asyncio의 DatagramTransport도 넘길 수 있습니다.
+    Returns:
+        probe였으면 True를 반환합니다.
+    """
+    size = probe_size(data)
+    if size is None:
+        return False
+    if size == len(data):
+        sock.sendto(PROBE + PROBE_SIZE.pack(size), address)
+    return True
+
+
+def negotiate_window(sock: socket.socket, window_size: int, buffer_size: int) -> int:
+    """
+    송신측의 윈도우를 소켓에 실제로 할당된 수신 버퍼(SO_RCVBUF)에 들어가는 크기로 줄입니다.
+    커널은 요청한 크기를 net.core.rmem_max로 제한하므로, 요청한 BUFFER_SIZE보다 훨씬 작을 수 있습니다.
+    Returns:
+        수락 응답으로 알릴 윈도우, window_size가 0(기존 모드)이면 0을 반환합니다.
+    """
+    if window_size <= 0:
+        return window_size
+    receive_buffer = sock.getsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF)
+    return max(1, min(window_size, receive_buffer // (2 * buffer_size + RCVBUF_OVERHEAD)))
+
+
+def check_receive_buffer(sock: socket.socket, size: int = BUFFER_SIZE) -> int:
+    """
+    수신 버퍼를 요청하고, 커널이 요청보다 작게 할당했으면 경고를 출력합니다.
+    Returns:
+        커널이 실제로 할당한 수신 버퍼의 크기
+    """
+    granted = set_receive_buffer(sock, size)
+    if granted < size:
+        print(f"수신 버퍼를 {size}바이트 요청했지만 {granted}바이트만 할당되었습니다. "
+              f"빠른 송신측을 따라가지 못하면 커널이 datagram을 버립니다. (sysctl net.core.rmem_max로 상한을 늘릴 수 있습니다)")
+    return granted
+
+
+def send_ack(cum_ack: int, highest: int, ranges: array.array, sock: socket.socket, target_address: tuple,
+             echo: TimestampEcho | None = None, monitor: BufferMonitor | None = None):
+    """
+    누락 구간을 ACK로 전송합니다. 누락 구간이 많으면 여러 datagram으로 나누어 보냅니다.
+    Args:
+        cum_ack : 이 값 미만의 seq는 모두 수신됨
+        highest : 수신측이 기다리는 마지막 seq + 1
+        ranges : (start, count) 쌍으로 표현한 누락 구간
+        echo : 지정하면 송신측이 RTT를 잴 수 있도록 ACK에 타임스탬프를 싣습니다.
+        monitor : 지정하면 송신측이 손실의 원인을 구분할 수 있도록 ACK에 수신 소켓의 버퍼 상태를 싣습니다.
+    """
+    timestamp = echo.stamp(time.time()) if echo is not None else None
+    pressure = monitor.report() if monitor is not None else None
+    for packed in pack_ack(cum_ack, highest, ranges, timestamp, pressure):
+        try:
+            sock.sendto(packed, target_address)
+        except OSError as e:
+            print(f"ACK 전송 실패: {e}")
+
+
+def send_sr_ack(receive_window: ReceiveWindow, sock: socket.socket, target_address: tuple,
+                echo: TimestampEcho | None = None, monitor: BufferMonitor | None = None):
+    """
+    수신 도중의 ACK(NACK)를 전송합니다. 누락 구간은 [cum_ack, highest) 구간에 한정됩니다.
+    """
+    send_ack(receive_window.cum_ack, receive_window.highest, receive_window.missing_ranges(), sock, target_address,
+             echo, monitor)
+
+
+def send_idle_nack(reassembler: Reassembler, sock: socket.socket, target_address: tuple,
+                   echo: TimestampEcho | None = None, monitor: BufferMonitor | None = None) -> int:
+    """
+    패킷이 한동안 오지 않을 때, 마지막 청크까지 포함한 전체 누락 구간을 보고합니다.
+    Returns:
+        수신측이 기다리는 마지막 seq_number
+    """
+    missed_ranges = reassembler.missing_ranges()
+    last_seq_num = missed_ranges[-2] + missed_ranges[-1] - 1 if missed_ranges else reassembler.total_chunks - 1
+    send_ack(reassembler.window.cum_ack, last_seq_num + 1, missed_ranges, sock, target_address, echo, monitor)
+    return last_seq_num
+
+
+def receive_selective_repeat(sock: socket.socket, client_address: tuple, reassembler: Reassembler,
+                             receiver: DatagramReceiver, window_size: int, timeout: float = 5,
+                             nack_interval: float = 0.05, decoder: FecDecoder | None = None,
+                             checksum: bool = False, digest: DigestWorker | None = None,
+                             resume: ResumeState | None = None, codec: Codec | None = None,
+                             metrics: TransferMetrics | None = None,
+                             info_reply: tuple[bytes, list[bytes]] | None = None, timestamps: bool = False) -> bool:
+    """
+    selective-repeat 모드로 청크를 수신합니다. window_size의 1/4마다, 중복 패킷을 받을 때마다, 그리고 구멍이 생기면
+    NACK 간격마다 ACK를 보내 송신측이 파일 전체를 보내기 전에도 손실을 복구할 수 있게 합니다.
+    NACK 간격 동안 패킷이 없으면 마지막 청크까지의 전체 누락 구간을 보고합니다.
+    timestamps가 True이면 데이터 패킷의 타임스탬프로 RTT를 재고, NACK 간격을 nack_interval 대신 수신측의 RTO로 정합니다.
+    receiver에 BufferMonitor가 지정되어 있으면 ACK마다 수신 소켓의 버퍼 상태를 싣습니다.
+    Args:
+        sock : 데이터를 수신할 소켓
+        client_address : ACK를 보낼 클라이언트 주소
+        reassembler : 수신한 청크를 저장할 reassembler
+        receiver : sock에서 데이터 패킷을 하나씩 꺼내 주는 receiver
+        window_size : 송신측의 in-flight 윈도우 크기
+        timeout : 해당 시간동안 패킷이 없으면 수신을 중단합니다. RTO가 긴 경로에서는 RTO에 비례해 늘어납니다.
+        nack_interval : RTT 표본을 얻기 전의 NACK 사이의 최소 간격이자 유휴 판정 간격
+        decoder : 지정된 경우 parity 패킷으로 유실된 청크를 복구합니다.
+        checksum : True이면 청크의 CRC32를 확인하고, 손상된 청크는 유실된 것으로 처리합니다.
+        digest : 지정된 경우 연속으로 수신한 구간을 worker 스레드에서 해싱합니다.
+        resume : 지정된 경우 수신 비트맵을 주기적으로 저장해 중단되어도 이어받을 수 있게 합니다.
+        codec : 지정된 경우 압축된 청크를 이 코덱으로 복원합니다.
+        metrics : 수신 지표를 모을 TransferMetrics, 생략하면 새로 만듭니다.
+        info_reply : (파일 정보 패킷, 응답 datagram 목록), 응답이 유실되어 송신측이 파일 정보를 다시 보내면 응답을 재전송합니다.
+        timestamps : True이면 데이터 패킷에 DATA_TIMESTAMP가 있고, ACK에 타임스탬프를 되돌려 줍니다.
+    Returns:
+        오류로 중단된 경우 True를 반환합니다.
+    """
+    total_chunks = reassembler.total_chunks
+    receive_window = reassembler.window
+    if metrics is None:
+        metrics = TransferMetrics(f"receive:{client_address}", 'receive', total_chunks, reassembler.chunk_size)
+    # 이어받기나 델타 모드로 이미 채운 청크는 전달된 것으로 셉니다.
+    metrics.delivered += receive_window.received_count
+    ack_every = max(1, window_size // 4)
+    nack = NackScheduler(nack_interval)
+    echo = TimestampEcho(nack.rtt) if timestamps else None
+    metrics.rtt = nack.rtt
+    monitor = receiver.monitor
+    if monitor is not None and metrics.monitor is None:
+        metrics.watch(monitor)
+    sock.settimeout(nack.interval)
+    last_packet_time = time.time()
+
+    while not receive_window.complete():
+        try:
+            try:
+                data, _ = receiver.recvfrom()
+            except socket.timeout:
+                now = time.time()
+                if now - last_packet_time > nack.rtt.give_up_timeout(timeout):
+                    raise
+                send_idle_nack(reassembler, sock, client_address, echo, monitor)
+                nack.sent(now)
+                continue
+
+            now = last_packet_time = time.time()
+            if info_reply is not None and data == info_reply[0]:
+                for packed in info_reply[1]:
+                    sock.sendto(packed, client_address)
+                continue
+            seq_num, chunk_size = DATA_HEADER.unpack_from(data)
+            if seq_num & PARITY_BIT:
+                # 복구에 성공한 경우만 새 청크를 받은 것처럼 ACK 조건을 확인합니다.
+                if decoder is None or decoder.on_parity(data) is None:
+                    continue
+                is_new = True
+            elif seq_num >= total_chunks:
+                continue
+            else:
+                if echo is not None and echo.on_receive(*DATA_TIMESTAMP.unpack_from(data, DATA_HEADER.size), now):
+                    # 유휴 판정 간격도 새 RTO를 따릅니다.
+                    sock.settimeout(nack.interval)
+                chunk_data = chunk_payload(data, chunk_size, checksum, codec, reassembler.chunk_size, timestamps)
+                if chunk_data is None:
+                    continue
+                is_new = reassembler.write(seq_num, chunk_data)
+                if is_new and decoder is not None:
+                    decoder.on_data(seq_num)
+            metrics.on_receive(is_new)
+            if digest is not None:
+                # 마지막 청크는 실제 파일 크기를 알아야 하므로 digest.result가 해싱합니다.
+                digest.advance(min(receive_window.cum_ack, total_chunks - 1) * reassembler.chunk_size)
+            if resume is not None:
+                resume.maybe_save(receive_window.received, now)
+
+            if not is_new or receive_window.complete() or receive_window.received_count % ack_every == 0:
+                send_sr_ack(receive_window, sock, client_address, echo, monitor)
+            elif nack.due(receive_window, now):
+                send_sr_ack(receive_window, sock, client_address, echo, monitor)
+                nack.sent(now)
+            metrics.progress(now)
+
+        except (struct.error, IndexError) as e:
+            print(f"\n패킷 손상: {e}")
+            return True
+        except socket.timeout:
+            print(f"데이터 타임아웃")
+            return True
+
+    metrics.finish()
+    return False
+
+
+def linger_final_ack(sock: socket.socket, client_address: tuple, total_chunks: int, linger: float = 1.0,
+                     receipt: bytes | None = None):
+    """
+    완료 ACK가 유실되었을 경우를 대비해, linger 시간 동안 클라이언트가 재전송하는 패킷에 완료 ACK로 응답합니다.
+    receipt가 지정된 경우 영수증도 함께 다시 보냅니다.
+    """
+    final_ack = pack_ack(total_chunks, total_chunks, array.array('I'))[0]
+    sock.settimeout(linger)
+    try:
+        while True:
+            _, address = sock.recvfrom(512)
+            if address == client_address:
+                sock.sendto(final_ack, client_address)
+                if receipt is not None:
+                    sock.sendto(receipt, client_address)
+    except socket.timeout:
+        pass
+
+
+def receive_delta_basis(sock: socket.socket, client_address: tuple, reassembler: Reassembler,
+                        receiver: DatagramReceiver, basis_path: str, window_size: int, timeout: float = 5,
+                        checksum: bool = False, timestamps: bool = False,
+                        info_reply: tuple[bytes, list[bytes]] | None = None) -> list[bytes] | None:
+    """
+    델타 모드에서 송신측이 먼저 보내는 새 파일의 청크 서명을 받고, 이전 버전(basis_path)에 같은 내용이 있는 청크를
+    reassembler에 채웁니다. 서명은 파일과 같은 데이터 경로(selective-repeat)로 받습니다.
+    info_reply는 서명을 받는 동안 다시 도착한 파일 정보에 대한 응답으로 receive_selective_repeat에 전달합니다.
+    Returns:
+        송신측에 보낼 응답(이미 가진 청크를 알리는 RESUME datagram 목록), 서명을 받지 못했으면 None을 반환합니다.
+    """
+    total_chunks = reassembler.total_chunks
+    chunk_size = reassembler.chunk_size
+    signature_reassembler = MemoryReassembler(signature_chunks(total_chunks, chunk_size), chunk_size)
+    if receive_selective_repeat(sock, client_address, signature_reassembler, receiver, window_size, timeout,
+                                checksum=checksum, info_reply=info_reply, timestamps=timestamps):
+        return None
+    print()
+
+    if os.path.isfile(basis_path):
+        signatures = signature_reassembler.read_range(0, signature_reassembler.file_size)
+        matched = match_basis(basis_path, signatures, reassembler)
+        signatures.release()
+        print(f"델타 : 이전 버전에서 {matched} / {total_chunks}개 청크를 찾았습니다.")
+    signature_reassembler.close()
+
+    # 완료 ACK가 유실되어 송신측이 서명을 재전송하는 동안 응답을 보내면, 재전송된 서명이 파일 청크로 섞일 수 있습니다.
+    linger_final_ack(sock, client_address, signature_reassembler.total_chunks, DELTA_LINGER)
+    return [RESUME + packed
+            for packed in pack_ack(reassembler.window.cum_ack, total_chunks, reassembler.missing_ranges())]
+
+
+def receive_stripe(host: str, port: int, file_path: str, first_seq: int, end_seq: int, chunk_size: int,
+                   buffer_size: int, window_size: int, timeout: float, results: multiprocessing.Queue,
+                   fec: bool = False, checksum: bool = False, codec: Codec | None = None, timestamps: bool = False):
+    """
+    스트라이핑 모드에서 하나의 worker 프로세스가 자신의 포트로 [first_seq, end_seq) 구간을 수신해
+    미리 할당된 파일의 해당 위치에 바로 씁니다. 결과는 results 큐로 전달합니다.
+    """
+    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    sock.bind((host, port))
+    set_receive_buffer(sock, BUFFER_SIZE)
+    results.put(('ready', port))
+
+    reassembler = WriteThroughReassembler(file_path, end_seq, chunk_size, first_seq=first_seq, create=False)
+    is_error = True
     try:
-        sock.sendto(packed, target_address)
-    except OSError as e:
-        print(f"너무 많은 loss")
+        sock.settimeout(timeout)
+        # 첫 패킷으로 송신측 worker의 주소를 알아냅니다.
+        _, client_address = sock.recvfrom(buffer_size, socket.MSG_PEEK)
+        receiver = DatagramReceiver(sock, buffer_size, monitor=BufferMonitor(sock))
+        decoder = FecDecoder(reassembler) if fec else None
+        is_error = receive_selective_repeat(sock, client_address, reassembler, receiver, window_size, timeout,
+                                            decoder=decoder, checksum=checksum, codec=codec,
+                                            timestamps=timestamps)
+    except socket.timeout:
+        print(f"스트림 {port} 데이터 타임아웃")
+    finally:
+        reassembler.finish()
+        results.put(('done', port, is_error, reassembler.file_size))
+
+    if not is_error:
+        linger_final_ack(sock, client_address, end_seq)
+    sock.close()
+
+
+def receive_striped(server_socket: socket.socket, client_address: tuple, reassembler: WriteThroughReassembler,
+                    host: str, port: int, buffer_size: int, window_size: int, streams: int,
+                    timeout: float = 5, fec: bool = False, checksum: bool = False,
+                    codec: Codec | None = None, timestamps: bool = False, accept: bytes | None = None) -> bool:
+    """
+    스트라이핑 모드로 파일을 수신합니다. 스트림마다 worker 프로세스가 port + 1 + i에서 자신의 구간을 받아
+    reassembler가 미리 할당한 같은 파일에 씁니다. 모든 worker가 준비되면 송신측에 STRIPES_READY를 보냅니다.
+    worker를 준비하는 동안에는 파일 정보를 읽지 않으므로, 수락 응답(accept)이 유실된 경우에 대비해 STRIPES_READY 앞에 다시 보냅니다.
+    Returns:
+        오류로 중단된 경우 True를 반환합니다.
+    """
+    total_chunks = reassembler.total_chunks
+    chunk_size = buffer_size - data_header_size(checksum, timestamps)
+    results = multiprocessing.Queue()
+    workers = [multiprocessing.Process(target=receive_stripe,
+                                       args=(host, port + 1 + i, reassembler.file_path, first_seq, end_seq,
+                                             chunk_size, buffer_size, window_size, timeout, results, fec,
+                                             checksum, codec, timestamps))
+               for i, (first_seq, end_seq) in enumerate(stripe_ranges(total_chunks, streams))]
+    for worker in workers:
+        worker.start()
+
+    is_error = False
+    ready = 0
+    done = 0
+    while done < streams:
+        try:
+            message = results.get(timeout=timeout)
+        except queue.Empty:
+            if not any(worker.is_alive() for worker in workers):
+                is_error = True
+                break
+            continue
+        if message[0] == 'ready':
+            ready += 1
+            if ready == streams:
+                if accept is not None:
+                    server_socket.sendto(accept, client_address)
+                server_socket.sendto(STRIPES_READY, client_address)
+        else:
+            _, stripe_port, stripe_error, file_size = message
+            done += 1
+            is_error = is_error or stripe_error
+            if stripe_port == port + streams:
+                # 마지막 청크를 받은 스트림만 실제 파일 크기를 알고 있습니다.
+                reassembler.file_size = file_size
+
+    if is_error:
+        for worker in workers:
+            worker.join()
+    # 성공한 경우 worker들은 완료 ACK를 linger한 뒤 종료하므로 파일 마무리 이후에 join합니다.
+    return is_error
 
 
 def flush_receive_buffer(sock):
@@ -49,9 +396,11 @@ def flush_receive_buffer(sock):
     sock.setblocking(False)
     print(f"socket을 비웁니다.")
     # Read until buffer is empty
+    # 버퍼보다 긴 datagram은 잘려서 버려지므로 내용을 담을 만큼 큰 버퍼가 필요 없습니다.
+    scratch = bytearray(1)
     try:
         while True:
-            data = sock.recvfrom(BUFFER_SIZE)
+            sock.recv_into(scratch)
     except BlockingIOError:
         pass
     finally:
@@ -59,12 +408,27 @@ def flush_receive_buffer(sock):
         sock.setblocking(True)
 
 
-def start_server(host='localhost', port=9999, target_dir="received"):
+def start_server(host='localhost', port=9999, target_dir="received", write_through: bool = False,
+                 gro: bool = False):
+    """
+    파일 수신 서버를 시작합니다.
+    Args:
+        host : 바인드할 주소
+        port : 바인드할 포트
+        target_dir : 수신한 파일을 저장할 디렉터리
+        write_through : True이면 파일을 미리 할당하고 청크가 도착하는 즉시 디스크에 씁니다.
+                        False이면 모든 청크를 메모리에 모았다가 수신 완료 후 재조합합니다.
+        gro : True이면 UDP_GRO로 커널이 합쳐 준 datagram 묶음을 한 번에 수신합니다. (Linux 전용)
+    """
     # 서버 소켓 생성
     server_socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
     server_socket.bind((host, port))
 
-    server_socket.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, BUFFER_SIZE)
+    check_receive_buffer(server_socket)
+
+    if gro and not enable_gro(server_socket):
+        print(f"UDP GRO를 지원하지 않는 환경입니다. datagram을 하나씩 수신합니다.")
+        gro = False
 
     print(f"서버가 {host}:{port}에서 시작되었습니다...")
     print(f"파일을 받을 디렉터리: {target_dir}")
@@ -73,10 +437,16 @@ def start_server(host='localhost', port=9999, target_dir="received"):
         flush_receive_buffer(server_socket)
 
         server_socket.setblocking(True)
-        # 파일 정보는 항상 고정된 크기로 받기
-        data, client_address = server_socket.recvfrom(512)  # 초기 정보는 작은 크기로 받음
+        # 파일 정보보다 먼저 오는 경로 MTU probe에 응답하므로 가장 큰 datagram도 잘리지 않게 받습니다.
+        data, client_address = server_socket.recvfrom(MAX_UDP_PAYLOAD)
+        while answer_probe(server_socket, data, client_address):
+            data, client_address = server_socket.recvfrom(MAX_UDP_PAYLOAD)
 
-        buffer_size, total_chunks, filename = struct.unpack('!II256s', data[:264])
+        try:
+            buffer_size, total_chunks, filename, flags, window_size, streams = unpack_file_info(data)
+        except struct.error:
+            print(f"잘못된 패킷 감지됨")
+            continue
         try:
             filename = filename.decode().strip('\x00')
         except UnicodeDecodeError:
@@ -84,46 +454,171 @@ def start_server(host='localhost', port=9999, target_dir="received"):
             continue
         print(f"파일 {filename}을(를) 받기 시작합니다... (총 {total_chunks}개 청크) (버퍼사이즈 {buffer_size})")
 
+        file_path = f"{target_dir}/{filename}"
+        Path(target_dir).mkdir(parents=True, exist_ok=True)
+        make_new_filename(file_path)
+
         # 이후 데이터 수신할 때는 지정된 버퍼 크기 사용
-        chunks = {}
+        # 스트라이핑 모드는 여러 프로세스가 같은 파일에 쓰므로 항상 write-through로 수신합니다.
+        striped = flags & FLAG_STRIPED
+        selective_repeat = flags & FLAG_SELECTIVE_REPEAT
+        checksum = bool(flags & FLAG_CHECKSUM)
+        timestamps = bool(flags & FLAG_TIMESTAMP)
+        codec = codec_from_flags(flags)
+        chunk_size = buffer_size - data_header_size(checksum, timestamps)
+        # 이어받기와 델타 모드는 단일 스트림 selective-repeat 전송에서만 지원합니다.
+        # 이어받기는 부분 파일이 남아야 하므로 write-through로 수신합니다.
+        delta = flags & FLAG_DELTA and selective_repeat and not striped
+        batch = flags & FLAG_BATCH and not delta
+        resume_info = None
+        if flags & FLAG_RESUME and selective_repeat and not striped and not delta and not batch:
+            resume_info = unpack_resume_info(data)
+        # 델타 모드는 이전 버전을 읽으며 새 버전을 만들어야 하므로 옆의 임시 파일에 받은 뒤 교체합니다.
+        # 묶음 전송은 여러 파일을 이어 붙인 스트림을 옆의 임시 파일에 받은 뒤 file_path 디렉터리에 풉니다.
+        if batch:
+            receive_path = file_path + BATCH_SUFFIX
+        else:
+            receive_path = file_path + DELTA_SUFFIX if delta else file_path
+
+        # 실제로 처리할 기능과 수신 버퍼에 맞춘 윈도우를 수락 응답으로 알린 뒤에야 송신측이 데이터를 보냅니다.
+        accepted_flags = flags & ~(FLAG_RESUME | FLAG_DELTA | FLAG_BATCH)
+        if resume_info is not None:
+            accepted_flags |= FLAG_RESUME
+        if delta:
+            accepted_flags |= FLAG_DELTA
+        if batch:
+            accepted_flags |= FLAG_BATCH
+        window_size = negotiate_window(server_socket, window_size, buffer_size)
+        accept = pack_accept(accepted_flags, window_size)
+        server_socket.sendto(accept, client_address)
+        info_reply = (data, [accept])
+
+        resume = None
+        if resume_info is not None:
+            resume = ResumeState(file_path, buffer_size, total_chunks, *resume_info)
+            reassembler = WriteThroughReassembler(file_path, total_chunks, chunk_size, resumable=True)
+            received = resume.load()
+            if received is not None:
+                reassembler.resume(received, resume_info[0])
+                print(f"이어받기 : {reassembler.received_count}개 청크를 이미 받았습니다.")
+            # 이미 받은 청크를 ACK 형식으로 알려 송신측이 누락 구간만 보내게 합니다.
+            resume_reply = [RESUME + packed for packed in pack_ack(reassembler.window.cum_ack, total_chunks,
+                                                                   reassembler.missing_ranges())]
+            info_reply = (data, [accept] + resume_reply)
+            for packed in resume_reply:
+                server_socket.sendto(packed, client_address)
+        else:
+            remove_resume_state(file_path)
+            if write_through or striped:
+                reassembler = WriteThroughReassembler(receive_path, total_chunks, chunk_size)
+            else:
+                reassembler = MemoryReassembler(total_chunks, chunk_size)
+        # 전송마다 새로 만들어 이 전송 동안 커널이 버린 datagram만 셉니다.
+        monitor = BufferMonitor(server_socket)
+        receiver = DatagramReceiver(server_socket, buffer_size, gro, monitor)
+        decoder = FecDecoder(reassembler) if flags & FLAG_FEC else None
+        # 스트라이핑 모드는 각 worker가 청크의 CRC만 확인하고, 파일 digest와 영수증은 만들지 않습니다.
+        digest = DigestWorker(reassembler.read_range) if checksum and not striped else None
         start_time = time.time()
         timeout = 5
+        metrics = TransferMetrics(f"receive:{filename}", 'receive', total_chunks, chunk_size)
+        metrics.watch(monitor)
 
         last_seq_num = total_chunks - 1
 
         is_error = False
-
-        while len(chunks) < total_chunks:
+        if delta:
+            delta_reply = receive_delta_basis(server_socket, client_address, reassembler, receiver, file_path,
+                                              window_size, timeout, checksum, timestamps, info_reply)
+            is_error = delta_reply is None
+            if not is_error:
+                info_reply = (data, delta_reply)
+                for packed in delta_reply:
+                    server_socket.sendto(packed, client_address)
+
+        if striped:
+            is_error = receive_striped(server_socket, client_address, reassembler, host, port, buffer_size,
+                                       window_size, streams, timeout, decoder is not None, checksum, codec,
+                                       timestamps, accept)
+        elif selective_repeat and not is_error:
+            is_error = receive_selective_repeat(server_socket, client_address, reassembler,
+                                                receiver, window_size, timeout, decoder=decoder,
+                                                checksum=checksum, digest=digest, resume=resume, codec=codec,
+                                                metrics=metrics, info_reply=info_reply, timestamps=timestamps)
+
+        legacy = not (striped or selective_repeat)
+        nack = NackScheduler()
+        echo = TimestampEcho(nack.rtt) if timestamps else None
+        if legacy:
+            metrics.rtt = nack.rtt
+        last_signal_time = time.time()
+
+        while legacy and not is_error and not reassembler.complete():
             try:
                 # 실제 데이터 수신 시에는 buffer_size 사용
+                server_socket.settimeout(nack.interval)
+                try:
+                    data, _ = receiver.recvfrom()
+                except socket.timeout:
+                    if time.time() - last_signal_time > nack.rtt.give_up_timeout(timeout):
+                        raise
+                    # 한동안 패킷이 없으면 마지막 청크가 유실된 것으로 보고 전체 누락 구간을 알립니다.
+                    last_seq_num = send_idle_nack(reassembler, server_socket, client_address, echo, monitor)
+                    nack.sent(time.time())
+                    continue
                 last_signal_time = time.time()
-
-                server_socket.settimeout(timeout)
-                data, _ = server_socket.recvfrom(buffer_size)
-
-                seq_num, chunk_size = struct.unpack('!II', data[:8])
-                chunk_data = data[8:8 + chunk_size]
-
-                chunks[seq_num] = chunk_data
-
-                # 진행률 출력
-                progress = (len(chunks) / total_chunks) * 100
-                print(f"\r수신 진행률: {progress:.1f}% seq_num: {seq_num} / {last_seq_num}", end="")
+                if data == info_reply[0]:
+                    # 수락 응답이 유실되어 송신측이 다시 보낸 파일 정보
+                    server_socket.sendto(accept, client_address)
+                    continue
+
+                # data는 수신 버퍼를 가리키는 memoryview이므로 복사 없이 reassembler에 넘깁니다.
+                seq_num, chunk_size = DATA_HEADER.unpack_from(data)
+                if seq_num & PARITY_BIT:
+                    recovered = decoder.on_parity(data) if decoder is not None else None
+                    if recovered is not None and reassembler.complete():
+                        send_ack(total_chunks, total_chunks, array.array('I'), server_socket, client_address, echo,
+                                 monitor)
+                    continue
+                if seq_num >= total_chunks:
+                    continue
+                if echo is not None:
+                    echo.on_receive(*DATA_TIMESTAMP.unpack_from(data, DATA_HEADER.size), last_signal_time)
+                chunk_data = chunk_payload(data, chunk_size, checksum, codec, reassembler.chunk_size, timestamps)
+                if chunk_data is None:
+                    # 손상된 청크는 받지 않은 것으로 두고 NACK로 재전송을 요청합니다.
+                    continue
+                is_new = reassembler.write(seq_num, chunk_data)
+                metrics.on_receive(is_new)
+                if is_new and decoder is not None and decoder.on_data(seq_num) is not None \
+                        and reassembler.complete() and seq_num != last_seq_num:
+                    # parity로 마지막 누락 청크를 복구해 수신이 끝난 경우
+                    send_ack(total_chunks, total_chunks, array.array('I'), server_socket, client_address, echo,
+                             monitor)
+                if digest is not None:
+                    digest.advance(min(reassembler.window.cum_ack, total_chunks - 1) * reassembler.chunk_size)
+                metrics.progress(last_signal_time)
 
                 # 마지막 청크인지 체크
                 if seq_num == last_seq_num:
 
-                    received_seqs = set(chunks.keys())
-                    all_seqs = set(range(total_chunks))
-                    missed_seqs = list(all_seqs - received_seqs)
+                    missed_ranges = reassembler.missing_ranges()
+                    missed_count = sum(missed_ranges[1::2])
                     print(f"마지막 청크 도달 seq_num = {seq_num}")
 
-                    print(f"분실된 패킷 : {missed_seqs}")
-                    if len(missed_seqs) > 0:
-                        last_seq_num = max(missed_seqs)
+                    print(f"분실된 패킷 수 : {missed_count} (손실된 용량 {missed_count * buffer_size})")
+                    if missed_count > 0:
+                        last_seq_num = missed_ranges[-2] + missed_ranges[-1] - 1
                         print(f"새로운 last_seq = {last_seq_num}")
 
-                    send_ack(missed_seqs, server_socket, client_address, buffer_size)
+                    send_ack(reassembler.window.cum_ack, last_seq_num + 1, missed_ranges, server_socket,
+                             client_address, echo, monitor)
+                    nack.sent(last_signal_time)
+
+                # 전송 도중 생긴 구멍은 마지막 청크를 기다리지 않고 바로 보고
+                elif nack.due(reassembler.window, last_signal_time):
+                    send_sr_ack(reassembler.window, server_socket, client_address, echo, monitor)
+                    nack.sent(last_signal_time)
 
             except (struct.error, IndexError) as e:
                 print(f"\n패킷 손상: {e}")
@@ -134,37 +629,170 @@ def start_server(host='localhost', port=9999, target_dir="received"):
                 is_error = True
                 break
 
-        if not is_error:
-            print()
+        receipt = None
+        if is_error:
+            if digest is not None:
+                digest.cancel()
+            if resume is not None:
+                resume.save(reassembler.window.received)
+                print(f"이어받기 상태 저장 : {reassembler.received_count} / {total_chunks}개 청크 수신")
+            reassembler.close()
+        else:
+            if legacy:
+                metrics.finish()
             transfer_end_time = time.time()
             transfer_elapsed_time = transfer_end_time - start_time
             print(f"transfer_elapsed_time\t{transfer_elapsed_time}")
 
-            print("\n모든 청크 수신 완료. 파일 재조합 시작...")
-
-            file_path = f"{target_dir}/{filename}"
-
-            Path(target_dir).mkdir(parents=True, exist_ok=True)
-
-            make_new_filename(file_path)
-
-            # 파일 재조합
-            with open(file_path, 'wb') as f:
-                for i in range(total_chunks):
-                    # print(f"{i}번째 청크 조합중\n{chunks[i]}", end='')
-                    if i in chunks:
-                        f.write(chunks[i])
-                    else:
-                        print(f"경고: 청크 {i} 유실")
+            if digest is not None:
+                # 대부분은 수신 중에 해싱되었으므로 남은 꼬리 부분만 기다립니다.
+                receipt = RECEIPT + digest.result(reassembler.file_size)
+                server_socket.sendto(receipt, client_address)
+                print(f"파일 digest {receipt[len(RECEIPT):].hex()}")
+
+            if isinstance(reassembler, MemoryReassembler):
+                print("\n모든 청크 수신 완료. 파일 재조합 시작...")
+
+            if batch:
+                # 스트림은 파일로 재조합하지 않고 reassembler에서 바로 풀어 쓴 뒤 버립니다.
+                file_size = reassembler.file_size
+                try:
+                    extracted = extract_batch(reassembler.read_range, file_size, file_path)
+                    print(f"묶음 전송 : {extracted}개 파일을 풀었습니다.")
+                except (struct.error, ValueError, OSError) as e:
+                    print(f"묶음 스트림을 풀지 못했습니다: {e}")
+                reassembler.close()
+            else:
+                # 파일 재조합 (write-through 모드에서는 파일 크기만 확정합니다)
+                reassembler.finish(receive_path)
+                if delta:
+                    os.replace(receive_path, file_path)
+                if resume is not None:
+                    resume.remove()
+                file_size = os.path.getsize(file_path)
 
             total_end_time = time.time()
             total_elapsed_time = total_end_time - start_time
-            file_size = os.path.getsize(file_path)
             print(f"measured_transfer_speed\t{file_size / transfer_elapsed_time}")
             print(f"measured_total_speed\t{file_size / total_elapsed_time}")
             print(f"파일 {filename} 수신 완료!")
             print(f"저장 경로 {file_path}")
 
+            if striped:
+                for worker in multiprocessing.active_children():
+                    worker.join()
+            else:
+                linger_final_ack(server_socket, client_address, total_chunks, receipt=receipt)
+
+
+def open_receive_session(session_id: int, client_address: tuple, file_info: bytes | memoryview, target_dir: str,
+                         now: float, nack_interval: float = 0.05, timeout: float = 5,
+                         sock: socket.socket | None = None,
+                         monitor: BufferMonitor | None = None) -> ReceiveSession | None:
+    """
+    세션 헤더를 뗀 파일 정보 패킷으로 새 수신 세션을 만듭니다.
+    sock을 지정하면 송신측의 윈도우를 sock의 수신 버퍼에 맞춰 줄이고, 세션의 수락 응답으로 알립니다.
+    monitor를 지정하면 세션의 ACK에 공유 소켓의 버퍼 상태를 싣습니다.
+    Returns:
+        만들어진 ReceiveSession, 세션 모드에서 지원하지 않는 전송이면 None을 반환합니다.
+    Raises:
+        struct.error : 패킷의 길이가 부족한 경우 발생합니다.
+    """
+    buffer_size, total_chunks, filename, flags, window_size, _ = unpack_file_info(file_info)
+    if flags & (FLAG_STRIPED | FLAG_BATCH):
+        print(f"세션 {session_id:08x} : 멀티 세션 서버는 스트라이핑 전송과 묶음 전송을 지원하지 않습니다.")
+        return None
+    filename = os.path.basename(filename.decode().strip('\x00'))
+    file_path = make_new_filename(f"{target_dir}/{filename}")
+    if sock is not None:
+        window_size = negotiate_window(sock, window_size, buffer_size)
+    print(f"세션 {session_id:08x} 시작 : {filename} (총 {total_chunks}개 청크) from {client_address}")
+    # 세션 모드는 이어받기와 델타 모드를 지원하지 않습니다.
+    return ReceiveSession(session_id, client_address, file_path, total_chunks, buffer_size, window_size, now,
+                          nack_interval, timeout, fec=bool(flags & FLAG_FEC), checksum=bool(flags & FLAG_CHECKSUM),
+                          codec=codec_from_flags(flags), timestamps=bool(flags & FLAG_TIMESTAMP),
+                          accepted_flags=flags & ~(FLAG_RESUME | FLAG_DELTA), monitor=monitor)
+
+
+def start_mux_server(host='localhost', port=9999, target_dir="received", gro: bool = False,
+                     nack_interval: float = 0.05, timeout: float = 5):
+    """
+    세션 모드 전송을 여러 개 동시에 수신하는 서버를 시작합니다.
+    모든 패킷의 세션 헤더로 전송을 구분하고, 세션마다 별도의 ReceiveSession이 write-through로 파일을 받습니다.
+    세션 모드(FLAG_SESSION)가 아닌 전송은 받지 않습니다.
+    Args:
+        host : 바인드할 주소
+        port : 바인드할 포트
+        target_dir : 수신한 파일을 저장할 디렉터리
+        gro : True이면 UDP_GRO로 커널이 합쳐 준 datagram 묶음을 한 번에 수신합니다.
+        nack_interval : RTT 표본을 얻기 전의 세션별 NACK 간격이자 가장 긴 타이머 주기
+        timeout : 해당 시간동안 패킷이 없는 세션은 실패로 정리합니다.
+    """
+    server_socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    server_socket.bind((host, port))
+    check_receive_buffer(server_socket)
+    if gro and not enable_gro(server_socket):
+        print(f"UDP GRO를 지원하지 않는 환경입니다. datagram을 하나씩 수신합니다.")
+        gro = False
+
+    print(f"멀티 세션 서버가 {host}:{port}에서 시작되었습니다...")
+    print(f"파일을 받을 디렉터리: {target_dir}")
+    Path(target_dir).mkdir(parents=True, exist_ok=True)
+
+    sessions = {}
+    # 모든 세션이 소켓 하나를 함께 쓰므로 monitor도 하나를 공유하고, 세션마다 시작 시점의 drop 수를 기준으로 셉니다.
+    monitor = BufferMonitor(server_socket)
+    receiver = DatagramReceiver(server_socket, GRO_BUFFER_SIZE, gro, monitor)
+    tick = nack_interval
+    server_socket.settimeout(tick)
+    next_timer = time.time() + tick
+
+    while True:
+        try:
+            data, address = receiver.recvfrom()
+        except socket.timeout:
+            data = None
+        now = time.time()
+
+        if data is not None and answer_probe(server_socket, data, address):
+            data = None
+
+        if data is not None:
+            try:
+                kind, session_id = SESSION_HEADER.unpack_from(data)
+                payload = memoryview(data)[SESSION_HEADER.size:]
+                if kind == KIND_DATA:
+                    session = sessions.get(session_id)
+                    if session is not None:
+                        for packed in session.on_data(payload, now):
+                            server_socket.sendto(packed, session.client_address)
+
+                elif kind == KIND_INFO:
+                    session = sessions.get(session_id)
+                    if session is None:
+                        session = open_receive_session(session_id, address, payload, target_dir, now,
+                                                       nack_interval, timeout, server_socket, monitor)
+                        if session is None:
+                            continue
+                        sessions[session_id] = session
+                    # 파일 정보가 중복으로 와도 수락 응답은 다시 보냅니다.
+                    server_socket.sendto(session.accept, address)
+            except (struct.error, UnicodeDecodeError) as e:
+                print(f"잘못된 패킷 감지됨: {e}")
+
+        if now >= next_timer:
+            for session_id, session in list(sessions.items()):
+                for packed in session.on_timer(now):
+                    server_socket.sendto(packed, session.client_address)
+                if session.expired(now):
+                    del sessions[session_id]
+            # 타이머 주기는 세션들 중 가장 짧은 NACK 간격(RTO)을 따릅니다.
+            interval = min([session.nack.interval for session in sessions.values()] + [nack_interval])
+            if interval != tick:
+                tick = interval
+                server_socket.settimeout(tick)
+            next_timer = now + tick
+
 
 # 사용 예시
 if __name__ == "__main__":
@@ -1,50 +1,37 @@
 import argparse
+import asyncio
 import datetime
-import time
-
-from udp_server import start_server
-from udp_client import send_file
+import logging
+import os
+
+from compression import CODECS
+from logger import setup_logger
+from metrics import JsonLinesExporter, add_exporter, start_metrics_server
+from path_mtu import path_payload
+from udp_server import start_mux_server, start_server
+from rate_control import MB, RATE_CONTROLLERS, make_rate_controller
+from tuner import Tuner
+from udp_async import DEFAULT_WINDOW, send_file_async, start_async_server
+from udp_client import send_batch, send_file
 
 KB = 1024
 
 def program(filename: str, host: str = 'localhost', port: int = 9999):
-    start_buffer_size_coef = 4
-    end_buffer_size_coef = 16
-
-    iterate_num = 50
-
-    start_interval = 0.0001
-    end_interval = 0.001
-    interval_of_interval = 0.0001
-
-    interval = start_interval
-
+    """
+    패킷 크기와 윈도우/전송 간격 조합을 successive halving으로 탐색해 가장 빠른 설정을 찾고,
+    결과를 JSON(최적 설정과 설정별 요약)과 CSV(전송별 처리량/손실 곡선)로 저장합니다.
+    """
     str_time_now = datetime.datetime.now().strftime('%Y%m%d_%H%M%S')
+    log_name = str_time_now + "_tune"
 
-
-    log_name = str_time_now + "itvl" + str(start_interval) + '-' + str(end_interval) + "bfr" + str(start_buffer_size_coef) + "-" + str(end_buffer_size_coef)
-    with open(log_name, 'w', encoding='utf-8') as file:
-        file.write(f"{log_name}\n")
-        while interval <= end_interval:
-            buffer_size_coef = start_buffer_size_coef
-            while buffer_size_coef <= end_buffer_size_coef:
-                file.write(f"Buffer Size : {buffer_size_coef}\t Interval : {interval}\n")
-                for i in range(iterate_num):
-                    losses = send_file(filename, host, port, 1024 * buffer_size_coef, interval)
-                    time.sleep(5)
-                    file.write(f"Iteration : {i+1}\n")
-                    for loss in losses:
-                        volume_lossed = len(loss) * buffer_size_coef * 4
-                        file.write(f"LOSS : {volume_lossed}\n")
-                        file.write(f"{loss}\n")
-                    file.write("\n")
-
-                buffer_size_coef *= 2
-
-        interval += interval_of_interval
-    file.write("\n")
-    end_time = datetime.datetime.now().strftime('%Y%m%d_%H%M%S')
-    file.write(f"end : {end_time}\n")
+    tuner = Tuner(filename, host, port)
+    try:
+        tuner.run()
+    finally:
+        # 중단되어도 그때까지의 전송 기록은 남깁니다.
+        tuner.write_json(log_name + ".json")
+        tuner.write_csv(log_name + ".csv")
+    print(f"튜닝 결과 저장 : {log_name}.json, {log_name}.csv")
 
 
 if __name__ == "__main__":
@@ -54,12 +41,52 @@ if __name__ == "__main__":
     parser.add_argument("-c", "--client", type=bool, default=False)
     parser.add_argument("-t", "--target", type=str, default="localhost")
     parser.add_argument("-p", "--port", type=int, default=9999)
-    parser.add_argument("-b", "--buffer_size", type=int, default=1460)
+    parser.add_argument("-b", "--buffer_size", type=int, default=0,
+                        help="패킷 하나의 최대 크기, 0이면 경로 MTU에 맞춰 정함 (클라이언트)")
     parser.add_argument("-d", "--developer", type=bool, default=False)
-    parser.add_argument("-i", "--interval", type=float, default=0.0001)
+    parser.add_argument("-i", "--interval", type=float, default=0.0001,
+                        help="기존 모드에서 패킷 하나당 전송 간격(초), 패킷 크기 / 간격의 속도로 pacing하며 0이면 제한하지 않음")
+    parser.add_argument("-w", "--window", type=int, default=0, help="0보다 크면 selective-repeat 모드의 윈도우 크기")
+    parser.add_argument("-r", "--rate_control", type=str, default="none", choices=["none", *RATE_CONTROLLERS],
+                        help="전송 속도 제어기, -i로 지정한 간격이 초기 속도가 됩니다.")
+    parser.add_argument("--write_through", action="store_true", help="수신 즉시 파일에 기록 (서버)")
+    parser.add_argument("--gso", type=int, default=1, help="GSO로 한 번에 묶어 보낼 패킷 수 (클라이언트, Linux)")
+    parser.add_argument("--gro", action="store_true", help="GRO로 묶어서 수신 (서버, Linux)")
+    parser.add_argument("-s", "--streams", type=int, default=1,
+                        help="파일을 나누어 보낼 소켓/프로세스 수, 서버는 port + 1부터 port + streams까지 사용")
+    parser.add_argument("--session", action="store_true", help="세션 헤더를 붙여 멀티 세션 서버로 전송 (클라이언트)")
+    parser.add_argument("--mux", action="store_true", help="여러 세션 전송을 하나의 포트에서 동시에 수신 (서버)")
+    parser.add_argument("--fec", type=int, default=0,
+                        help="0보다 크면 이 개수의 청크마다 XOR parity 패킷을 전송 (클라이언트)")
+    parser.add_argument("--fec_adaptive", action="store_true", help="손실 보고에 따라 FEC 그룹 크기를 조절 (클라이언트)")
+    parser.add_argument("--verify", action="store_true",
+                        help="청크마다 CRC32를 붙이고 수신측의 파일 digest 영수증을 확인 (클라이언트)")
+    parser.add_argument("--resume", action="store_true",
+                        help="수신측에 남은 부분 파일을 이어받아 누락된 청크만 전송 (클라이언트, selective-repeat)")
+    parser.add_argument("--delta", action="store_true",
+                        help="수신측에 있는 이전 버전에서 바뀐 청크만 전송 (클라이언트, selective-repeat)")
+    parser.add_argument("--compress", type=str, default="none", choices=["none", *CODECS],
+                        help="청크마다 압축해 전송, 줄지 않는 파일과 청크는 원본 전송 (클라이언트)")
+    parser.add_argument("--batch", type=str, nargs="+", default=None,
+                        help="여러 파일/디렉터리를 하나의 스트림으로 묶어 한 번에 전송, -f가 디렉터리여도 묶음 전송 (클라이언트)")
+    parser.add_argument("--asyncio", action="store_true",
+                        help="asyncio 이벤트 루프로 세션 모드 전송/수신 (클라이언트는 --session 서버, 서버는 --mux와 호환)")
+
+    parser.add_argument("--log_level", type=str, default="INFO", choices=["DEBUG", "INFO", "WARNING", "ERROR"],
+                        help="DEBUG이면 지표 라운드(RTT, 손실)마다 기록")
+    parser.add_argument("--log_file", type=str, default=None, help="로그를 콘솔과 함께 기록할 파일 또는 디렉터리")
+    parser.add_argument("--metrics_file", type=str, default=None, help="전송 지표 스냅샷을 JSON lines로 덧붙일 파일")
+    parser.add_argument("--metrics_port", type=int, default=0,
+                        help="0보다 크면 전송 지표를 JSON으로 돌려주는 HTTP endpoint를 이 포트에 엶")
 
     args = parser.parse_args()
 
+    setup_logger(getattr(logging, args.log_level), args.log_file)
+    if args.metrics_file:
+        add_exporter(JsonLinesExporter(args.metrics_file))
+    if args.metrics_port > 0:
+        start_metrics_server(args.metrics_port)
+
     host = args.target
     port = args.port
     is_client = args.client
@@ -68,13 +95,38 @@ if __name__ == "__main__":
     file_name = args.file
     interval = args.interval
     buffer_size = args.buffer_size
+    window_size = args.window
 
     if is_developer:
         program(file_name, host=host, port=port)
 
-    if is_client:
-        send_file(file_name, host=host, port=port, buffer_size=buffer_size, interval=interval)
+    elif is_client:
+        # 속도 제어기는 커널이 알려준 경로 MTU로 패킷 크기를 가정합니다. 실제 크기는 전송 전에 probe로 정해집니다.
+        packet_size = path_payload((host, port))
+        if buffer_size > 0:
+            packet_size = min(packet_size, buffer_size)
+        rate_controller = make_rate_controller(args.rate_control, packet_size,
+                                               initial_rate=packet_size / interval if interval > 0 else MB)
+        if args.asyncio:
+            asyncio.run(send_file_async(file_name, host=host, port=port, buffer_size=buffer_size,
+                                        window_size=window_size if window_size > 0 else DEFAULT_WINDOW,
+                                        rate_controller=rate_controller))
+        else:
+            options = dict(host=host, port=port, buffer_size=buffer_size, interval=interval,
+                           window_size=window_size, rate_controller=rate_controller, gso_segments=args.gso,
+                           streams=args.streams, session=args.session, fec_group=args.fec,
+                           fec_adaptive=args.fec_adaptive, verify=args.verify, resume=args.resume,
+                           delta=args.delta, compress=args.compress)
+            if args.batch or os.path.isdir(file_name):
+                send_batch(args.batch or [file_name], **options)
+            else:
+                send_file(file_name, **options)
 
     else:
-        start_server(host=host, port=port)
+        if args.asyncio:
+            asyncio.run(start_async_server(host=host, port=port))
+        elif args.mux:
+            start_mux_server(host=host, port=port, gro=args.gro)
+        else:
+            start_server(host=host, port=port, write_through=args.write_through, gro=args.gro)
 
@@ -0,0 +1,311 @@
+import math
+from array import array
+from collections import deque
+
+from rtt import RttEstimator
+from sack import missing_ranges
+
+# 처음 누락이 보고된 seq를 재전송하기 전에 허용하는 순서 바뀜, SRTT에 대한 비율 (RFC 8985의 reo_wnd = min_rtt / 4)
+# 재전송이 불필요했던 것으로 드러날 때마다 두 배로 늘리며, 그 이상은 재전송 타이머가 처리하므로 RTO를 넘지 않습니다.
+REORDER_WINDOW_FRACTION = 1 / 4
+# 불필요한 재전송 없이 이 횟수만큼 손실을 복구하면 순서 바뀜 허용 시간을 처음으로 되돌립니다. (RFC 8985 6.2)
+REORDER_RESET_RECOVERIES = 16
+
+
+class SendWindow:
+    """
+    selective-repeat 송신측의 in-flight 윈도우 상태를 관리합니다.
+    소켓을 직접 다루지 않으므로 송신 루프는 이 객체가 알려주는 seq만 전송하면 됩니다.
+    """
+
+    def __init__(self, total_chunks: int, window_size: int, retransmit_timeout: float = 0.2, first_seq: int = 0,
+                 rtt: RttEstimator | None = None):
+        """
+        Args:
+            total_chunks : 전송할 청크의 수, first_seq를 지정한 경우 전송할 구간의 끝 seq(미포함)입니다.
+            window_size : 수신 확인 없이 동시에 전송할 수 있는 최대 패킷 수
+            retransmit_timeout : RTT 표본을 얻기 전의 재전송 타이머
+            first_seq : 전송할 구간의 첫 seq, 파일의 일부 구간만 전송할 때 사용합니다.
+            rtt : 재전송 타이머를 정하는 RTT 추정기, 생략하면 retransmit_timeout에서 시작하는 추정기를 만듭니다.
+        """
+        self.total_chunks = total_chunks
+        self.window_size = window_size
+        self.rtt = rtt if rtt is not None else RttEstimator(retransmit_timeout)
+
+        self.first_seq = first_seq
+        self.next_seq = first_seq  # 아직 한 번도 전송하지 않은 첫 seq
+        self.cum_ack = first_seq  # 이 값 미만의 seq는 모두 수신 확인됨
+        self.in_flight = {}  # seq -> 마지막 전송 시각
+        self.retransmitted = set()  # RTT 측정에서 제외할 재전송된 seq
+        self.delivered_sent_at = -math.inf  # 수신 확인된 seq 중 가장 늦게 전송한 것의 전송 시각
+        self.delivered_rtt = 0.0  # 그 seq가 전송부터 확인까지 걸린 시간
+        self.reorder_scale = 1  # reorder_window의 배수, 불필요한 재전송을 감지할 때마다 늘립니다.
+        self.recoveries = 0  # 마지막으로 불필요한 재전송을 감지한 뒤 손실을 복구한 횟수
+        self.spurious = 0  # 원본이 먼저 도착해 불필요했던 것으로 보이는 재전송 수
+        self.gaps = None  # 이어받기에서 아직 보내야 할 [start, end) 구간들, None이면 모든 seq를 보냅니다.
+
+        # 마지막 on_ack의 결과 (rate controller 입력)
+        self.newly_acked = 0
+        self.rtt_sample = None
+
+    @property
+    def retransmit_timeout(self) -> float:
+        """
+        마지막 전송 이후 이 시간이 지나도 확인되지 않은 seq는 재전송합니다.
+        """
+        return self.rtt.rto
+
+    @property
+    def reorder_window(self) -> float:
+        """
+        처음 누락이 보고된 seq를 유실로 판단하기 전에 순서 바뀜을 기다리는 시간입니다.
+        RTT 표본을 얻기 전에는 SRTT 대신 RTO를 기준으로 합니다.
+        """
+        srtt = self.rtt.srtt if self.rtt.srtt is not None else self.rtt.rto
+        return min(self.rtt.rto, srtt * REORDER_WINDOW_FRACTION * self.reorder_scale)
+
+    def done(self) -> bool:
+        return self.cum_ack >= self.total_chunks
+
+    def can_send_new(self) -> bool:
+        return self.next_seq < self.total_chunks and len(self.in_flight) < self.window_size
+
+    def take_new(self) -> int:
+        seq = self.next_seq
+        self.next_seq += 1
+        if self.gaps and self.next_seq >= self.gaps[0][1]:
+            self.gaps.popleft()
+            self.next_seq = self.gaps[0][0] if self.gaps else self.total_chunks
+        return seq
+
+    def skip_received(self, cum_ack: int, ranges: array) -> int:
+        """
+        이어받기에서 수신측이 이미 가진 seq를 건너뛰고, 누락 구간의 seq만 새로 보내도록 합니다. 전송을 시작하기 전에 호출합니다.
+        Args:
+            cum_ack : 이 값 미만의 seq는 모두 수신됨
+            ranges : [cum_ack, total_chunks) 구간에서 누락된 구간, (start, count) 쌍
+        Returns:
+            건너뛴 seq의 수, cum_ack 이후에 이미 수신된 seq도 포함합니다.
+        """
+        self.cum_ack = max(self.cum_ack, cum_ack)
+        self.gaps = deque((ranges[i], ranges[i] + ranges[i + 1]) for i in range(0, len(ranges), 2))
+        self.next_seq = self.gaps[0][0] if self.gaps else self.total_chunks
+        return self.total_chunks - self.first_seq - sum(end - start for start, end in self.gaps)
+
+    def on_sent(self, seq: int, now: float):
+        if seq in self.in_flight:
+            self.retransmitted.add(seq)
+        self.in_flight[seq] = now
+
+    def on_ack(self, cum_ack: int, cover_start: int, cover_end: int, ranges: array, now: float,
+               echoed_at: float | None = None) -> list[int]:
+        """
+        ACK datagram 하나를 반영하고 즉시 재전송해야 할 seq를 반환합니다.
+        [cover_start, cover_end) 구간에서 누락 구간(ranges)에 속하지 않는 seq는 수신된 것으로 간주합니다.
+        처음 누락이 보고된 seq는 순서가 바뀌었을 수 있으므로, 그 뒤에 보낸 seq가 확인되고 전송 후 확인된 seq의 RTT에
+        reorder_window를 더한 시간이 지난 뒤에 재전송합니다. (RFC 8985 RACK)
+        이미 재전송한 seq는 retransmit_timeout이 지난 뒤에만 다시 보냅니다.
+        재전송한 seq가 재전송본이 도착할 수 없는 시점의 ACK로 확인되면 불필요한 재전송으로 보고 reorder_window를 늘립니다.
+        새로 확인된 패킷 수와 RTT 표본은 newly_acked, rtt_sample에 기록합니다.
+        Args:
+            echoed_at : ACK에 되돌아온 타임스탬프(ts_ecr)를 now와 같은 시계로 바꾼 시각, 지정하면 불필요한 재전송을
+                        이것으로 판단합니다. (RFC 3522 Eifel) 생략하면 SRTT의 절반보다 빨리 확인된 재전송을 불필요했던 것으로 봅니다.
+        """
+        if cum_ack > self.cum_ack:
+            self.cum_ack = cum_ack
+
+        # 아직 보내지 않은 seq까지 덮는 NACK도 있으므로 이미 보낸 범위로 잘라서 펼칩니다.
+        missed = set()
+        for i in range(0, len(ranges), 2):
+            missed.update(range(ranges[i], min(ranges[i] + ranges[i + 1], self.next_seq)))
+        self.newly_acked = 0
+        self.rtt_sample = None
+        spurious = False
+        for seq in list(self.in_flight):
+            if seq < self.cum_ack or (cover_start <= seq < cover_end and seq not in missed):
+                sent_at = self.in_flight.pop(seq)
+                self.newly_acked += 1
+                if seq in self.retransmitted:
+                    self.retransmitted.discard(seq)
+                    # ACK를 일으킨 패킷이 재전송보다 먼저 보낸 것이거나, 재전송본이 왕복할 수 없을 만큼 빨리 확인되면
+                    # 원본이 늦게 도착한 것입니다. 이때 재전송 시각은 순서 바뀜 판단의 기준이 될 수 없습니다.
+                    if echoed_at is not None:
+                        late = echoed_at < sent_at
+                    else:
+                        late = self.rtt.srtt is not None and now - sent_at < self.rtt.srtt / 2
+                    if late:
+                        self.spurious += 1
+                        spurious = True
+                        continue
+                elif self.rtt_sample is None or now - sent_at < self.rtt_sample:
+                    self.rtt_sample = now - sent_at
+                if sent_at > self.delivered_sent_at:
+                    self.delivered_sent_at = sent_at
+                    self.delivered_rtt = now - sent_at
+        if spurious:
+            if self.reorder_window < self.rtt.rto:
+                self.reorder_scale *= 2
+            self.recoveries = 0
+
+        # 확인된 seq를 모두 반영한 뒤에 판단해야 같은 ACK로 확인된 뒤쪽 seq를 순서 바뀜 판단에 쓸 수 있습니다.
+        wait = self.delivered_rtt + self.reorder_window
+        timeout = self.retransmit_timeout
+        retransmit = []
+        lost = False
+        for seq in missed:
+            sent_at = self.in_flight.get(seq)
+            if sent_at is None:
+                continue
+            if seq in self.retransmitted:
+                if now - sent_at >= timeout:
+                    retransmit.append(seq)
+            elif sent_at < self.delivered_sent_at and now - sent_at >= wait:
+                retransmit.append(seq)
+                lost = True
+        if lost:
+            self.recoveries += 1
+            if self.recoveries >= REORDER_RESET_RECOVERIES:
+                self.reorder_scale = 1
+                self.recoveries = 0
+        retransmit.sort()
+        return retransmit
+
+    def expired(self, now: float) -> list[int]:
+        """
+        retransmit_timeout이 지나도록 확인되지 않은 in-flight seq를 반환합니다.
+        """
+        timeout = self.retransmit_timeout
+        expired = [seq for seq, sent_at in self.in_flight.items() if now - sent_at >= timeout]
+        if expired:
+            # 타이머가 만료되면 다음 RTT 표본을 얻을 때까지 RTO를 늘립니다. (RFC 6298 5.5)
+            self.rtt.on_timeout()
+        return expired
+
+    def next_deadline(self) -> float | None:
+        """
+        가장 먼저 재전송 시간이 도래하는 시각을 반환합니다. in-flight 패킷이 없으면 None입니다.
+        """
+        if not self.in_flight:
+            return None
+        return min(self.in_flight.values()) + self.retransmit_timeout
+
+
+class DeliveryTracker:
+    """
+    기존 모드의 송신측이 전송 도중 받은 NACK로 수신측이 가진 청크를 기록해, NACK마다 새로 수신 확인된 청크 수를 계산합니다.
+    기존 모드는 청크마다 ACK를 받지 않으므로, 보낸 패킷 수가 아니라 수신측의 보고만 전달된 것으로 셉니다.
+    """
+
+    def __init__(self, total_chunks: int):
+        self.confirmed = bytearray(total_chunks)
+        self.floor = 0  # 이 값 미만의 seq는 모두 confirmed에 기록됨
+
+    def _confirm(self, start: int, end: int) -> int:
+        if start >= end:
+            return 0
+        newly = end - start - self.confirmed.count(1, start, end)
+        self.confirmed[start:end] = b'\x01' * (end - start)
+        return newly
+
+    def on_ack(self, cum_ack: int, cover_start: int, cover_end: int, ranges: array) -> int:
+        """
+        ACK datagram 하나를 반영하고 새로 수신 확인된 청크 수를 반환합니다.
+        [cover_start, cover_end) 구간에서 누락 구간(ranges)에 속하지 않는 seq는 수신된 것으로 간주합니다.
+        """
+        total = len(self.confirmed)
+        cum_ack = min(cum_ack, total)
+        newly = 0
+        if cum_ack > self.floor:
+            newly += self._confirm(self.floor, cum_ack)
+            self.floor = cum_ack
+        pos = max(cover_start, self.floor)
+        cover_end = min(cover_end, total)
+        for i in range(0, len(ranges), 2):
+            newly += self._confirm(pos, min(ranges[i], cover_end))
+            pos = max(pos, ranges[i] + ranges[i + 1])
+        newly += self._confirm(pos, cover_end)
+        return newly
+
+
+class ReceiveWindow:
+    """
+    selective-repeat 수신측에서 ACK에 담을 cum_ack, highest, 누락 seq를 계산합니다.
+    """
+
+    def __init__(self, total_chunks: int, first_seq: int = 0):
+        """
+        Args:
+            total_chunks : 수신할 청크의 수, first_seq를 지정한 경우 수신할 구간의 끝 seq(미포함)입니다.
+            first_seq : 수신할 구간의 첫 seq
+        """
+        self.total_chunks = total_chunks
+        self.first_seq = first_seq
+        self.received = bytearray(total_chunks)
+        self.received_count = 0
+        self.cum_ack = first_seq
+        self.highest = first_seq
+
+    def complete(self) -> bool:
+        return self.received_count >= self.total_chunks - self.first_seq
+
+    def restore(self, received: bytearray):
+        """
+        이전 전송에서 저장해 둔 수신 비트맵으로 수신 상태를 되돌립니다.
+        """
+        self.received[self.first_seq:] = received[self.first_seq:self.total_chunks]
+        self.received_count = self.received.count(1, self.first_seq)
+        cum_ack = self.received.find(0, self.first_seq)
+        self.cum_ack = self.total_chunks if cum_ack == -1 else cum_ack
+        self.highest = max(self.first_seq, self.received.rfind(1) + 1)
+
+    def mark(self, seq: int) -> bool:
+        """
+        seq를 수신 처리합니다. 처음 받은 seq이면 True, 중복이면 False를 반환합니다.
+        """
+        if self.received[seq]:
+            return False
+        self.received[seq] = 1
+        self.received_count += 1
+        if seq >= self.highest:
+            self.highest = seq + 1
+        while self.cum_ack < self.total_chunks and self.received[self.cum_ack]:
+            self.cum_ack += 1
+        return True
+
+    def missing_ranges(self, end: int | None = None) -> array:
+        """
+        [cum_ack, end) 구간의 누락 구간을 (start, count) 쌍으로 반환합니다. end를 생략하면 highest까지 찾습니다.
+        """
+        return missing_ranges(self.received, self.cum_ack, self.highest if end is None else end)
+
+
+class NackScheduler:
+    """
+    수신 중에 손실 보고(NACK)를 보낼 시점을 결정합니다.
+    [cum_ack, highest) 구간에 구멍이 생기면 바로 NACK를 보내고, 구멍이 남아 있으면 interval마다 다시 보냅니다.
+    interval 동안 패킷이 전혀 오지 않는 경우(마지막 패킷 유실 등)는 수신 루프가 소켓 타임아웃으로 처리합니다.
+    """
+
+    def __init__(self, interval: float = 0.05, rtt: RttEstimator | None = None):
+        """
+        Args:
+            interval : RTT 표본을 얻기 전의 NACK 간격
+            rtt : NACK 간격을 정하는 RTT 추정기, 생략하면 interval에서 시작하는 추정기를 만듭니다.
+        """
+        self.rtt = rtt if rtt is not None else RttEstimator(interval)
+        self.last_nack = -math.inf
+
+    @property
+    def interval(self) -> float:
+        """
+        NACK 사이의 최소 간격이자 수신 루프의 유휴 판정 간격으로, 수신측이 잰 RTO를 따릅니다.
+        """
+        return self.rtt.rto
+
+    def due(self, receive_window: ReceiveWindow, now: float) -> bool:
+        if receive_window.cum_ack >= receive_window.highest:
+            return False
+        return now - self.last_nack >= self.interval
+
+    def sent(self, now: float):
+        self.last_nack = now
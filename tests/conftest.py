@@ -0,0 +1,5 @@
+import os
+import sys
+
+# lib_socket의 모듈은 서로를 최상위 모듈로 import하므로 디렉터리를 경로에 추가합니다.
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), os.pardir, 'src', 'lib_socket'))
@@ -0,0 +1,64 @@
+import socket
+import threading
+from array import array
+
+from metrics import TransferMetrics
+from protocol import DATA_HEADER
+from sack import pack_ack
+from udp_client import open_packet_source, send_selective_repeat
+from window import ReceiveWindow, SendWindow
+
+CHUNK_SIZE = 512
+TOTAL_CHUNKS = 40
+HOLE = range(10, 15)
+
+
+def receive(sock: socket.socket, receive_window: ReceiveWindow):
+    """
+    데이터 패킷마다 수신 상태를 ACK로 돌려주는 수신측, 모든 청크를 받으면 끝납니다.
+    """
+    while not receive_window.complete():
+        data, address = sock.recvfrom(65536)
+        seq_num, _ = DATA_HEADER.unpack_from(data)
+        receive_window.mark(seq_num)
+        for packed in pack_ack(receive_window.cum_ack, receive_window.highest, receive_window.missing_ranges()):
+            sock.sendto(packed, address)
+
+
+def test_skip_received_counts_chunks_after_hole():
+    window = SendWindow(TOTAL_CHUNKS, 16)
+    skipped = window.skip_received(HOLE.start, array('I', [HOLE.start, len(HOLE)]))
+    assert skipped == TOTAL_CHUNKS - len(HOLE)
+    assert [window.take_new() for _ in HOLE] == list(HOLE)
+
+
+def test_resume_with_hole_delivers_every_chunk(tmp_path):
+    path = tmp_path / 'file'
+    path.write_bytes(bytes(range(256)) * (CHUNK_SIZE * TOTAL_CHUNKS // 256))
+
+    # 가운데 구간만 받지 못한 채 중단된 수신측
+    receive_window = ReceiveWindow(TOTAL_CHUNKS)
+    received = bytearray(b'\x01' * TOTAL_CHUNKS)
+    received[HOLE.start:HOLE.stop] = bytes(len(HOLE))
+    receive_window.restore(received)
+    resume_ack = (receive_window.cum_ack, receive_window.missing_ranges(TOTAL_CHUNKS))
+
+    server = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    server.bind(('127.0.0.1', 0))
+    server.settimeout(5)
+    client = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    receiver = threading.Thread(target=receive, args=(server, receive_window), daemon=True)
+    receiver.start()
+    try:
+        metrics = TransferMetrics('test:resume', 'send', TOTAL_CHUNKS, CHUNK_SIZE, quiet=True)
+        with open_packet_source(str(path), CHUNK_SIZE, None) as packet_source:
+            losses = send_selective_repeat(client, server.getsockname(), packet_source, 16,
+                                           resume_ack=resume_ack, metrics=metrics)
+        receiver.join(5)
+    finally:
+        client.close()
+        server.close()
+
+    assert receive_window.complete()
+    assert sum(len(loss) for loss in losses) == 0
+    assert metrics.delivered == TOTAL_CHUNKS